@@ -1,158 +1,236 @@
 """予想関連API"""
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from supabase import Client
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from redis.asyncio import Redis
 from loguru import logger
-from typing import Optional
-from datetime import datetime, timezone
-
-from app.dependencies import get_supabase, get_current_user
-from app.models.bet import BetCreate, BetResponse, BetListResponse
+from typing import List, Optional
+
+from app.dependencies import get_repositories, get_redis, get_current_user
+from app.models.bet import (
+    BetCreate, BetResponse, BetBatchCreate, BetBatchResponse, BetListResponse
+)
+from app.repositories import BET_ORDER, Repositories, RepositoryError
+from app.services.bet_combinations import (
+    Ticket, normalize_ticket, count_box, expand_box, expand_formation, merge_tickets
+)
+from app.services.leaderboard import leaderboard
+from app.services.odds_cache import odds_cache
+from app.services.open_races import open_races
+from app.services.pagination import CountMode
+from app.services.projection import BETS, build_select
+from app.services.odds_engine import record_stakes
+from app.services.user_cache import user_cache
 from app.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
 # 予想タイプの定義
+# ordered: 着順（選択順）を区別する券種かどうか
 BET_TYPES = {
-    "win": {"name": "単勝", "selections": 1},
-    "place": {"name": "複勝", "selections": 1},
-    "exacta": {"name": "馬連", "selections": 2},
-    "wide": {"name": "ワイド", "selections": 2},
-    "trio": {"name": "3連複", "selections": 3},
-    "trifecta": {"name": "3連単", "selections": 3}
+    "win": {"name": "単勝", "selections": 1, "ordered": False},
+    "place": {"name": "複勝", "selections": 1, "ordered": False},
+    "exacta": {"name": "馬連", "selections": 2, "ordered": False},
+    "wide": {"name": "ワイド", "selections": 2, "ordered": False},
+    "trio": {"name": "3連複", "selections": 3, "ordered": False},
+    "trifecta": {"name": "3連単", "selections": 3, "ordered": True}
 }
 
 
-@router.post("/bets", response_model=BetResponse)
-async def create_bet(
-    bet_data: BetCreate,
-    current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
-):
-    """予想作成"""
-    user_id = current_user["id"]
-    user_coins = current_user.get("coins", 0)
-    is_premium = current_user.get("is_premium", False)
-
-    # バリデーション
-    if bet_data.bet_type not in BET_TYPES:
+def check_bet_type(bet_type: str) -> None:
+    """予想タイプをチェック"""
+    if bet_type not in BET_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid bet type. Must be one of: {list(BET_TYPES.keys())}"
         )
 
-    expected_selections = BET_TYPES[bet_data.bet_type]["selections"]
-    if len(bet_data.selections) != expected_selections:
+
+def check_selections(bet_type: str, selections: List[int]) -> None:
+    """選択した馬番の数と重複をチェック（出走しているかは place_bet RPC で確認する）"""
+    expected_selections = BET_TYPES[bet_type]["selections"]
+    if len(selections) != expected_selections:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"{BET_TYPES[bet_data.bet_type]['name']} requires {expected_selections} horse(s)"
+            detail=f"{BET_TYPES[bet_type]['name']} requires {expected_selections} horse(s)"
         )
+    if len(set(selections)) != len(selections):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A ticket cannot select the same horse twice"
+        )
+
 
-    # 賭け金チェック
+def check_bet_amount(amount: int, is_premium: bool) -> None:
+    """賭け金チェック"""
     max_bet = settings.MAX_BET_AMOUNT_PREMIUM if is_premium else settings.MAX_BET_AMOUNT
-    if bet_data.amount < settings.MIN_BET_AMOUNT:
+    if amount < settings.MIN_BET_AMOUNT:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Minimum bet amount is {settings.MIN_BET_AMOUNT} coins"
         )
-    if bet_data.amount > max_bet:
+    if amount > max_bet:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Maximum bet amount is {max_bet} coins"
         )
 
-    # コイン残高チェック
-    if user_coins < bet_data.amount:
+
+def expand_tickets(batch: BetBatchCreate) -> List[Ticket]:
+    """一括予想リクエストの買い目を展開"""
+    bet_type = BET_TYPES[batch.bet_type]
+    size = bet_type["selections"]
+    ordered = bet_type["ordered"]
+
+    if batch.tickets is None and batch.box is None and batch.formation is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient coins"
+            detail="One of tickets, box or formation is required"
         )
 
-    try:
-        # レース情報を取得
-        race = supabase.table("races").select("*").eq("id", bet_data.race_id).single().execute()
+    if batch.tickets is not None:
+        for selections in batch.tickets:
+            check_selections(batch.bet_type, selections)
+    if batch.box is not None and len(set(batch.box)) < size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Box requires at least {size} horse(s)"
+        )
+    if batch.formation is not None and len(batch.formation) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{bet_type['name']} formation requires {size} position(s)"
+        )
 
-        if not race.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Race not found"
-            )
+    # ボックスは展開する前に点数を求めて上限を超えるものを断る
+    # （フォーメーションは候補馬番の数がモデルで制限されているため展開後に数える）
+    if batch.box is not None and count_box(batch.box, size, ordered) > settings.BET_BATCH_MAX_TICKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {settings.BET_BATCH_MAX_TICKETS} tickets per batch"
+        )
 
-        race_data = race.data
+    groups: List[List[Ticket]] = []
+    if batch.tickets is not None:
+        groups.append([normalize_ticket(selections, ordered) for selections in batch.tickets])
+    if batch.box is not None:
+        groups.append(expand_box(batch.box, size, ordered))
+    if batch.formation is not None:
+        groups.append(expand_formation(batch.formation, ordered))
 
-        # レースのステータスチェック
-        if race_data["status"] != "betting":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Betting is not open for this race"
-            )
+    tickets = merge_tickets(groups)
+    if not tickets:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No valid tickets"
+        )
+    if any(len(set(ticket)) != len(ticket) for ticket in tickets):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A ticket cannot select the same horse twice"
+        )
+    if len(tickets) > settings.BET_BATCH_MAX_TICKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {settings.BET_BATCH_MAX_TICKETS} tickets per batch"
+        )
+    return tickets
+
+
+# place_bet RPC が返すエラーとHTTPレスポンスの対応
+PLACE_BET_ERRORS = {
+    "race_not_found": (status.HTTP_404_NOT_FOUND, "Race not found"),
+    "betting_closed": (status.HTTP_400_BAD_REQUEST, "Betting is not open for this race"),
+    "insufficient_coins": (status.HTTP_400_BAD_REQUEST, "Insufficient coins"),
+    "invalid_selection": (status.HTTP_400_BAD_REQUEST, "Selected horse is not running in this race"),
+}
 
-        # オッズを取得（単勝の場合は馬のオッズ、その他は仮のオッズ）
-        # MVPでは単勝・複勝のみ実装
-        odds = 1.0
-        if bet_data.bet_type == "win":
-            horse = supabase.table("horses").select("odds").eq(
-                "race_id", bet_data.race_id
-            ).eq("number", bet_data.selections[0]).single().execute()
-            if horse.data:
-                odds = horse.data.get("odds", 1.0)
-        elif bet_data.bet_type == "place":
-            horse = supabase.table("horses").select("odds").eq(
-                "race_id", bet_data.race_id
-            ).eq("number", bet_data.selections[0]).single().execute()
-            if horse.data:
-                # 複勝オッズは単勝の約1/3として計算（簡易版）
-                odds = max(1.1, horse.data.get("odds", 1.0) / 3)
-
-        now = datetime.now(timezone.utc)
-
-        # 予想を作成
-        bet = {
-            "user_id": user_id,
-            "race_id": bet_data.race_id,
-            "bet_type": bet_data.bet_type,
-            "selections": bet_data.selections,
-            "amount": bet_data.amount,
-            "odds": odds,
-            "status": "pending",
-            "created_at": now.isoformat()
-        }
-
-        bet_result = supabase.table("bets").insert(bet).execute()
-
-        # コインを減算
-        new_coins = user_coins - bet_data.amount
-        supabase.table("users").update({
-            "coins": new_coins,
-            "total_bets": current_user.get("total_bets", 0) + 1,
-            "total_spent": current_user.get("total_spent", 0) + bet_data.amount
-        }).eq("id", user_id).execute()
-
-        # コイン取引履歴を記録
-        transaction = {
-            "user_id": user_id,
-            "type": "spend",
-            "amount": -bet_data.amount,
-            "balance": new_coins,
-            "reason": f"予想購入（{BET_TYPES[bet_data.bet_type]['name']}）",
-            "metadata": {
-                "race_id": bet_data.race_id,
-                "bet_id": bet_result.data[0]["id"]
-            },
-            "created_at": now.isoformat()
-        }
-        supabase.table("coin_transactions").insert(transaction).execute()
-
-        logger.info(f"Bet created: user={user_id}, race={bet_data.race_id}, type={bet_data.bet_type}")
+
+async def check_betting_open(redis: Optional[Redis], race_id: str) -> None:
+    """予想受付中のレースかをプロセス内の受付時間帯で確認
+
+    受付時間帯が公開されていない場合は place_bet RPC 側の確認に任せる。
+    """
+    if await open_races.is_open(redis, race_id) is False:
+        status_code, detail = PLACE_BET_ERRORS["betting_closed"]
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
+def raise_for_place_bet_error(e: RepositoryError) -> None:
+    """place_bet 系 RPC の業務エラーをHTTPExceptionに変換"""
+    if e.message in PLACE_BET_ERRORS:
+        status_code, detail = PLACE_BET_ERRORS[e.message]
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
+@router.post("/bets", response_model=BetResponse)
+async def create_bet(
+    bet_data: BetCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255, description="再送時の二重課金防止キー"
+    ),
+    current_user: dict = Depends(get_current_user),
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
+):
+    """予想作成
+
+    受付時間帯外の予想はDBを参照せずに断る。
+    レース状態の確認・コイン減算・予想登録・取引履歴記録は place_bet RPC で
+    1トランザクションにまとめて実行する。残高もDB側で検証するため、
+    キャッシュされたユーザー情報の残高には依存しない。
+    """
+    user_id = current_user["id"]
+    is_premium = current_user.get("is_premium", False)
+
+    # バリデーション
+    check_bet_type(bet_data.bet_type)
+    check_selections(bet_data.bet_type, bet_data.selections)
+    check_bet_amount(bet_data.amount, is_premium)
+    await check_betting_open(redis, bet_data.race_id)
+
+    try:
+        # 公開中のオッズスナップショットで価格を決める
+        # （未公開の場合のみDB側で単勝オッズから決める）
+        snapshot = await odds_cache.get(redis, bet_data.race_id)
+        odds = snapshot.get(bet_data.bet_type, bet_data.selections) if snapshot else None
+
+        placed = await repos.bets.place({
+            "p_user_id": user_id,
+            "p_race_id": bet_data.race_id,
+            "p_bet_type": bet_data.bet_type,
+            "p_selections": bet_data.selections,
+            "p_amount": bet_data.amount,
+            "p_reason": f"予想購入（{BET_TYPES[bet_data.bet_type]['name']}）",
+            "p_idempotency_key": idempotency_key,
+            "p_odds": odds,
+            "p_odds_version": snapshot.version if snapshot else None
+        })
+
+        await user_cache.invalidate(redis, user_id)
+        await leaderboard.update_user(redis, placed["user"])
+
+        if placed.get("replayed"):
+            response.headers["Idempotency-Replayed"] = "true"
+        else:
+            await record_stakes(
+                redis, bet_data.race_id, bet_data.bet_type, [bet_data.selections], bet_data.amount
+            )
+            logger.info(f"Bet created: user={user_id}, race={bet_data.race_id}, type={bet_data.bet_type}")
 
         return BetResponse(
-            bet=bet_result.data[0],
-            user={"coins": new_coins}
+            bet=placed["bet"],
+            user={"coins": placed["user"]["coins"]}
         )
 
-    except HTTPException:
-        raise
+    except RepositoryError as e:
+        raise_for_place_bet_error(e)
+        logger.error(f"Failed to create bet: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create bet"
+        )
     except Exception as e:
         logger.error(f"Failed to create bet: {e}")
         raise HTTPException(
@@ -161,47 +239,118 @@ async def create_bet(
         )
 
 
+@router.post("/bets/batch", response_model=BetBatchResponse)
+async def create_bet_batch(
+    batch: BetBatchCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255, description="再送時の二重課金防止キー"
+    ),
+    current_user: dict = Depends(get_current_user),
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
+):
+    """一括予想作成（ボックス・フォーメーション対応）
+
+    買い目はサーバー側で展開し、残高チェックと全予想の登録は
+    place_bets_batch RPC で1トランザクションにまとめて実行する。
+    """
+    user_id = current_user["id"]
+    is_premium = current_user.get("is_premium", False)
+
+    # バリデーション
+    check_bet_type(batch.bet_type)
+    check_bet_amount(batch.amount, is_premium)
+    tickets = expand_tickets(batch)
+    bet_type_name = BET_TYPES[batch.bet_type]["name"]
+    await check_betting_open(redis, batch.race_id)
+
+    try:
+        snapshot = await odds_cache.get(redis, batch.race_id)
+        ticket_odds = [snapshot.get(batch.bet_type, ticket) if snapshot else None for ticket in tickets]
+
+        placed = await repos.bets.place_batch({
+            "p_user_id": user_id,
+            "p_race_id": batch.race_id,
+            "p_bet_type": batch.bet_type,
+            "p_tickets": [list(ticket) for ticket in tickets],
+            "p_amount": batch.amount,
+            "p_reason": f"予想購入（{bet_type_name} {len(tickets)}点）",
+            "p_idempotency_key": idempotency_key,
+            "p_odds": ticket_odds,
+            "p_odds_version": snapshot.version if snapshot else None
+        })
+
+        await user_cache.invalidate(redis, user_id)
+        await leaderboard.update_user(redis, placed["user"])
+
+        if placed.get("replayed"):
+            response.headers["Idempotency-Replayed"] = "true"
+        else:
+            await record_stakes(redis, batch.race_id, batch.bet_type, tickets, batch.amount)
+            logger.info(
+                f"Bet batch created: user={user_id}, race={batch.race_id}, "
+                f"type={batch.bet_type}, tickets={len(tickets)}"
+            )
+
+        return BetBatchResponse(
+            bets=placed["bets"],
+            count=len(placed["bets"]),
+            total_amount=sum(bet["amount"] for bet in placed["bets"]),
+            user={"coins": placed["user"]["coins"]}
+        )
+
+    except RepositoryError as e:
+        raise_for_place_bet_error(e)
+        logger.error(f"Failed to create bet batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create bets"
+        )
+    except Exception as e:
+        logger.error(f"Failed to create bet batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create bets"
+        )
+
+
 @router.get("/bets", response_model=BetListResponse)
 async def get_bets(
     status: Optional[str] = Query(None, description="状態 (pending, won, lost)"),
     race_id: Optional[str] = Query(None, description="レースID"),
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, description="前ページのnextCursor"),
+    page: int = Query(1, ge=1, description="ページ番号（cursor未指定時のみ）"),
     limit: int = Query(20, ge=1, le=100),
+    count: CountMode = Query("estimated", description="総件数 (exact, estimated, none)"),
+    view: str = Query("full", description="表現 (full, summary)"),
+    fields: Optional[str] = Query(None, description="取得する列 (例: id,amount,races.race_name)"),
+    include: Optional[str] = Query(None, description="埋め込むリソース (races)"),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories)
 ):
     """予想履歴取得"""
     user_id = current_user["id"]
+    select = build_select(BETS, view=view, fields=fields, include=include)
 
     try:
-        query = supabase.table("bets").select(
-            "*, races(race_name, venue, date)",
-            count="exact"
-        ).eq("user_id", user_id)
-
-        if status:
-            query = query.eq("status", status)
-        if race_id:
-            query = query.eq("race_id", race_id)
-
-        offset = (page - 1) * limit
-        query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
-
-        result = query.execute()
+        rows, total = await repos.bets.list(
+            user_id,
+            select,
+            status=status,
+            race_id=race_id,
+            cursor=cursor,
+            page=page,
+            limit=limit,
+            count=count,
+        )
 
-        total = result.count or 0
-        total_pages = (total + limit - 1) // limit
+        bets, pagination = BET_ORDER.paginate(rows, limit, page, total, count)
 
-        return BetListResponse(
-            bets=result.data or [],
-            pagination={
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "totalPages": total_pages
-            }
-        )
+        return BetListResponse(bets=bets, pagination=pagination)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get bets: {e}")
         raise HTTPException(
@@ -214,23 +363,21 @@ async def get_bets(
 async def get_bet(
     bet_id: str,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories)
 ):
     """予想詳細取得"""
     user_id = current_user["id"]
 
     try:
-        result = supabase.table("bets").select(
-            "*, races(*)"
-        ).eq("id", bet_id).eq("user_id", user_id).single().execute()
+        bet = await repos.bets.get(user_id, bet_id)
 
-        if not result.data:
+        if not bet:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Bet not found"
             )
 
-        return {"bet": result.data}
+        return {"bet": bet}
 
     except HTTPException:
         raise
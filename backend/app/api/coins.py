@@ -1,18 +1,23 @@
 """コイン関連API"""
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from supabase import Client
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from redis.asyncio import Redis
 from loguru import logger
 from typing import Optional
-from datetime import datetime, timezone
 
-from app.dependencies import get_supabase, get_current_user
+from app.dependencies import get_repositories, get_redis, get_current_user
+from app.repositories import TRANSACTION_ORDER, Repositories
+from app.services.bonus_limits import bonus_limits
+from app.services.clock import jst_day_start, utc_now
+from app.services.leaderboard import leaderboard
+from app.services.ledger import ledger_writer
+from app.services.pagination import CountMode
+from app.services.user_cache import user_cache
 from app.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
-
 @router.get("/coins/balance")
 async def get_balance(
     current_user: dict = Depends(get_current_user)
@@ -26,44 +31,37 @@ async def get_transactions(
     type: Optional[str] = Query(None, description="種類 (earn, spend, purchase, bonus)"),
     start_date: Optional[str] = Query(None, description="開始日 (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="終了日 (YYYY-MM-DD)"),
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, description="前ページのnextCursor"),
+    page: int = Query(1, ge=1, description="ページ番号（cursor未指定時のみ）"),
     limit: int = Query(20, ge=1, le=100),
+    count: CountMode = Query("estimated", description="総件数 (exact, estimated, none)"),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories)
 ):
     """コイン取引履歴取得"""
     user_id = current_user["id"]
 
     try:
-        query = supabase.table("coin_transactions").select(
-            "*", count="exact"
-        ).eq("user_id", user_id)
-
-        if type:
-            query = query.eq("type", type)
-        if start_date:
-            query = query.gte("created_at", f"{start_date}T00:00:00Z")
-        if end_date:
-            query = query.lte("created_at", f"{end_date}T23:59:59Z")
-
-        offset = (page - 1) * limit
-        query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
-
-        result = query.execute()
+        rows, total = await repos.coin_transactions.list(
+            user_id,
+            type=type,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            page=page,
+            limit=limit,
+            count=count,
+        )
 
-        total = result.count or 0
-        total_pages = (total + limit - 1) // limit
+        transactions, pagination = TRANSACTION_ORDER.paginate(rows, limit, page, total, count)
 
         return {
-            "transactions": result.data or [],
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "totalPages": total_pages
-            }
+            "transactions": transactions,
+            "pagination": pagination
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get transactions: {e}")
         raise HTTPException(
@@ -75,62 +73,74 @@ async def get_transactions(
 @router.post("/coins/bonus/daily")
 async def claim_daily_bonus(
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
 ):
     """デイリーボーナス獲得（ログインボーナスと同じ処理）"""
     # ログインボーナスと統合されているため、users.pyのlogin_bonusを使用
     # このエンドポイントはレガシー互換性のために残す
     from app.api.users import claim_login_bonus
-    return await claim_login_bonus(current_user, supabase)
+    return await claim_login_bonus(current_user, repos, redis)
 
 
 @router.post("/coins/bonus/ad")
 async def claim_ad_bonus(
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
 ):
-    """広告視聴ボーナス獲得"""
+    """広告視聴ボーナス獲得
+
+    今日（JST）の受け取り回数はRedisのカウンターで判定する。
+    同じ Idempotency-Key での再送には前回のレスポンスを返す。
+    """
     user_id = current_user["id"]
-    current_coins = current_user.get("coins", 0)
 
-    try:
-        now = datetime.now(timezone.utc)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    replayed = await bonus_limits.replay_ad(redis, user_id, idempotency_key)
+    if replayed is not None:
+        response.headers["Idempotency-Replayed"] = "true"
+        return replayed
+
+    # 今日の広告視聴回数を確認（今回の分を含めて数える）
+    claimed_count = await bonus_limits.claim_ad(redis, user_id)
 
-        # 今日の広告視聴回数を確認
-        ad_views = supabase.table("advertisement_views").select(
-            "id", count="exact"
-        ).eq("user_id", user_id).gte(
-            "viewed_at", today_start.isoformat()
-        ).execute()
+    try:
+        now = utc_now()
 
-        view_count = ad_views.count or 0
+        if claimed_count is not None:
+            view_count = claimed_count - 1
+        else:
+            view_count = await repos.advertisement_views.count_since(user_id, jst_day_start(now))
 
         if view_count >= settings.AD_VIEW_MAX_PER_DAY:
             return {
                 "message": f"Daily ad view limit reached ({settings.AD_VIEW_MAX_PER_DAY})",
-                "coins": current_coins,
+                "coins": current_user.get("coins", 0),
                 "bonus_claimed": False,
                 "remaining_views": 0
             }
 
+        # コインを加算（残高はDBで加算した結果を使う）
         bonus = settings.AD_VIEW_COINS
-        new_coins = current_coins + bonus
-
-        # 広告視聴履歴を記録
-        supabase.table("advertisement_views").insert({
+        updated_user = await repos.users.credit(user_id, bonus)
+        if updated_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        new_coins = updated_user["coins"]
+        await user_cache.invalidate(redis, user_id)
+        await leaderboard.update_user(redis, updated_user)
+
+        # 広告視聴履歴・コイン取引履歴を記録（監査用、非同期で書き込む）
+        await ledger_writer.record(redis, repos, {
             "user_id": user_id,
             "ad_type": "video",
             "coins_earned": bonus,
             "viewed_at": now.isoformat()
-        }).execute()
-
-        # コインを更新
-        supabase.table("users").update({
-            "coins": new_coins
-        }).eq("id", user_id).execute()
-
-        # コイン取引履歴を記録
+        }, table="advertisement_views")
         transaction = {
             "user_id": user_id,
             "type": "bonus",
@@ -139,21 +149,29 @@ async def claim_ad_bonus(
             "reason": "広告視聴ボーナス",
             "created_at": now.isoformat()
         }
-        supabase.table("coin_transactions").insert(transaction).execute()
+        await ledger_writer.record(redis, repos, transaction)
 
         remaining_views = settings.AD_VIEW_MAX_PER_DAY - view_count - 1
 
         logger.info(f"Ad bonus claimed: user={user_id}, bonus={bonus}")
 
-        return {
+        result = {
             "message": "広告視聴ボーナスを獲得しました",
             "coins": new_coins,
             "bonus": bonus,
             "bonus_claimed": True,
             "remaining_views": remaining_views
         }
+        await bonus_limits.remember_ad(redis, user_id, idempotency_key, result)
+        return result
 
+    except HTTPException:
+        if claimed_count is not None:
+            await bonus_limits.release_ad(redis, user_id)
+        raise
     except Exception as e:
+        if claimed_count is not None:
+            await bonus_limits.release_ad(redis, user_id)
         logger.error(f"Failed to claim ad bonus: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
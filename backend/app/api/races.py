@@ -1,62 +1,97 @@
 """レース関連API"""
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from supabase import Client
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from loguru import logger
+from redis.asyncio import Redis
 from typing import Optional
-from datetime import date
 
-from app.dependencies import get_supabase, get_current_user
+from app.dependencies import get_repositories, get_current_user, get_redis
 from app.models.race import RaceListResponse, RaceDetailResponse
+from app.repositories import RACE_ORDER, Repositories
+from app.services.clock import jst_today
+from app.services.pagination import CountMode
+from app.services.projection import RACES, build_select
+from app.services.response_cache import (
+    LIST_SCOPE,
+    cache_key,
+    is_final_race,
+    race_scope,
+    response_cache,
+)
 
 router = APIRouter()
 
+def is_past_date(race_date: Optional[str]) -> bool:
+    """JSTで前日以前の日付か"""
+    return bool(race_date) and race_date < jst_today().isoformat()
+
 
 @router.get("/races", response_model=RaceListResponse)
 async def get_races(
     race_date: Optional[str] = Query(None, description="日付 (YYYY-MM-DD)"),
     venue: Optional[str] = Query(None, description="競馬場名"),
-    status: Optional[str] = Query(None, description="状態 (upcoming, betting, running, finished)"),
-    page: int = Query(1, ge=1, description="ページ番号"),
+    race_status: Optional[str] = Query(None, alias="status", description="状態 (upcoming, betting, running, finished)"),
+    cursor: Optional[str] = Query(None, description="前ページのnextCursor"),
+    page: int = Query(1, ge=1, description="ページ番号（cursor未指定時のみ）"),
     limit: int = Query(20, ge=1, le=100, description="1ページあたりの件数"),
+    count: CountMode = Query("estimated", description="総件数 (exact, estimated, none)"),
+    view: str = Query("full", description="表現 (full, summary)"),
+    fields: Optional[str] = Query(None, description="取得する列 (例: id,race_name,horses.name)"),
+    include: Optional[str] = Query(None, description="埋め込むリソース (horses, race_results)"),
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Optional[Redis] = Depends(get_redis)
 ):
     """レース一覧取得"""
-    try:
-        # クエリを構築
-        query = supabase.table("races").select(
-            "*, horses(*)",
-            count="exact"
+    if race_status:
+        race_status = race_status.lower()
+    select = build_select(RACES, view=view, fields=fields, include=include)
+
+    async def build():
+        rows, total = await repos.races.list(
+            select,
+            date=race_date,
+            venue=venue,
+            status=race_status,
+            cursor=cursor,
+            page=page,
+            limit=limit,
+            count=count,
         )
 
-        # フィルター適用
-        if race_date:
-            query = query.eq("date", race_date)
-        if venue:
-            query = query.eq("venue", venue)
-        if status:
-            query = query.eq("status", status)
-
-        # ページネーション
-        offset = (page - 1) * limit
-        query = query.order("start_time").range(offset, offset + limit - 1)
-
-        result = query.execute()
-
-        total = result.count or 0
-        total_pages = (total + limit - 1) // limit
-
-        return RaceListResponse(
-            races=result.data or [],
-            pagination={
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "totalPages": total_pages
-            }
+        races, pagination = RACE_ORDER.paginate(rows, limit, page, total, count)
+
+        body = RaceListResponse(
+            races=races,
+            pagination=pagination
+        ).model_dump_json().encode()
+
+        # 過去日のレースがすべて確定していれば一覧も変化しない
+        final = (
+            is_past_date(race_date)
+            and bool(races)
+            and all(is_final_race(race) for race in races)
         )
+        return body, final
+
+    key = cache_key(
+        "races",
+        date=race_date,
+        venue=venue,
+        status=race_status,
+        cursor=cursor,
+        page=None if cursor else page,
+        limit=limit,
+        count=count,
+        select=select,
+    )
+    try:
+        cached = await response_cache.get_or_build(redis, key, LIST_SCOPE, build)
+        return cached.to_response(if_none_match)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get races: {e}")
         raise HTTPException(
@@ -68,22 +103,30 @@ async def get_races(
 @router.get("/races/{race_id}", response_model=RaceDetailResponse)
 async def get_race(
     race_id: str,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Optional[Redis] = Depends(get_redis)
 ):
     """レース詳細取得"""
-    try:
-        result = supabase.table("races").select(
-            "*, horses(*), race_results(*)"
-        ).eq("id", race_id).single().execute()
 
-        if not result.data:
+    async def build():
+        race = await repos.races.get(race_id)
+
+        if not race:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Race not found"
             )
 
-        return RaceDetailResponse(race=result.data)
+        body = RaceDetailResponse(race=race).model_dump_json().encode()
+        return body, is_final_race(race)
+
+    try:
+        cached = await response_cache.get_or_build(
+            redis, cache_key("race", id=race_id), race_scope(race_id), build
+        )
+        return cached.to_response(if_none_match)
 
     except HTTPException:
         raise
@@ -93,4 +136,3 @@ async def get_race(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch race"
         )
-
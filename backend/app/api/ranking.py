@@ -1,53 +1,66 @@
 """ランキング関連API"""
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from supabase import Client
+from redis.asyncio import Redis
 from loguru import logger
 from typing import Optional
 
-from app.dependencies import get_supabase, get_current_user
+from app.dependencies import get_repositories, get_redis, get_current_user
+from app.repositories import Repositories
+from app.services.clock import jst_today
+from app.services.leaderboard import WIN_RATE_MIN_BETS, leaderboard
 
 router = APIRouter()
 
+PROFIT_PERIODS = ("daily", "weekly", "monthly", "all")
+
+# 期間ごとの rankings の列（収支, 順位）
+PERIOD_COLUMNS = {
+    "weekly": ("weekly_profit", "weekly_rank"),
+    "monthly": ("monthly_profit", "monthly_rank"),
+}
+
 
 @router.get("/ranking/assets")
 async def get_assets_ranking(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Optional[Redis] = Depends(get_redis)
 ):
     """総資産ランキング取得"""
     try:
         offset = (page - 1) * limit
 
-        # ランキング取得
-        result = supabase.table("users").select(
-            "id, display_name, avatar, coins",
-            count="exact"
-        ).order("coins", desc=True).range(offset, offset + limit - 1).execute()
+        # ランキング取得（リーダーボード未構築の場合はDBから）
+        board = await leaderboard.page(redis, "assets", offset, limit, current_user["id"])
+        if board is not None:
+            users, total, rank = board.rows, board.total, board.my_rank
+        else:
+            users, total = await repos.users.top("coins", "id, display_name, avatar, coins", offset, limit)
+            rank = await repos.users.rank_by_coins(current_user["id"])
 
-        total = result.count or 0
         total_pages = (total + limit - 1) // limit
 
         # ランキングにランク番号を付与
         ranking = []
-        for i, user in enumerate(result.data or []):
+        for i, user in enumerate(users):
             ranking.append({
                 "rank": offset + i + 1,
-                "user": user
+                "user": {
+                    "id": user["id"],
+                    "display_name": user.get("display_name"),
+                    "avatar": user.get("avatar"),
+                    "coins": user.get("coins", 0)
+                }
             })
 
-        # 自分のランクを取得
+        # 自分のランク
         my_rank = None
-        my_rank_result = supabase.rpc(
-            "get_user_rank_by_coins",
-            {"target_user_id": current_user["id"]}
-        ).execute()
-
-        if my_rank_result.data:
+        if rank:
             my_rank = {
-                "rank": my_rank_result.data,
+                "rank": rank,
                 "coins": current_user.get("coins", 0)
             }
 
@@ -76,39 +89,63 @@ async def get_profit_ranking(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Optional[Redis] = Depends(get_redis)
 ):
-    """収支ランキング取得"""
+    """収支ランキング取得
+
+    all はリーダーボード、daily は日別集計、weekly / monthly は rankings から返す。
+    """
+    if period not in PROFIT_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid period: {period}"
+        )
+
     try:
         offset = (page - 1) * limit
+        user_id = current_user["id"]
+
+        if period == "daily":
+            # 今日（JST）の日別集計
+            today = jst_today().isoformat()
+            users, total = await repos.rankings.daily(today, offset, limit)
+            my_net_profit, rank = await repos.rankings.daily_position(user_id, today)
+        elif period in PERIOD_COLUMNS:
+            profit_column, rank_column = PERIOD_COLUMNS[period]
+            users, total = await repos.rankings.period(profit_column, offset, limit)
+            my_net_profit, rank = await repos.rankings.period_position(user_id, profit_column, rank_column)
+        else:
+            # 収支計算: total_earnings - total_spent
+            my_net_profit = (current_user.get("total_earnings", 0) or 0) - (current_user.get("total_spent", 0) or 0)
+            board = await leaderboard.page(redis, "profit", offset, limit, user_id)
+            if board is not None:
+                users = [
+                    {**user, "net_profit": (user.get("total_earnings", 0) or 0) - (user.get("total_spent", 0) or 0)}
+                    for user in board.rows
+                ]
+                total, rank = board.total, board.my_rank
+            else:
+                # リーダーボード未構築の場合は rankings（定期更新）から返す
+                users, total = await repos.rankings.period("net_profit", offset, limit)
+                rank = None
 
-        # 収支計算: total_earnings - total_spent
-        # MVPでは簡易的にtotal_earningsとtotal_spentの差で計算
-        result = supabase.table("users").select(
-            "id, display_name, avatar, total_earnings, total_spent",
-            count="exact"
-        ).order("total_earnings", desc=True).range(offset, offset + limit - 1).execute()
-
-        total = result.count or 0
         total_pages = (total + limit - 1) // limit
 
         ranking = []
-        for i, user in enumerate(result.data or []):
-            net_profit = (user.get("total_earnings", 0) or 0) - (user.get("total_spent", 0) or 0)
+        for i, user in enumerate(users):
             ranking.append({
                 "rank": offset + i + 1,
                 "user": {
                     "id": user["id"],
                     "displayName": user.get("display_name"),
                     "avatar": user.get("avatar"),
-                    "netProfit": net_profit
+                    "netProfit": user["net_profit"]
                 }
             })
 
-        # 自分の収支を計算
-        my_net_profit = (current_user.get("total_earnings", 0) or 0) - (current_user.get("total_spent", 0) or 0)
         my_rank = {
-            "rank": None,  # TODO: 実際のランクを計算
+            "rank": rank,
             "netProfit": my_net_profit
         }
 
@@ -136,25 +173,28 @@ async def get_win_rate_ranking(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Optional[Redis] = Depends(get_redis)
 ):
     """的中率ランキング取得"""
     try:
         offset = (page - 1) * limit
 
-        # 10回以上予想しているユーザーのみ
-        result = supabase.table("users").select(
-            "id, display_name, avatar, win_rate, total_bets, total_wins",
-            count="exact"
-        ).gte("total_bets", 10).order("win_rate", desc=True).range(
-            offset, offset + limit - 1
-        ).execute()
+        # 一定回数以上予想しているユーザーのみ
+        board = await leaderboard.page(redis, "win_rate", offset, limit, current_user["id"])
+        if board is not None:
+            users, total, rank = board.rows, board.total, board.my_rank
+        else:
+            users, total = await repos.users.top(
+                "win_rate", "id, display_name, avatar, win_rate, total_bets, total_wins",
+                offset, limit, min_bets=WIN_RATE_MIN_BETS,
+            )
+            rank = None
 
-        total = result.count or 0
         total_pages = (total + limit - 1) // limit
 
         ranking = []
-        for i, user in enumerate(result.data or []):
+        for i, user in enumerate(users):
             ranking.append({
                 "rank": offset + i + 1,
                 "user": {
@@ -168,7 +208,7 @@ async def get_win_rate_ranking(
             })
 
         my_rank = {
-            "rank": None,
+            "rank": rank,
             "winRate": current_user.get("win_rate", 0),
             "totalBets": current_user.get("total_bets", 0),
             "totalWins": current_user.get("total_wins", 0)
@@ -0,0 +1,160 @@
+"""オッズ・レース状態の配信API
+
+レース単位（race_id、複数指定可）か開催日単位（date）で購読し、
+オッズの差分とレース状態の変更を受け取る。イベントの形式は app/services/race_stream.py を参照。
+
+- GET /api/stream/races: Server-Sent Events（Authorization ヘッダーで認証）
+- WS /api/stream/races/ws: WebSocket（サーバーからの送信のみ）。トークンはクエリ（token）か、
+  接続後の最初のメッセージ {"type": "auth", "token": ...} で送る
+
+ワーカーあたりの接続数が STREAM_MAX_CONNECTIONS に達している場合、SSEは503を返し、
+WebSocketは1013で切断する。
+"""
+
+import asyncio
+import json
+from typing import List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
+
+from app.config import get_settings
+from app.dependencies import authenticate_token, get_current_user, get_redis
+from app.services.race_stream import StreamFull, day_topic, race_stream, race_topic
+
+settings = get_settings()
+
+router = APIRouter()
+
+
+def _topics(race_ids: Optional[List[str]], race_date: Optional[str]) -> Set[str]:
+    topics = {race_topic(race_id) for race_id in race_ids or []}
+    if race_date:
+        topics.add(day_topic(race_date))
+    if not topics:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="race_id or date is required",
+        )
+    if len(topics) > settings.STREAM_MAX_TOPICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many subscriptions (max {settings.STREAM_MAX_TOPICS})",
+        )
+    return topics
+
+
+def _require(redis: Optional[Redis]) -> Redis:
+    if redis is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Streaming is not available",
+        )
+    return redis
+
+
+@router.get("/stream/races")
+async def stream_races(
+    request: Request,
+    race_ids: Optional[List[str]] = Query(None, alias="race_id", description="レースID（複数指定可）"),
+    race_date: Optional[str] = Query(None, alias="date", description="日付 (YYYY-MM-DD)"),
+    current_user: dict = Depends(get_current_user),
+    redis: Optional[Redis] = Depends(get_redis),
+):
+    """オッズ・レース状態の変更を Server-Sent Events で配信"""
+    topics = _topics(race_ids, race_date)
+    try:
+        subscriber = race_stream.subscribe(_require(redis), topics)
+    except StreamFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(settings.STREAM_RETRY_MILLISECONDS // 1000 or 1)},
+        )
+
+    async def events():
+        try:
+            yield f"retry: {settings.STREAM_RETRY_MILLISECONDS}\n\n"
+            while not subscriber.closed.is_set():
+                message = await subscriber.next(settings.STREAM_HEARTBEAT_SECONDS)
+                # 取りこぼしが続いて閉じた場合は次のハートビートを待たずに終える
+                if subscriber.closed.is_set() or await request.is_disconnected():
+                    break
+                # 一定時間イベントがなければコメントを送り、中継サーバーに接続を切られないようにする
+                yield f"data: {message}\n\n" if message is not None else ": keepalive\n\n"
+        finally:
+            race_stream.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _receive_token(websocket: WebSocket) -> Optional[str]:
+    """接続後の最初のメッセージからトークンを受け取る（届かない・形式が違う場合はNone）"""
+    try:
+        message = await asyncio.wait_for(websocket.receive_text(), settings.STREAM_AUTH_TIMEOUT_SECONDS)
+        payload = json.loads(message)
+    except (asyncio.TimeoutError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("type") != "auth":
+        return None
+    token = payload.get("token")
+    return token if isinstance(token, str) else None
+
+
+@router.websocket("/stream/races/ws")
+async def stream_races_ws(
+    websocket: WebSocket,
+    race_ids: Optional[List[str]] = Query(None, alias="race_id"),
+    race_date: Optional[str] = Query(None, alias="date"),
+    token: Optional[str] = Query(None, description="アクセストークン（省略時は最初のメッセージで送る）"),
+    redis: Optional[Redis] = Depends(get_redis),
+):
+    """オッズ・レース状態の変更を WebSocket で配信"""
+    try:
+        topics = _topics(race_ids, race_date)
+        _require(redis)
+        # クエリのトークンは受け付ける前に検証する
+        if token is not None:
+            authenticate_token(token)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    await websocket.accept()
+    try:
+        if token is None:
+            token = await _receive_token(websocket)
+            try:
+                if token is None:
+                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+                authenticate_token(token)
+            except HTTPException as e:
+                await websocket.close(code=1008, reason=e.detail)
+                return
+
+        try:
+            subscriber = race_stream.subscribe(redis, topics)
+        except StreamFull:
+            await websocket.close(code=1013, reason="Too many connections")
+            return
+    except WebSocketDisconnect:
+        return
+
+    try:
+        while not subscriber.closed.is_set():
+            message = await subscriber.next(settings.STREAM_HEARTBEAT_SECONDS)
+            if message is not None:
+                await websocket.send_text(message)
+            elif not subscriber.closed.is_set():
+                await websocket.send_text('{"type":"ping"}')
+        # 受信が遅く取りこぼしが続いた
+        await websocket.close(code=1013, reason="Too slow")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        race_stream.unsubscribe(subscriber)
@@ -1,12 +1,20 @@
 """ユーザー関連API"""
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from redis.asyncio import Redis
 from loguru import logger
 from datetime import datetime, timezone
 
-from app.dependencies import get_supabase, verify_token, get_current_user
+from app.dependencies import (
+    get_repositories, get_redis, verify_token, get_current_user, fetch_user
+)
+from app.repositories import Repositories
 from app.models.user import UserResponse, UserProfileResponse
+from app.services.bonus_limits import bonus_limits
+from app.services.clock import jst_day_start, parse_timestamp, utc_now
+from app.services.leaderboard import leaderboard
+from app.services.ledger import ledger_writer
+from app.services.user_cache import user_cache
 from app.config import get_settings
 
 router = APIRouter()
@@ -24,20 +32,21 @@ async def get_profile(
 @router.post("/user/register-bonus")
 async def claim_register_bonus(
     token_payload: dict = Depends(verify_token),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
 ):
     """新規登録ボーナスを付与（初回のみ）"""
     user_id = token_payload.get("sub")
 
     try:
         # ユーザーが既に存在するか確認
-        existing = supabase.table("users").select("id, coins").eq("id", user_id).execute()
+        existing = await repos.users.get(user_id)
 
-        if existing.data:
+        if existing:
             # 既存ユーザー
             return {
                 "message": "User already registered",
-                "coins": existing.data[0]["coins"],
+                "coins": existing["coins"],
                 "bonus_claimed": False
             }
 
@@ -55,7 +64,10 @@ async def claim_register_bonus(
             "created_at": datetime.now(timezone.utc).isoformat()
         }
 
-        result = supabase.table("users").insert(user_data).execute()
+        created = await repos.users.create(user_data)
+        if created:
+            await user_cache.set(redis, created)
+            await leaderboard.update_user(redis, created)
 
         # コイン取引履歴を記録
         transaction = {
@@ -66,7 +78,7 @@ async def claim_register_bonus(
             "reason": "新規登録ボーナス",
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        supabase.table("coin_transactions").insert(transaction).execute()
+        await ledger_writer.record(redis, repos, transaction)
 
         logger.info(f"New user registered with bonus: {user_id}")
 
@@ -87,30 +99,48 @@ async def claim_register_bonus(
 @router.post("/user/login-bonus")
 async def claim_login_bonus(
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
 ):
-    """ログインボーナスを付与"""
+    """ログインボーナスを付与
+
+    今日（JST）受け取り済みかはRedisのマーカーで判定し、受け取り済みの場合はDBを参照しない。
+    """
     user_id = current_user["id"]
 
+    # 今日既にログインボーナスを受け取っているか確認
+    claimed = await bonus_limits.claim_login(redis, user_id)
+    if claimed is False:
+        return {
+            "message": "Login bonus already claimed today",
+            "coins": current_user.get("coins", 0),
+            "bonus_claimed": False,
+            "consecutive_days": current_user.get("consecutive_login_days", 0)
+        }
+
     try:
-        now = datetime.now(timezone.utc)
+        # 連続ログイン日数は最新のユーザー行から数える
+        current_user = await fetch_user(repos, user_id)
+
+        now = utc_now()
+        today_start = jst_day_start(now)
         last_login = current_user.get("last_login_at")
         consecutive_days = current_user.get("consecutive_login_days", 0)
-        current_coins = current_user.get("coins", 0)
+        already_claimed = {
+            "message": "Login bonus already claimed today",
+            "coins": current_user.get("coins", 0),
+            "bonus_claimed": False,
+            "consecutive_days": consecutive_days
+        }
 
-        # 今日既にログインボーナスを受け取っているか確認
+        # マーカーがない場合（Redis未設定・再起動後）はDBの最終ログイン日時で判定
         if last_login:
-            last_login_date = datetime.fromisoformat(last_login.replace("Z", "+00:00"))
-            if last_login_date.date() == now.date():
-                return {
-                    "message": "Login bonus already claimed today",
-                    "coins": current_coins,
-                    "bonus_claimed": False,
-                    "consecutive_days": consecutive_days
-                }
+            last_login_start = jst_day_start(parse_timestamp(last_login))
+            if last_login_start == today_start:
+                return already_claimed
 
             # 連続ログイン日数の計算
-            days_diff = (now.date() - last_login_date.date()).days
+            days_diff = (today_start.date() - last_login_start.date()).days
             if days_diff == 1:
                 consecutive_days += 1
             else:
@@ -131,14 +161,19 @@ async def claim_login_bonus(
         elif consecutive_days >= 3:
             bonus += settings.LOGIN_BONUS_3_DAYS
 
-        new_coins = current_coins + bonus
-
-        # ユーザー情報を更新
-        supabase.table("users").update({
-            "coins": new_coins,
-            "consecutive_login_days": consecutive_days,
-            "last_login_at": now.isoformat()
-        }).eq("id", user_id).execute()
+        # コインの加算と最終ログイン日時の更新（今日ログイン済みなら更新されない）
+        updated_user = await repos.users.credit(
+            user_id,
+            bonus,
+            login_at=now,
+            consecutive_login_days=consecutive_days,
+            login_day_start=today_start,
+        )
+        if updated_user is None:
+            return already_claimed
+        new_coins = updated_user["coins"]
+        await user_cache.invalidate(redis, user_id)
+        await leaderboard.update_user(redis, updated_user)
 
         # コイン取引履歴を記録
         reason = f"ログインボーナス（{consecutive_days}日連続）"
@@ -150,7 +185,7 @@ async def claim_login_bonus(
             "reason": reason,
             "created_at": now.isoformat()
         }
-        supabase.table("coin_transactions").insert(transaction).execute()
+        await ledger_writer.record(redis, repos, transaction)
 
         logger.info(f"Login bonus claimed: user={user_id}, bonus={bonus}, consecutive_days={consecutive_days}")
 
@@ -162,7 +197,13 @@ async def claim_login_bonus(
             "consecutive_days": consecutive_days
         }
 
+    except HTTPException:
+        if claimed:
+            await bonus_limits.release_login(redis, user_id)
+        raise
     except Exception as e:
+        if claimed:
+            await bonus_limits.release_login(redis, user_id)
         logger.error(f"Failed to claim login bonus: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
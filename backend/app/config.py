@@ -16,14 +16,38 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = ""
     SUPABASE_KEY: str = ""
     SUPABASE_JWT_SECRET: str = ""
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0  # PostgREST リクエストタイムアウト
 
-    # Redis設定
+    # データアクセス（app/repositories）
+    DATA_BACKEND: str = "supabase"  # supabase / postgres（主要な操作をasyncpgで直接実行）/ memory（開発用）
+    DATABASE_URL: str = ""  # postgres の接続先（直接接続かセッションモードのプーラー）
+    DATABASE_POOL_MIN_SIZE: int = 2
+    DATABASE_POOL_MAX_SIZE: int = 10
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100  # 接続ごとのプリペアドステートメント数（トランザクションモードのプーラーでは0）
+
+    # Redis設定（空文字の場合はRedisを使わずプロセス内キャッシュのみ）
     REDIS_URL: str = "redis://localhost:6379"
 
+    # キャッシュ設定
+    USER_CACHE_TTL_SECONDS: int = 30  # ユーザー情報（Redis）
+    USER_CACHE_LOCAL_TTL_SECONDS: float = 3.0  # ユーザー情報（プロセス内）
+    USER_CACHE_MAX_SIZE: int = 10000  # ユーザー情報（プロセス内の最大件数）
+    TOKEN_CACHE_MAX_SIZE: int = 10000  # 検証済みJWT（プロセス内の最大件数）
+
     # Celery設定
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
 
+    # メトリクス
+    METRICS_ENABLED: bool = True  # GET /metrics（Prometheus）とリクエストの計測
+    METRICS_TOKEN: str = ""  # GET /metrics の Bearer トークン（空文字の場合は /metrics を公開しない）
+
+    # DB呼び出しのトレース（リクエストごと）
+    DB_TRACE_ENABLED: bool = True  # 呼び出し回数の警告
+    DB_TRACE_SERVER_TIMING: bool = False  # 応答に Server-Timing ヘッダーを付ける（テーブル名が出るため開発環境のみ）
+    DB_TRACE_BUDGET: int = 5  # 1リクエストのDB呼び出し回数の上限（超えたら警告）
+    DB_TRACE_REPEAT_LIMIT: int = 1  # 同じ操作の呼び出し回数の上限（超えたら N+1 の疑いとして警告）
+
     # CORS設定
     ALLOWED_ORIGINS: list[str] = [
         "http://localhost:3000",
@@ -44,6 +68,62 @@ class Settings(BaseSettings):
     MIN_BET_AMOUNT: int = 10  # 最小賭け金
     MAX_BET_AMOUNT: int = 10000  # 最大賭け金（通常ユーザー）
     MAX_BET_AMOUNT_PREMIUM: int = 50000  # 最大賭け金（プレミアム）
+    BET_BATCH_MAX_TICKETS: int = 2000  # 一括予想の最大点数
+    BETTING_OPENS_MINUTES_BEFORE: int = 30  # 予想受付開始（レース開始の何分前）
+    BETTING_CLOSES_MINUTES_BEFORE: int = 5  # 予想受付終了（レース開始の何分前）
+    LIFECYCLE_SYNC_SECONDS: int = 60  # レースの状態遷移の予定をDBから読み直す間隔
+    OPEN_RACES_LOCAL_TTL_SECONDS: float = 1.0  # プロセス内の受付時間帯のバージョン確認間隔
+
+    # オッズ設定
+    ODDS_TTL_SECONDS: int = 24 * 60 * 60  # 公開オッズの保持期間
+    ODDS_LOCAL_TTL_SECONDS: float = 1.0  # プロセス内スナップショットのバージョン確認間隔
+    ODDS_CACHE_MAX_RACES: int = 500  # プロセス内に保持するレース数
+    ODDS_POLL_INTERVAL_RATIO: float = 0.1  # 更新間隔（受付終了までの残り時間に対する割合）
+    ODDS_POLL_MIN_INTERVAL_SECONDS: float = 10.0  # 更新間隔の下限（受付終了直前）
+    ODDS_POLL_MAX_INTERVAL_SECONDS: float = 300.0  # 更新間隔の上限（受付終了まで時間がある場合）
+    ODDS_MAX_CONCURRENT_UPDATES: int = 8  # 同時に実行するオッズ更新の最大数
+    ODDS_UPDATE_TIMEOUT_SECONDS: int = 60  # 終了が報告されないオッズ更新を実行中から外すまでの時間
+    ODDS_SCHEDULER_TICK_SECONDS: int = 5  # 更新時刻を確認する間隔
+    ODDS_SCHEDULER_SYNC_SECONDS: int = 60  # 受付中のレースをDBから読み直す間隔
+
+    # レースAPIのレスポンスキャッシュ
+    RACE_CACHE_TTL_SECONDS: int = 300  # 未確定レースのレスポンス（世代番号で無効化）
+    RACE_CACHE_FINAL_TTL_SECONDS: int = 7 * 24 * 60 * 60  # 確定済みレースのレスポンス
+    RACE_CACHE_GENERATION_TTL_SECONDS: float = 1.0  # 世代番号の確認間隔
+    RACE_CACHE_MAX_ENTRIES: int = 2000  # プロセス内に保持するレスポンス数
+
+    # オッズ・レース状態の配信
+    STREAM_QUEUE_SIZE: int = 100  # 1クライアントの送信待ちの上限（超えたら未送信分を捨てて resync）
+    STREAM_MAX_OVERFLOWS: int = 3  # 送信待ちが溢れた回数がこれに達したら切断
+    STREAM_HEARTBEAT_SECONDS: float = 15.0  # イベントがない場合に生存確認を送る間隔
+    STREAM_RETRY_MILLISECONDS: int = 3000  # SSEの再接続までの待ち時間
+    STREAM_MAX_TOPICS: int = 50  # 1接続で購読できるレース・開催日の数
+    STREAM_MAX_CONNECTIONS: int = 1000  # ワーカーあたりの配信の接続数の上限（0で無制限、超えたらSSEは503・WebSocketは1013で切断）
+    STREAM_AUTH_TIMEOUT_SECONDS: float = 10.0  # WebSocketでトークンを最初のメッセージで送る場合の待ち時間
+
+    # コイン取引履歴の書き込み（write-behind）
+    LEDGER_BATCH_SIZE: int = 500  # 1回のINSERTで書き込む最大件数
+    LEDGER_FLUSH_INTERVAL_SECONDS: float = 1.0  # 件数に満たない場合に書き込むまでの最大待ち時間
+    LEDGER_CLAIM_IDLE_SECONDS: float = 60.0  # 停止したワーカーの未ACK記録を引き取るまでの時間
+    LEDGER_MAX_DELIVERIES: int = 5  # 書き込めない記録を再送する上限（超えたらデッドレターに移す）
+
+    # スクレイピング設定
+    SCRAPER_BASE_URL: str = "https://race.netkeiba.com"
+    SCRAPER_USER_AGENT: str = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+    )
+    SCRAPER_BROWSER_CONTEXTS: int = 4  # 使い回すブラウザコンテキスト数
+    SCRAPER_CONTEXT_MAX_PAGES: int = 100  # コンテキストを作り直すまでのページ数
+    SCRAPER_HOST_CONCURRENCY: int = 2  # ホストごとの同時リクエスト数
+    SCRAPER_HOST_RATE: float = 0.3  # ホストごとの平均リクエスト数/秒（0以下で無制限）
+    SCRAPER_HOST_BURST: int = 2  # ホストごとに連続で送れるリクエスト数
+    SCRAPER_RETRY_ATTEMPTS: int = 4  # 一時的なエラーの最大試行回数
+    SCRAPER_TIMEOUT_SECONDS: float = 30.0  # 1ページの読み込みタイムアウト
+    SCRAPER_STORE_DIR: str = "data/pages"  # 取得したページの保存先（空文字の場合は保存しない）
+
+    # 精算設定
+    SETTLEMENT_CHUNK_SIZE: int = 5000  # 1回のRPCで精算する予想の件数
 
     class Config:
         env_file = ".env"
@@ -1,21 +1,35 @@
 """依存性注入"""
 
+import asyncio
+import hashlib
+import hmac
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
 from jose import jwt, JWTError
 from loguru import logger
+from redis.asyncio import Redis, from_url as redis_from_url
 
 from app.config import get_settings
+from app.repositories import Repositories
+from app.repositories.instrumented import instrument
+from app.repositories.supabase import supabase_repositories
+from app.services.cache import TTLCache
+from app.services.db_trace import trace_http
+from app.services.user_cache import user_cache
 
 settings = get_settings()
 security = HTTPBearer()
 
-# Supabaseクライアント
-_supabase_client: Client | None = None
+# Supabaseクライアント（非同期）
+# PostgREST への HTTP/2 コネクションプールをワーカー内の全リクエストで共有する
+_supabase_client: AsyncClient | None = None
+_supabase_lock = asyncio.Lock()
 
 
-def get_supabase() -> Client:
+async def get_supabase() -> AsyncClient:
     """Supabaseクライアントを取得"""
     global _supabase_client
     if _supabase_client is None:
@@ -24,18 +38,114 @@ def get_supabase() -> Client:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Supabase configuration is missing"
             )
-        _supabase_client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_KEY
-        )
+        async with _supabase_lock:
+            if _supabase_client is None:
+                _supabase_client = await acreate_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_KEY,
+                    options=AsyncClientOptions(
+                        postgrest_client_timeout=settings.SUPABASE_TIMEOUT_SECONDS
+                    )
+                )
+                # PostgREST への1リクエストごとにリクエストのトレースへ記録する
+                trace_http(_supabase_client.postgrest.session)
     return _supabase_client
 
 
+async def close_supabase() -> None:
+    """Supabaseクライアントのコネクションプールを閉じる"""
+    global _supabase_client
+    if _supabase_client is not None:
+        await _supabase_client.postgrest.aclose()
+        _supabase_client = None
+
+
+# データアクセスのリポジトリ（DATA_BACKEND で選んだバックエンド）
+_repositories: Repositories | None = None
+_repositories_lock = asyncio.Lock()
+
+
+async def _create_repositories() -> Repositories:
+    if settings.DATA_BACKEND == "memory":
+        from app.repositories.memory import memory_repositories
+        return memory_repositories()
+
+    supabase = await get_supabase()
+    if settings.DATA_BACKEND == "supabase":
+        return supabase_repositories(supabase)
+    if settings.DATA_BACKEND == "postgres":
+        if not settings.DATABASE_URL:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Database configuration is missing"
+            )
+        from app.repositories.postgres import create_pool, postgres_repositories
+        pool = await create_pool(
+            settings.DATABASE_URL,
+            min_size=settings.DATABASE_POOL_MIN_SIZE,
+            max_size=settings.DATABASE_POOL_MAX_SIZE,
+            statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+        )
+        return postgres_repositories(supabase, pool)
+    raise ValueError(f"Unknown DATA_BACKEND: {settings.DATA_BACKEND}")
+
+
+async def get_repositories() -> Repositories:
+    """リポジトリを取得"""
+    global _repositories
+    if _repositories is None:
+        async with _repositories_lock:
+            if _repositories is None:
+                _repositories = instrument(await _create_repositories(), settings.DATA_BACKEND)
+    return _repositories
+
+
+async def close_repositories() -> None:
+    """リポジトリのコネクションプールを閉じる"""
+    global _repositories
+    if _repositories is not None:
+        await _repositories.close()
+        _repositories = None
+
+
+# Redisクライアント（非同期）
+_redis_client: Redis | None = None
+
+
+def get_redis() -> Redis | None:
+    """Redisクライアントを取得（REDIS_URL未設定の場合はNone）"""
+    global _redis_client
+    if _redis_client is None and settings.REDIS_URL:
+        _redis_client = redis_from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+async def close_redis() -> None:
+    """Redisクライアントを閉じる"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
+
+
+# 検証済みJWTのキャッシュ（トークンのダイジェスト → ペイロード、expまで保持）
+token_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=0)
+
+
 async def verify_token(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """Supabase JWTトークンを検証"""
-    token = credentials.credentials
+    return decode_token(credentials.credentials)
+
+
+def decode_token(token: str) -> dict:
+    """Supabase JWTトークンを検証してペイロードを返す"""
+    digest = hashlib.sha256(token.encode()).digest()
+
+    cached = token_cache.get(digest)
+    if cached is not None:
+        return cached
 
     if not settings.SUPABASE_JWT_SECRET:
         logger.warning("SUPABASE_JWT_SECRET is not configured")
@@ -51,6 +161,12 @@ async def verify_token(
             algorithms=["HS256"],
             audience="authenticated"
         )
+        # 有効期限のあるトークンのみキャッシュする
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            remaining = exp - time.time()
+            if remaining > 0:
+                token_cache.set(digest, payload, ttl=remaining)
         return payload
     except JWTError as e:
         logger.error(f"JWT verification failed: {e}")
@@ -60,31 +176,71 @@ async def verify_token(
         )
 
 
-async def get_current_user(
-    token_payload: dict = Depends(verify_token),
-    supabase: Client = Depends(get_supabase)
-) -> dict:
-    """現在のユーザー情報を取得"""
-    user_id = token_payload.get("sub")
+metrics_security = HTTPBearer(auto_error=False)
 
-    if not user_id:
+
+async def verify_metrics_token(
+    credentials: HTTPAuthorizationCredentials | None = Depends(metrics_security)
+) -> None:
+    """GET /metrics のトークンを確認（METRICS_TOKEN 未設定の場合は公開しない）"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials, settings.METRICS_TOKEN):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload"
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
         )
 
+
+async def fetch_user(repos: Repositories, user_id: str) -> dict:
+    """usersテーブルからユーザー行を取得"""
     try:
-        result = supabase.table("users").select("*").eq("id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        return result.data
+        user = await repos.users.get(user_id)
     except Exception as e:
         logger.error(f"Failed to get user: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get user information"
         )
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+
+def _get_user_id(token_payload: dict) -> str:
+    """トークンのペイロードからユーザーIDを取得"""
+    user_id = token_payload.get("sub")
+
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token payload"
+        )
+    return user_id
+
+
+def authenticate_token(token: str) -> str:
+    """トークンを検証してユーザーIDを返す（Authorization ヘッダーを使えないWebSocket用）"""
+    return _get_user_id(decode_token(token))
+
+
+async def get_current_user(
+    token_payload: dict = Depends(verify_token),
+    repos: Repositories = Depends(get_repositories),
+    redis: Redis | None = Depends(get_redis)
+) -> dict:
+    """現在のユーザー情報を取得（キャッシュ優先）"""
+    user_id = _get_user_id(token_payload)
+
+    user = await user_cache.get(redis, user_id)
+    if user is not None:
+        return user
+
+    user = await fetch_user(repos, user_id)
+    await user_cache.set(redis, user)
+    return user
 
@@ -1,11 +1,19 @@
 """FastAPI メインアプリケーション"""
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from app.config import get_settings
-from app.api import races, bets, coins, ranking, users
+from app.dependencies import close_repositories, close_supabase, close_redis, token_cache, verify_metrics_token
+from app.api import races, bets, coins, ranking, users, stream
+from app.services.db_trace import DBTraceMiddleware
+from app.services.metrics import MetricsMiddleware, cache_collector, mark_process_dead, register_collectors, render
+from app.services.odds_cache import odds_cache
+from app.services.race_stream import race_stream
+from app.services.response_cache import response_cache
+from app.services.user_cache import user_cache
 
 settings = get_settings()
 
@@ -27,6 +35,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# DB呼び出しのトレース（呼び出し回数の警告、Server-Timing ヘッダー）
+if settings.DB_TRACE_ENABLED:
+    app.add_middleware(
+        DBTraceMiddleware,
+        budget=settings.DB_TRACE_BUDGET,
+        repeat_limit=settings.DB_TRACE_REPEAT_LIMIT,
+        server_timing=settings.DB_TRACE_SERVER_TIMING,
+    )
+
+# メトリクス（最も外側で計測する）
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    register_collectors()
+    cache_collector.register("token", token_cache)
+    cache_collector.register("user", user_cache.local)
+    cache_collector.register("race_response", response_cache.local)
+    cache_collector.register("race_generation", response_cache.generations)
+    cache_collector.register("odds", odds_cache.checked)
+
 
 # ルーターの登録
 app.include_router(users.router, prefix="/api", tags=["users"])
@@ -34,6 +61,7 @@ app.include_router(races.router, prefix="/api", tags=["races"])
 app.include_router(bets.router, prefix="/api", tags=["bets"])
 app.include_router(coins.router, prefix="/api", tags=["coins"])
 app.include_router(ranking.router, prefix="/api", tags=["ranking"])
+app.include_router(stream.router, prefix="/api", tags=["stream"])
 
 
 @app.get("/")
@@ -52,6 +80,14 @@ async def health_check():
     return {"status": "healthy"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_metrics_token)])
+    async def metrics():
+        """Prometheus メトリクス"""
+        body, content_type = await run_in_threadpool(render)
+        return Response(content=body, media_type=content_type)
+
+
 @app.on_event("startup")
 async def startup_event():
     """アプリケーション起動時の処理"""
@@ -62,4 +98,9 @@ async def startup_event():
 async def shutdown_event():
     """アプリケーション終了時の処理"""
     logger.info("Shutting down application")
+    await race_stream.close()
+    await close_repositories()
+    await close_supabase()
+    await close_redis()
+    mark_process_dead()
 
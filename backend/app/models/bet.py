@@ -1,18 +1,48 @@
 """予想関連モデル"""
 
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Annotated, Optional, List, Any
 from datetime import datetime
 
+from app.config import get_settings
+
+settings = get_settings()
+
+# 馬番の上限（最大出走頭数）
+MAX_HORSE_NUMBER = 18
+
+# 1点あたりの最大選択頭数（3連複・3連単）
+MAX_SELECTIONS = 3
+
+HorseNumber = Annotated[int, Field(ge=1, le=MAX_HORSE_NUMBER)]
+
 
 class BetCreate(BaseModel):
     """予想作成リクエスト"""
     race_id: str
     bet_type: str = Field(..., description="win, place, exacta, wide, trio, trifecta")
-    selections: List[int] = Field(..., description="選択した馬番")
+    selections: List[HorseNumber] = Field(..., max_length=MAX_SELECTIONS, description="選択した馬番")
     amount: int = Field(..., ge=10, description="賭け金")
 
 
+class BetBatchCreate(BaseModel):
+    """一括予想作成リクエスト
+
+    tickets（買い目の明示指定）・box（ボックス）・formation（フォーメーション）の
+    いずれか1つ以上を指定する。展開結果は重複を除いて結合される。
+    """
+    race_id: str
+    bet_type: str = Field(..., description="win, place, exacta, wide, trio, trifecta")
+    amount: int = Field(..., ge=10, description="1点あたりの賭け金")
+    tickets: Optional[List[Annotated[List[HorseNumber], Field(max_length=MAX_SELECTIONS)]]] = Field(
+        None, max_length=settings.BET_BATCH_MAX_TICKETS, description="買い目のリスト"
+    )
+    box: Optional[List[HorseNumber]] = Field(None, max_length=MAX_HORSE_NUMBER, description="ボックス買いの馬番")
+    formation: Optional[List[Annotated[List[HorseNumber], Field(max_length=MAX_HORSE_NUMBER)]]] = Field(
+        None, max_length=MAX_SELECTIONS, description="着順ごとの候補馬番"
+    )
+
+
 class Bet(BaseModel):
     """予想情報"""
     id: str
@@ -37,6 +67,14 @@ class BetResponse(BaseModel):
     user: dict
 
 
+class BetBatchResponse(BaseModel):
+    """一括予想作成レスポンス"""
+    bets: List[Any]
+    count: int
+    total_amount: int
+    user: dict
+
+
 class BetListResponse(BaseModel):
     """予想一覧レスポンス"""
     bets: List[Any]
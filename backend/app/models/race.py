@@ -60,11 +60,18 @@ class Race(BaseModel):
 
 
 class Pagination(BaseModel):
-    """ページネーション情報"""
+    """ページネーション情報
+
+    total は count=exact の場合のみ正確な件数（estimated の場合は推定、none の場合はNone）。
+    次ページは nextCursor を cursor に指定して取得する。
+    """
     page: int
     limit: int
-    total: int
-    totalPages: int
+    total: Optional[int] = None
+    totalPages: Optional[int] = None
+    estimated: bool = False
+    hasMore: bool = False
+    nextCursor: Optional[str] = None
 
 
 class RaceListResponse(BaseModel):
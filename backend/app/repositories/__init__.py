@@ -0,0 +1,11 @@
+"""データアクセスのリポジトリ"""
+
+from app.repositories.base import (
+    BET_ORDER,
+    RACE_ORDER,
+    TRANSACTION_ORDER,
+    Repositories,
+    RepositoryError,
+)
+
+__all__ = ["BET_ORDER", "RACE_ORDER", "TRANSACTION_ORDER", "Repositories", "RepositoryError"]
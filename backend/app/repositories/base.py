@@ -0,0 +1,207 @@
+"""リポジトリのインターフェース
+
+ルーターはテーブルを直接問い合わせず、ここで定義するリポジトリを通して読み書きする。
+実装（バックエンド）は DATA_BACKEND で選ぶ（app/dependencies.py の get_repositories）。
+
+- 一覧は (行, 総件数) を返す。総件数は count が "none" の場合 None
+- 行が見つからない場合は None を返す（例外にしない）
+- 業務エラー（place_bet の betting_closed など）は RepositoryError で返す。それ以外のDBエラーはそのまま送出する
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Protocol, Tuple
+
+from app.services.pagination import CountMode, Keyset
+
+Rows = Tuple[List[dict], Optional[int]]
+
+# 一覧の並び順（カーソルの形式もこれで決まる）
+RACE_ORDER = Keyset("start_time")
+BET_ORDER = Keyset("created_at", desc=True)
+TRANSACTION_ORDER = Keyset("created_at", desc=True)
+
+
+# DB関数が RAISE EXCEPTION（SQLSTATE P0001）で返す業務エラーのコード
+RAISE_EXCEPTION = "P0001"
+BUSINESS_ERRORS = frozenset({"race_not_found", "betting_closed", "insufficient_coins", "invalid_selection"})
+
+
+def is_business_error(code: object, message: object) -> bool:
+    """RepositoryError に変換するエラーか（それ以外の DB エラーはそのまま送出する）"""
+    return code == RAISE_EXCEPTION and message in BUSINESS_ERRORS
+
+
+class RepositoryError(Exception):
+    """DB関数が返した業務エラー（message はエラーコード）"""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class RaceRepository(Protocol):
+    async def list(
+        self,
+        select: str,
+        *,
+        date: Optional[str] = None,
+        venue: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        count: CountMode = "estimated",
+    ) -> Rows:
+        """レース一覧（発走時刻順）"""
+        ...
+
+    async def get(self, race_id: str) -> Optional[dict]:
+        """レース詳細（出走馬 horses・結果 race_results を含む）"""
+        ...
+
+
+class HorseRepository(Protocol):
+    async def by_race(self, race_id: str) -> List[dict]:
+        """レースの出走馬（馬番順）"""
+        ...
+
+
+class BetRepository(Protocol):
+    async def place(self, params: dict) -> dict:
+        """予想作成（params は place_bet 関数の引数）"""
+        ...
+
+    async def place_batch(self, params: dict) -> dict:
+        """一括予想作成（params は place_bets_batch 関数の引数）"""
+        ...
+
+    async def list(
+        self,
+        user_id: str,
+        select: str,
+        *,
+        status: Optional[str] = None,
+        race_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        count: CountMode = "estimated",
+    ) -> Rows:
+        """ユーザーの予想履歴（新しい順）"""
+        ...
+
+    async def get(self, user_id: str, bet_id: str) -> Optional[dict]:
+        """ユーザーの予想（レース races を含む）"""
+        ...
+
+
+class UserRepository(Protocol):
+    async def get(self, user_id: str) -> Optional[dict]:
+        ...
+
+    async def create(self, user: dict) -> Optional[dict]:
+        ...
+
+    async def update(self, user_id: str, changes: dict) -> None:
+        ...
+
+    async def credit(
+        self,
+        user_id: str,
+        amount: int,
+        *,
+        login_at: Optional[datetime] = None,
+        consecutive_login_days: Optional[int] = None,
+        login_day_start: Optional[datetime] = None,
+    ) -> Optional[dict]:
+        """コインを加算して更新後の行を返す（credit_coins 関数、残高を読まずに1文で加算する）
+
+        login_day_start を指定した場合、その時刻以降にログイン済みなら加算せず None を返す。
+        """
+        ...
+
+    async def top(self, column: str, columns: str, offset: int, limit: int, min_bets: int = 0) -> Rows:
+        """column の降順の上位（min_bets 回以上予想したユーザーのみ、総件数は exact）"""
+        ...
+
+    async def rank_by_coins(self, user_id: str) -> Optional[int]:
+        ...
+
+
+class RankingRepository(Protocol):
+    """収支ランキング（user_daily_profits・rankings）
+
+    行は {id, display_name, avatar, net_profit}。
+    """
+
+    async def daily(self, day: str, offset: int, limit: int) -> Rows:
+        ...
+
+    async def daily_position(self, user_id: str, day: str) -> Tuple[int, Optional[int]]:
+        """(自分の収支, 順位)"""
+        ...
+
+    async def period(self, profit_column: str, offset: int, limit: int) -> Rows:
+        ...
+
+    async def period_position(self, user_id: str, profit_column: str, rank_column: str) -> Tuple[int, Optional[int]]:
+        """(自分の収支, 順位)"""
+        ...
+
+
+class CoinTransactionRepository(Protocol):
+    async def list(
+        self,
+        user_id: str,
+        *,
+        type: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        count: CountMode = "estimated",
+    ) -> Rows:
+        """ユーザーの取引履歴（新しい順）"""
+        ...
+
+    async def record(self, transactions: List[dict]) -> None:
+        """取引記録を追加（dedup_id が既存の記録は無視する）"""
+        ...
+
+
+class AdvertisementViewRepository(Protocol):
+    async def count_since(self, user_id: str, since: datetime) -> int:
+        ...
+
+    async def record(self, views: List[dict]) -> None:
+        """視聴記録を追加（dedup_id が既存の記録は無視する）"""
+        ...
+
+
+@dataclass
+class Repositories:
+    """バックエンド1つ分のリポジトリ"""
+
+    races: RaceRepository
+    horses: HorseRepository
+    bets: BetRepository
+    users: UserRepository
+    rankings: RankingRepository
+    coin_transactions: CoinTransactionRepository
+    advertisement_views: AdvertisementViewRepository
+    closer: Optional[Callable[[], Awaitable[None]]] = None
+
+    def ledger(self, table: str):
+        """取引記録を書き込むリポジトリ（coin_transactions / advertisement_views）"""
+        if table == "coin_transactions":
+            return self.coin_transactions
+        if table == "advertisement_views":
+            return self.advertisement_views
+        raise ValueError(f"Unsupported ledger table: {table}")
+
+    async def close(self) -> None:
+        """コネクションプールなどを閉じる"""
+        if self.closer is not None:
+            await self.closer()
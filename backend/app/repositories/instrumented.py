@@ -0,0 +1,61 @@
+"""リポジトリの計測
+
+リポジトリの非同期メソッドを包み、操作ごとの時間を db_call_duration_seconds に記録する
+（table はリポジトリ名、operation はメソッド名）。
+業務エラー（RepositoryError）は outcome="rejected"、それ以外の例外は "error" として数える。
+リクエストのトレース（app/services/db_trace.py）はクライアントの層で1往復ごとに記録する。
+"""
+
+import time
+from dataclasses import fields
+
+from app.repositories.base import Repositories, RepositoryError
+from app.services.metrics import DB_CALL_DURATION
+
+
+class InstrumentedRepository:
+    """1つのリポジトリの計測用ラッパー"""
+
+    def __init__(self, inner, backend: str, table: str):
+        self._inner = inner
+        self._backend = backend
+        self._table = table
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._inner, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        histograms = {}
+
+        async def call(*args, **kwargs):
+            outcome = "error"
+            started = time.perf_counter()
+            try:
+                result = await attr(*args, **kwargs)
+                outcome = "ok"
+                return result
+            except RepositoryError:
+                outcome = "rejected"
+                raise
+            finally:
+                histogram = histograms.get(outcome)
+                if histogram is None:
+                    histogram = histograms[outcome] = DB_CALL_DURATION.labels(
+                        self._backend, self._table, name, outcome
+                    )
+                histogram.observe(time.perf_counter() - started)
+
+        # 次回からは __getattr__ を通らない
+        setattr(self, name, call)
+        return call
+
+
+def instrument(repos: Repositories, backend: str) -> Repositories:
+    """各リポジトリを計測用ラッパーで包む"""
+    wrapped = {
+        field.name: InstrumentedRepository(getattr(repos, field.name), backend, field.name)
+        for field in fields(repos)
+        if field.name != "closer"
+    }
+    return Repositories(**wrapped, closer=repos.closer)
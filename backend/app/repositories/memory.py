@@ -0,0 +1,605 @@
+"""インメモリバックエンド（開発・ベンチマーク用）
+
+Supabase バックエンドのリポジトリを、PostgREST と同じ問い合わせをプロセス内のデータで
+処理するクライアント（MemoryClient）の上で動かす。DB・Supabase なしでAPIを起動できる。
+データはプロセスごとに別で、再起動で消える（ユーザーは新規登録ボーナスで作られる）。
+
+再現する PostgREST の操作:
+- select（列の指定・"*"・埋め込み "horses(number, name)"・count・head）
+- eq / neq / gt / gte / lt / lte / in_ / or_（キーセットの論理式）/ order / range / limit / single
+- insert / update / upsert、rpc（functions に登録した関数。place_bet などは登録済み）
+
+eq の条件はPostgRESTと同じく値を文字列として比べ、列ごとのハッシュ索引で引く（索引は
+最初の eq で作り、insert・upsert と tables への追記に追従する。tables の行の eq で使う列を
+直接書き換えた場合は invalidate() を呼ぶ）。埋め込みは RELATIONS に定義した外部キーで解決する。
+"""
+
+import copy
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postgrest import APIError
+
+from app.repositories.base import Repositories
+from app.repositories.supabase import supabase_repositories
+from app.services.db_trace import span
+
+# (テーブル, 埋め込むテーブル) → (件数 "one" / "many", 自テーブルの列, 埋め込むテーブルの列)
+RELATIONS: Dict[Tuple[str, str], Tuple[str, str, str]] = {
+    ("races", "horses"): ("many", "id", "race_id"),
+    ("races", "race_results"): ("one", "id", "race_id"),
+    ("races", "bets"): ("many", "id", "race_id"),
+    ("horses", "races"): ("one", "race_id", "id"),
+    ("bets", "races"): ("one", "race_id", "id"),
+    ("bets", "users"): ("one", "user_id", "id"),
+    ("users", "bets"): ("many", "id", "user_id"),
+    ("coin_transactions", "users"): ("one", "user_id", "id"),
+    ("user_daily_profits", "users"): ("one", "user_id", "id"),
+    ("rankings", "users"): ("one", "user_id", "id"),
+}
+
+Predicate = Callable[[dict], bool]
+
+
+@dataclass
+class MemoryResponse:
+    data: Any
+    count: Optional[int] = None
+
+
+def _split(text: str) -> List[str]:
+    """括弧と二重引用符の外側のカンマで分割"""
+    parts, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(text):
+        ch = text[i]
+        if quoted:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                quoted = False
+        elif ch == '"':
+            quoted = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_select(columns: str) -> Tuple[List[Tuple[str, str]], Dict[str, Tuple[str, str]]]:
+    """select 句を (キー, 列) と埋め込み（キー → (テーブル, 内側の select 句)）に分ける"""
+    fields, embeds = [], {}
+    for part in _split(columns):
+        if "(" in part:
+            head, inner = part.split("(", 1)
+            alias, _, table = head.rpartition(":")
+            table = table.split("!")[0].strip()
+            embeds[alias.strip() or table] = (table, inner[:-1])
+        else:
+            alias, _, column = part.rpartition(":")
+            column = column.split("::")[0].strip()
+            fields.append((alias.strip() or column, column))
+    return fields, embeds
+
+
+def _coerce(stored: Any, value: Any) -> Tuple[Any, Any]:
+    """PostgRESTの文字列の条件値を格納値の型に合わせる"""
+    if isinstance(stored, bool) or stored is None:
+        return stored, value
+    if isinstance(stored, (int, float)):
+        return stored, float(value)
+    if isinstance(stored, str) and isinstance(value, str) and "T" in stored and "T" in value:
+        try:
+            return _timestamp(stored), _timestamp(value)
+        except ValueError:
+            pass
+    return stored, str(value) if isinstance(stored, str) else value
+
+
+def _timestamp(value: str) -> datetime:
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _text(value: Any) -> str:
+    """eq の比較に使う文字列表現（PostgRESTのクエリ文字列と同じ）"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return "null" if value is None else str(value)
+
+
+def _sort_key(value: Any) -> Tuple[bool, Any]:
+    return (True, 0) if value is None else (False, value)
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def _condition(column: str, op: str, value: Any) -> Predicate:
+    compare = OPERATORS[op]
+
+    def check(row: dict) -> bool:
+        stored = row.get(column)
+        if stored is None:
+            return False
+        return compare(*_coerce(stored, value))
+
+    return check
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def parse_logic(expression: str) -> List[Predicate]:
+    """or_ / and_ の論理式（"a.gt.1,and(a.eq.1,id.gt.x)"）を条件の一覧に"""
+    predicates = []
+    for term in _split(expression):
+        if term.startswith(("and(", "or(")):
+            name, inner = term.split("(", 1)
+            terms = parse_logic(inner[:-1])
+            if name == "and":
+                predicates.append(lambda row, terms=terms: all(p(row) for p in terms))
+            else:
+                predicates.append(lambda row, terms=terms: any(p(row) for p in terms))
+        else:
+            column, op, value = term.split(".", 2)
+            predicates.append(_condition(column, op, _unquote(value)))
+    return predicates
+
+
+class MemoryQuery:
+    """テーブル操作（select / insert / update / upsert）"""
+
+    def __init__(self, client: "MemoryClient", table: str):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.filters: List[Predicate] = []
+        self.equals: List[Tuple[str, str]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.offset = 0
+        self.limit_rows: Optional[int] = None
+        self.count: Optional[str] = None
+        self.head = False
+        self.on_conflict = "id"
+        self.ignore_duplicates = False
+        self.is_single = False
+
+    def select(self, *columns, count=None, head=False):
+        self.columns = ",".join(columns) or "*"
+        self.count = count
+        self.head = head
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def update(self, payload):
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "id", ignore_duplicates: bool = False, **kwargs):
+        self.operation = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def eq(self, column, value):
+        self.equals.append((column, _text(value)))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(_condition(column, "neq", value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(_condition(column, "gt", value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(_condition(column, "gte", value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(_condition(column, "lt", value))
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(_condition(column, "lte", value))
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def or_(self, filters: str, **kwargs):
+        predicates = parse_logic(filters)
+        self.filters.append(lambda row: any(p(row) for p in predicates))
+        return self
+
+    def order(self, column, desc: bool = False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset = start
+        self.limit_rows = end - start + 1
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self.limit_rows = size
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    async def execute(self) -> MemoryResponse:
+        # PostgREST では head の問い合わせは HEAD リクエスト（db_trace.HTTP_OPERATIONS）
+        with span(self.table, "count" if self.head else self.operation):
+            await self.client.round_trip(f"{self.table}.{self.operation}")
+            return self._execute()
+
+    def _execute(self) -> MemoryResponse:
+        rows = self.client.tables.setdefault(self.table, [])
+
+        if self.operation == "insert":
+            payloads = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            for payload in payloads:
+                row = {"id": str(uuid.uuid4()), **payload}
+                rows.append(row)
+                inserted.append(copy.deepcopy(row))
+            return MemoryResponse(inserted)
+
+        if self.operation == "upsert":
+            return MemoryResponse(self._upsert(rows))
+
+        matched = self._match(rows)
+        if self.operation == "update":
+            for row in matched:
+                row.update(self.payload)
+            self.client.invalidate(self.table, self.payload)
+            return MemoryResponse(copy.deepcopy(matched))
+
+        total = len(matched) if self.count else None
+        for column, desc in reversed(self.orders):
+            # PostgRESTの既定どおり NULL は昇順で最後、降順で最初
+            matched.sort(key=lambda row: _sort_key(row.get(column)), reverse=desc)
+        end = None if self.limit_rows is None else self.offset + self.limit_rows
+        matched = matched[self.offset:end]
+
+        if self.head:
+            return MemoryResponse([], total)
+        data = self.client.project(self.table, matched, self.columns)
+        if self.is_single:
+            if len(data) != 1:
+                raise APIError({
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                })
+            return MemoryResponse(data[0], total)
+        return MemoryResponse(data, total)
+
+    def _match(self, rows: List[dict]) -> List[dict]:
+        if self.equals:
+            column, value = self.equals[0]
+            rows = self.client.lookup(self.table, column, value)
+        rest = self.equals[1:]
+        return [
+            row for row in rows
+            if all(_text(row.get(c)) == v for c, v in rest) and all(p(row) for p in self.filters)
+        ]
+
+    def _upsert(self, rows: List[dict]) -> List[dict]:
+        keys = [column.strip() for column in self.on_conflict.split(",")]
+        payloads = self.payload if isinstance(self.payload, list) else [self.payload]
+        written = []
+        for payload in payloads:
+            candidates = self.client.lookup(self.table, keys[0], _text(payload.get(keys[0])))
+            existing = next(
+                (row for row in candidates if all(_text(row.get(k)) == _text(payload.get(k)) for k in keys)),
+                None,
+            )
+            if existing is None:
+                row = {"id": str(uuid.uuid4()), **payload}
+                rows.append(row)
+            elif self.ignore_duplicates:
+                continue
+            else:
+                existing.update(payload)
+                self.client.invalidate(self.table, payload)
+                row = existing
+            written.append(copy.deepcopy(row))
+        return written
+
+
+class MemoryRPC:
+    """RPC呼び出し"""
+
+    def __init__(self, client: "MemoryClient", fn: str, params: dict):
+        self.client = client
+        self.fn = fn
+        self.params = params
+
+    async def execute(self) -> MemoryResponse:
+        with span("rpc", self.fn):
+            await self.client.round_trip(f"rpc.{self.fn}")
+            return MemoryResponse(self.client.functions[self.fn](self.client, self.params))
+
+
+class MemoryClient:
+    """インメモリの Supabase クライアント"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = {}
+        self.functions: Dict[str, Callable[["MemoryClient", dict], Any]] = dict(FUNCTIONS)
+        # (テーブル, 列) → (索引を作った行のリスト, 索引済みの行数, 値 → 行)
+        self._indexes: Dict[Tuple[str, str], Tuple[list, int, Dict[str, List[dict]]]] = {}
+
+    async def round_trip(self, operation: str) -> None:
+        """execute() ごとに呼ばれる（ネットワーク遅延を模す場合に上書きする）"""
+
+    def lookup(self, table: str, column: str, value: str) -> List[dict]:
+        """列の値が一致する行（索引を使う）"""
+        rows = self.tables.setdefault(table, [])
+        entry = self._indexes.get((table, column))
+        if entry is None or entry[0] is not rows:
+            entry = (rows, 0, {})
+        _, indexed, index = entry
+        for row in rows[indexed:]:
+            index.setdefault(_text(row.get(column)), []).append(row)
+        self._indexes[(table, column)] = (rows, len(rows), index)
+        return index.get(value, [])
+
+    def invalidate(self, table: str, columns=None) -> None:
+        """行の値を書き換えた列の索引を捨てる（columns 未指定はテーブルの全索引）"""
+        for key in list(self._indexes):
+            if key[0] == table and (columns is None or key[1] in columns):
+                del self._indexes[key]
+
+    def table(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self, name)
+
+    def rpc(self, fn: str, params: dict) -> MemoryRPC:
+        return MemoryRPC(self, fn, params)
+
+    def project(self, table: str, rows: List[dict], columns: str) -> List[dict]:
+        """select 句どおりに列を選び、埋め込みを解決する"""
+        fields, embeds = parse_select(columns)
+        results = []
+        for row in rows:
+            if any(column == "*" for _, column in fields):
+                result = copy.deepcopy(row)
+            else:
+                result = {}
+            for key, column in fields:
+                if column != "*":
+                    result[key] = copy.deepcopy(row.get(column))
+            results.append(result)
+
+        for key, (target, inner) in embeds.items():
+            relation = RELATIONS.get((table, target))
+            if relation is None:
+                raise APIError({"code": "PGRST200", "message": f"No relation between {table} and {target}"})
+            kind, local, remote = relation
+            children: Dict[Any, List[dict]] = {}
+            for child in self.tables.get(target, []):
+                children.setdefault(child.get(remote), []).append(child)
+            for row, result in zip(rows, results):
+                related = self.project(target, children.get(row.get(local), []), inner)
+                result[key] = related if kind == "many" else (related[0] if related else None)
+        return results
+
+
+def _raise(message: str) -> None:
+    """RAISE EXCEPTION と同じ形のエラー"""
+    raise APIError({"code": "P0001", "message": message})
+
+
+def _row(client: MemoryClient, table: str, row_id: str) -> Optional[dict]:
+    rows = client.lookup(table, "id", row_id)
+    return rows[0] if rows else None
+
+
+def _check_race(client: MemoryClient, race_id: str, now: datetime) -> None:
+    race = _row(client, "races", race_id)
+    if race is None:
+        _raise("race_not_found")
+    if race["status"] != "betting" or now >= _timestamp(race["betting_end_time"]):
+        _raise("betting_closed")
+
+
+def _check_selections(client: MemoryClient, race_id: str, tickets: List[List[int]]) -> None:
+    numbers = {horse["number"] for horse in client.lookup("horses", "race_id", race_id)}
+    if any(len(set(ticket)) != len(ticket) for ticket in tickets):
+        _raise("invalid_selection")
+    if any(number not in numbers for ticket in tickets for number in ticket):
+        _raise("invalid_selection")
+
+
+def _win_odds(client: MemoryClient, race_id: str, bet_type: str, number: int) -> Optional[float]:
+    if bet_type not in ("win", "place"):
+        return None
+    horse = next((h for h in client.lookup("horses", "race_id", race_id) if h["number"] == number), None)
+    if horse is None:
+        return None
+    return horse["odds"] if bet_type == "win" else max(1.1, horse["odds"] / 3)
+
+
+def _charge(client: MemoryClient, user_id: str, total: int, count: int) -> dict:
+    user = _row(client, "users", user_id)
+    if user is None or user["coins"] < total:
+        _raise("insufficient_coins")
+    user["coins"] -= total
+    user["total_bets"] += count
+    user["total_spent"] += total
+    client.invalidate("users", ("coins", "total_bets", "total_spent"))
+    return user
+
+
+def _insert_bets(client: MemoryClient, params: dict, tickets: List[Tuple[List[int], float, Optional[str]]], now: datetime) -> List[dict]:
+    bets = []
+    for selections, odds, key in tickets:
+        bet = {
+            "id": str(uuid.uuid4()),
+            "user_id": params["p_user_id"],
+            "race_id": params["p_race_id"],
+            "bet_type": params["p_bet_type"],
+            "selections": list(selections),
+            "amount": params["p_amount"],
+            "odds": odds,
+            "odds_version": params.get("p_odds_version"),
+            "status": "pending",
+            "payout": None,
+            "idempotency_key": key,
+            "created_at": now.replace(tzinfo=None).isoformat(),
+            "settled_at": None,
+        }
+        client.tables.setdefault("bets", []).append(bet)
+        bets.append(bet)
+    return bets
+
+
+def _record_spend(client: MemoryClient, params: dict, total: int, balance: int, metadata: dict, now: datetime) -> None:
+    client.tables.setdefault("coin_transactions", []).append({
+        "id": str(uuid.uuid4()),
+        "user_id": params["p_user_id"],
+        "type": "spend",
+        "amount": -total,
+        "balance": balance,
+        "reason": params["p_reason"],
+        "metadata": metadata,
+        "dedup_id": None,
+        "created_at": now.replace(tzinfo=None).isoformat(),
+    })
+
+
+def _replay(client: MemoryClient, user_id: str, keys: List[str]) -> List[dict]:
+    keys = set(keys)
+    return [bet for bet in client.lookup("bets", "user_id", user_id) if bet.get("idempotency_key") in keys]
+
+
+def place_bet(client: MemoryClient, params: dict) -> dict:
+    """backend/sql/place_bet.sql と同じ処理"""
+    now = datetime.now(timezone.utc)
+    key = params.get("p_idempotency_key")
+    if key is not None:
+        replayed = _replay(client, params["p_user_id"], [key])
+        if replayed:
+            user = _row(client, "users", params["p_user_id"])
+            return copy.deepcopy({"bet": replayed[0], "user": user, "replayed": True})
+
+    _check_race(client, params["p_race_id"], now)
+    _check_selections(client, params["p_race_id"], [params["p_selections"]])
+    odds = params.get("p_odds")
+    if odds is None:
+        odds = _win_odds(client, params["p_race_id"], params["p_bet_type"], params["p_selections"][0]) or 1.0
+    user = _charge(client, params["p_user_id"], params["p_amount"], 1)
+
+    [bet] = _insert_bets(client, params, [(params["p_selections"], odds, key)], now)
+    _record_spend(client, params, params["p_amount"], user["coins"], {
+        "race_id": params["p_race_id"], "bet_id": bet["id"],
+    }, now)
+    return copy.deepcopy({"bet": bet, "user": user, "replayed": False})
+
+
+def place_bets_batch(client: MemoryClient, params: dict) -> dict:
+    """backend/sql/place_bets_batch.sql と同じ処理"""
+    now = datetime.now(timezone.utc)
+    tickets = params["p_tickets"]
+    key = params.get("p_idempotency_key")
+    keys = [None] * len(tickets) if key is None else [f"{key}:{n}" for n in range(1, len(tickets) + 1)]
+    if key is not None:
+        replayed = _replay(client, params["p_user_id"], keys)
+        if replayed:
+            user = _row(client, "users", params["p_user_id"])
+            return copy.deepcopy({"bets": replayed, "user": user, "replayed": True})
+
+    _check_race(client, params["p_race_id"], now)
+    _check_selections(client, params["p_race_id"], tickets)
+
+    total = params["p_amount"] * len(tickets)
+    user = _charge(client, params["p_user_id"], total, len(tickets))
+
+    ticket_odds = params.get("p_odds") or [None] * len(tickets)
+    bets = _insert_bets(client, params, [
+        (
+            ticket,
+            odds if odds is not None else _win_odds(client, params["p_race_id"], params["p_bet_type"], ticket[0]) or 1.0,
+            ticket_key,
+        )
+        for ticket, odds, ticket_key in zip(tickets, ticket_odds, keys)
+    ], now)
+    _record_spend(client, params, total, user["coins"], {
+        "race_id": params["p_race_id"], "bet_ids": [bet["id"] for bet in bets],
+    }, now)
+    return copy.deepcopy({"bets": bets, "user": user, "replayed": False})
+
+
+def credit_coins(client: MemoryClient, params: dict) -> Optional[dict]:
+    """backend/sql/credit_coins.sql と同じ処理"""
+    user = _row(client, "users", params["p_user_id"])
+    if user is None:
+        return None
+    day_start = params.get("p_login_day_start")
+    last_login = user.get("last_login_at")
+    if day_start is not None and last_login and _timestamp(last_login) >= _timestamp(day_start):
+        return None
+
+    user["coins"] += params["p_amount"]
+    changed = ["coins"]
+    if params.get("p_login_at") is not None:
+        user["last_login_at"] = params["p_login_at"]
+        changed.append("last_login_at")
+    if params.get("p_consecutive_login_days") is not None:
+        user["consecutive_login_days"] = params["p_consecutive_login_days"]
+        changed.append("consecutive_login_days")
+    client.invalidate("users", tuple(changed))
+    return copy.deepcopy(user)
+
+
+def get_user_rank_by_coins(client: MemoryClient, params: dict) -> Optional[int]:
+    user = _row(client, "users", params["target_user_id"])
+    if user is None:
+        return None
+    return sum(1 for other in client.tables.get("users", []) if other["coins"] > user["coins"]) + 1
+
+
+# rpc() で呼べるDB関数
+FUNCTIONS: Dict[str, Callable[[MemoryClient, dict], Any]] = {
+    "place_bet": place_bet,
+    "place_bets_batch": place_bets_batch,
+    "credit_coins": credit_coins,
+    "get_user_rank_by_coins": get_user_rank_by_coins,
+}
+
+
+def memory_repositories(client: Optional[MemoryClient] = None) -> Repositories:
+    return supabase_repositories(client or MemoryClient())
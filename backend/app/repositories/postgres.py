@@ -0,0 +1,279 @@
+"""PostgreSQL 直接接続バックエンド（asyncpg）
+
+よく呼ばれる操作（ユーザーの取得・更新・コインの加算、予想作成、レース詳細、広告視聴回数、取引記録の追加、
+資産順位）は PostgREST を経由せず、asyncpg のコネクションプールからバイナリプロトコルで実行する。
+文は接続ごとにプリペアドステートメントとしてキャッシュされる（DATABASE_STATEMENT_CACHE_SIZE）。
+それ以外（射影・キーセットを使う一覧、ランキング）は Supabase バックエンドのまま。
+
+行は to_jsonb で組み立てて返すため、列名・値の形式は PostgREST の応答と同じになる。
+
+Supabase のトランザクションモードのプーラー（6543番ポート）はプリペアドステートメントを
+保持できないため、DATABASE_URL には直接接続かセッションモードのプーラーを指定する
+（トランザクションモードを使う場合は DATABASE_STATEMENT_CACHE_SIZE=0）。
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import asyncpg
+from supabase import AsyncClient
+
+from app.repositories.base import Repositories, RepositoryError, is_business_error
+from app.services.db_trace import span
+from app.repositories.supabase import (
+    SupabaseAdvertisementViews,
+    SupabaseBets,
+    SupabaseCoinTransactions,
+    SupabaseHorses,
+    SupabaseRaces,
+    SupabaseRankings,
+    SupabaseUsers,
+)
+
+USER_SQL = "SELECT to_jsonb(u) FROM users u WHERE u.id = $1"
+
+RACE_SQL = """
+SELECT to_jsonb(r) || jsonb_build_object(
+    'horses', coalesce(
+        (SELECT jsonb_agg(to_jsonb(h) ORDER BY h.number) FROM horses h WHERE h.race_id = r.id),
+        '[]'::jsonb
+    ),
+    'race_results', (SELECT to_jsonb(rr) FROM race_results rr WHERE rr.race_id = r.id)
+)
+FROM races r
+WHERE r.id = $1
+"""
+
+HORSES_SQL = """
+SELECT coalesce(jsonb_agg(to_jsonb(h) ORDER BY h.number), '[]'::jsonb)
+FROM horses h
+WHERE h.race_id = $1
+"""
+
+PLACE_BET_SQL = """
+SELECT public.place_bet(
+    p_user_id => $1, p_race_id => $2, p_bet_type => $3, p_selections => $4::integer[],
+    p_amount => $5, p_reason => $6, p_idempotency_key => $7, p_odds => $8, p_odds_version => $9
+)
+"""
+
+PLACE_BETS_BATCH_SQL = """
+SELECT public.place_bets_batch(
+    p_user_id => $1, p_race_id => $2, p_bet_type => $3, p_tickets => $4::jsonb,
+    p_amount => $5, p_reason => $6, p_idempotency_key => $7, p_odds => $8::jsonb, p_odds_version => $9
+)
+"""
+
+RANK_BY_COINS_SQL = "SELECT public.get_user_rank_by_coins($1)"
+
+CREDIT_COINS_SQL = """
+SELECT public.credit_coins(
+    p_user_id => $1, p_amount => $2, p_login_at => $3,
+    p_consecutive_login_days => $4, p_login_day_start => $5
+)
+"""
+
+AD_VIEWS_SINCE_SQL = """
+SELECT count(*) FROM advertisement_views
+WHERE user_id = $1 AND viewed_at >= ($2::timestamptz AT TIME ZONE 'UTC')
+"""
+
+
+def _utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """timestamp（タイムゾーンなし、UTC）の引数"""
+    if moment is None:
+        return None
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _quote(column: str) -> str:
+    # 列名はJSONのキーから決まるため、識別子として安全なものだけを受け付ける
+    if not column.replace("_", "").isalnum():
+        raise ValueError(f"Invalid column name: {column}")
+    return f'"{column}"'
+
+
+def _columns(rows: List[dict]) -> List[str]:
+    """行のキーの和集合（ない列は NULL になる。PostgREST の一括 upsert と同じ）"""
+    return list(dict.fromkeys(column for row in rows for column in row))
+
+
+def _insert_sql(table: str, columns: List[str]) -> str:
+    """JSONの配列から行を追加する文（dedup_id が既存の行は無視する）"""
+    names = ", ".join(_quote(column) for column in columns)
+    return (
+        f"INSERT INTO {table} ({names}) "
+        f"SELECT {names} FROM jsonb_populate_recordset(NULL::{table}, $1) "
+        f"ON CONFLICT (dedup_id) DO NOTHING"
+    )
+
+
+async def _init_connection(conn) -> None:
+    # json / jsonb を Python の dict・list でやり取りする
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def create_pool(dsn: str, min_size: int, max_size: int, statement_cache_size: int) -> "TracedPool":
+    pool = await asyncpg.create_pool(
+        dsn,
+        min_size=min_size,
+        max_size=max_size,
+        statement_cache_size=statement_cache_size,
+        init=_init_connection,
+    )
+    return TracedPool(pool)
+
+
+# 文の対象（トレースのテーブル名）: public.<関数>(、INTO / UPDATE <テーブル>、最も外側（最後）の FROM <テーブル>
+FUNCTION_TARGET = re.compile(r"\bpublic\.(\w+)\s*\(")
+WRITE_TARGET = re.compile(r"\b(?:INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+READ_TARGET = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+
+
+def _target(sql: str) -> str:
+    function = FUNCTION_TARGET.search(sql)
+    if function is not None:
+        return f"rpc.{function.group(1)}"
+    write = WRITE_TARGET.search(sql)
+    if write is not None:
+        return write.group(1)
+    reads = READ_TARGET.findall(sql)
+    return reads[-1] if reads else "sql"
+
+
+class TracedPool:
+    """1呼び出しごとにリクエストのトレース（app/services/db_trace.py）へ記録するプール"""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+
+    async def fetchval(self, sql: str, *args):
+        with span(_target(sql), "fetchval"):
+            return await self._pool.fetchval(sql, *args)
+
+    async def execute(self, sql: str, *args):
+        with span(_target(sql), "execute"):
+            return await self._pool.execute(sql, *args)
+
+    async def close(self) -> None:
+        await self._pool.close()
+
+
+class PostgresRaces(SupabaseRaces):
+    def __init__(self, client: AsyncClient, pool: TracedPool):
+        super().__init__(client)
+        self.pool = pool
+
+    async def get(self, race_id: str) -> Optional[dict]:
+        return await self.pool.fetchval(RACE_SQL, race_id)
+
+
+class PostgresHorses(SupabaseHorses):
+    def __init__(self, client: AsyncClient, pool: TracedPool):
+        super().__init__(client)
+        self.pool = pool
+
+    async def by_race(self, race_id: str) -> List[dict]:
+        return await self.pool.fetchval(HORSES_SQL, race_id)
+
+
+class PostgresBets(SupabaseBets):
+    def __init__(self, client: AsyncClient, pool: TracedPool):
+        super().__init__(client)
+        self.pool = pool
+
+    async def _call(self, sql: str, *args) -> dict:
+        try:
+            return await self.pool.fetchval(sql, *args)
+        except asyncpg.PostgresError as e:
+            if is_business_error(e.sqlstate, e.message):
+                raise RepositoryError(e.message) from e
+            raise
+
+    async def place(self, params: dict) -> dict:
+        return await self._call(
+            PLACE_BET_SQL,
+            params["p_user_id"], params["p_race_id"], params["p_bet_type"], params["p_selections"],
+            params["p_amount"], params["p_reason"], params.get("p_idempotency_key"),
+            params.get("p_odds"), params.get("p_odds_version"),
+        )
+
+    async def place_batch(self, params: dict) -> dict:
+        return await self._call(
+            PLACE_BETS_BATCH_SQL,
+            params["p_user_id"], params["p_race_id"], params["p_bet_type"], params["p_tickets"],
+            params["p_amount"], params["p_reason"], params.get("p_idempotency_key"),
+            params.get("p_odds"), params.get("p_odds_version"),
+        )
+
+
+class PostgresUsers(SupabaseUsers):
+    def __init__(self, client: AsyncClient, pool: TracedPool):
+        super().__init__(client)
+        self.pool = pool
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        return await self.pool.fetchval(USER_SQL, user_id)
+
+    async def update(self, user_id: str, changes: dict) -> None:
+        names = ", ".join(_quote(column) for column in changes)
+        await self.pool.execute(
+            f"UPDATE users SET ({names}) = (SELECT {names} FROM jsonb_populate_record(NULL::users, $2)) "
+            f"WHERE id = $1",
+            user_id, changes,
+        )
+
+    async def credit(
+        self,
+        user_id: str,
+        amount: int,
+        *,
+        login_at: Optional[datetime] = None,
+        consecutive_login_days: Optional[int] = None,
+        login_day_start: Optional[datetime] = None,
+    ) -> Optional[dict]:
+        return await self.pool.fetchval(
+            CREDIT_COINS_SQL, user_id, amount, _utc(login_at), consecutive_login_days, _utc(login_day_start)
+        )
+
+    async def rank_by_coins(self, user_id: str) -> Optional[int]:
+        return await self.pool.fetchval(RANK_BY_COINS_SQL, user_id) or None
+
+
+class PostgresCoinTransactions(SupabaseCoinTransactions):
+    def __init__(self, client: AsyncClient, pool: TracedPool):
+        super().__init__(client)
+        self.pool = pool
+
+    async def record(self, transactions: List[dict]) -> None:
+        if transactions:
+            await self.pool.execute(_insert_sql("coin_transactions", _columns(transactions)), transactions)
+
+
+class PostgresAdvertisementViews(SupabaseAdvertisementViews):
+    def __init__(self, client: AsyncClient, pool: TracedPool):
+        super().__init__(client)
+        self.pool = pool
+
+    async def count_since(self, user_id: str, since: datetime) -> int:
+        return await self.pool.fetchval(AD_VIEWS_SINCE_SQL, user_id, since)
+
+    async def record(self, views: List[dict]) -> None:
+        if views:
+            await self.pool.execute(_insert_sql("advertisement_views", _columns(views)), views)
+
+
+def postgres_repositories(client: AsyncClient, pool: TracedPool) -> Repositories:
+    return Repositories(
+        races=PostgresRaces(client, pool),
+        horses=PostgresHorses(client, pool),
+        bets=PostgresBets(client, pool),
+        users=PostgresUsers(client, pool),
+        rankings=SupabaseRankings(client),
+        coin_transactions=PostgresCoinTransactions(client, pool),
+        advertisement_views=PostgresAdvertisementViews(client, pool),
+        closer=pool.close,
+    )
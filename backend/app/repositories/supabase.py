@@ -0,0 +1,283 @@
+"""Supabase（PostgREST）バックエンド
+
+操作ごとに PostgREST へ1回のHTTPリクエストを送る。一覧は select 句の射影
+（app/services/projection.py）とキーセットページネーションをそのまま PostgREST に渡す。
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from postgrest import APIError
+from supabase import AsyncClient
+
+from app.repositories.base import (
+    BET_ORDER,
+    RACE_ORDER,
+    TRANSACTION_ORDER,
+    Repositories,
+    RepositoryError,
+    Rows,
+    is_business_error,
+)
+from app.services.pagination import CountMode, count_method
+
+
+def _utc(moment: Optional[datetime]) -> Optional[str]:
+    """timestamp（タイムゾーンなし、UTC）の列と比べる時刻の文字列
+
+    PostgREST は timestamp への変換でオフセットを捨てるため、UTCにしてから渡す。
+    """
+    if moment is None:
+        return None
+    return moment.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def _maybe_one(result) -> Optional[dict]:
+    return result.data[0] if result.data else None
+
+
+def _ranking_rows(rows: List[dict], profit_column: str) -> List[dict]:
+    return [
+        {
+            "id": row["user_id"],
+            "display_name": (row.get("users") or {}).get("display_name"),
+            "avatar": (row.get("users") or {}).get("avatar"),
+            "net_profit": row[profit_column],
+        }
+        for row in rows
+    ]
+
+
+class SupabaseRaces:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def list(
+        self,
+        select: str,
+        *,
+        date: Optional[str] = None,
+        venue: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        count: CountMode = "estimated",
+    ) -> Rows:
+        query = self.client.table("races").select(select, count=count_method(count))
+        if date:
+            query = query.eq("date", date)
+        if venue:
+            query = query.eq("venue", venue)
+        if status:
+            query = query.eq("status", status)
+        result = await RACE_ORDER.apply(query, cursor, page, limit).execute()
+        return result.data or [], result.count
+
+    async def get(self, race_id: str) -> Optional[dict]:
+        result = await self.client.table("races").select(
+            "*, horses(*), race_results(*)"
+        ).eq("id", race_id).limit(1).execute()
+        return _maybe_one(result)
+
+
+class SupabaseHorses:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def by_race(self, race_id: str) -> List[dict]:
+        result = await self.client.table("horses").select("*").eq("race_id", race_id).order("number").execute()
+        return result.data or []
+
+
+class SupabaseBets:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def _rpc(self, fn: str, params: dict) -> dict:
+        try:
+            result = await self.client.rpc(fn, params).execute()
+        except APIError as e:
+            if is_business_error(e.code, e.message):
+                raise RepositoryError(e.message) from e
+            raise
+        return result.data
+
+    async def place(self, params: dict) -> dict:
+        return await self._rpc("place_bet", params)
+
+    async def place_batch(self, params: dict) -> dict:
+        return await self._rpc("place_bets_batch", params)
+
+    async def list(
+        self,
+        user_id: str,
+        select: str,
+        *,
+        status: Optional[str] = None,
+        race_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        count: CountMode = "estimated",
+    ) -> Rows:
+        query = self.client.table("bets").select(select, count=count_method(count)).eq("user_id", user_id)
+        if status:
+            query = query.eq("status", status)
+        if race_id:
+            query = query.eq("race_id", race_id)
+        result = await BET_ORDER.apply(query, cursor, page, limit).execute()
+        return result.data or [], result.count
+
+    async def get(self, user_id: str, bet_id: str) -> Optional[dict]:
+        result = await self.client.table("bets").select(
+            "*, races(*)"
+        ).eq("id", bet_id).eq("user_id", user_id).limit(1).execute()
+        return _maybe_one(result)
+
+
+class SupabaseUsers:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        result = await self.client.table("users").select("*").eq("id", user_id).limit(1).execute()
+        return _maybe_one(result)
+
+    async def create(self, user: dict) -> Optional[dict]:
+        result = await self.client.table("users").insert(user).execute()
+        return _maybe_one(result)
+
+    async def update(self, user_id: str, changes: dict) -> None:
+        await self.client.table("users").update(changes).eq("id", user_id).execute()
+
+    async def credit(
+        self,
+        user_id: str,
+        amount: int,
+        *,
+        login_at: Optional[datetime] = None,
+        consecutive_login_days: Optional[int] = None,
+        login_day_start: Optional[datetime] = None,
+    ) -> Optional[dict]:
+        result = await self.client.rpc("credit_coins", {
+            "p_user_id": user_id,
+            "p_amount": amount,
+            "p_login_at": _utc(login_at),
+            "p_consecutive_login_days": consecutive_login_days,
+            "p_login_day_start": _utc(login_day_start),
+        }).execute()
+        return result.data or None
+
+    async def top(self, column: str, columns: str, offset: int, limit: int, min_bets: int = 0) -> Rows:
+        query = self.client.table("users").select(columns, count="exact")
+        if min_bets:
+            query = query.gte("total_bets", min_bets)
+        result = await query.order(column, desc=True).range(offset, offset + limit - 1).execute()
+        return result.data or [], result.count or 0
+
+    async def rank_by_coins(self, user_id: str) -> Optional[int]:
+        result = await self.client.rpc("get_user_rank_by_coins", {"target_user_id": user_id}).execute()
+        return result.data or None
+
+
+class SupabaseRankings:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def daily(self, day: str, offset: int, limit: int) -> Rows:
+        result = await self.client.table("user_daily_profits").select(
+            "user_id, profit, users(display_name, avatar)",
+            count="exact"
+        ).eq("day", day).order("profit", desc=True).range(offset, offset + limit - 1).execute()
+        return _ranking_rows(result.data or [], "profit"), result.count or 0
+
+    async def daily_position(self, user_id: str, day: str) -> Tuple[int, Optional[int]]:
+        # 自分の収支と、それより収支の多いユーザー数から順位を求める
+        mine = await self.client.table("user_daily_profits").select("profit").eq(
+            "user_id", user_id
+        ).eq("day", day).execute()
+        if not mine.data:
+            return 0, None
+        profit = mine.data[0]["profit"]
+        higher = await self.client.table("user_daily_profits").select(
+            "user_id", count="exact", head=True
+        ).eq("day", day).gt("profit", profit).execute()
+        return profit, (higher.count or 0) + 1
+
+    async def period(self, profit_column: str, offset: int, limit: int) -> Rows:
+        result = await self.client.table("rankings").select(
+            f"user_id, {profit_column}, users(display_name, avatar)",
+            count="exact"
+        ).order(profit_column, desc=True).range(offset, offset + limit - 1).execute()
+        return _ranking_rows(result.data or [], profit_column), result.count or 0
+
+    async def period_position(self, user_id: str, profit_column: str, rank_column: str) -> Tuple[int, Optional[int]]:
+        mine = await self.client.table("rankings").select(
+            f"{profit_column}, {rank_column}"
+        ).eq("user_id", user_id).execute()
+        if not mine.data:
+            return 0, None
+        return mine.data[0][profit_column], mine.data[0][rank_column]
+
+
+class SupabaseCoinTransactions:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def list(
+        self,
+        user_id: str,
+        *,
+        type: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        count: CountMode = "estimated",
+    ) -> Rows:
+        query = self.client.table("coin_transactions").select(
+            "*", count=count_method(count)
+        ).eq("user_id", user_id)
+        if type:
+            query = query.eq("type", type)
+        if start_date:
+            query = query.gte("created_at", f"{start_date}T00:00:00Z")
+        if end_date:
+            query = query.lte("created_at", f"{end_date}T23:59:59Z")
+        result = await TRANSACTION_ORDER.apply(query, cursor, page, limit).execute()
+        return result.data or [], result.count
+
+    async def record(self, transactions: List[dict]) -> None:
+        await self.client.table("coin_transactions").upsert(
+            transactions, on_conflict="dedup_id", ignore_duplicates=True
+        ).execute()
+
+
+class SupabaseAdvertisementViews:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def count_since(self, user_id: str, since: datetime) -> int:
+        result = await self.client.table("advertisement_views").select(
+            "id", count="exact", head=True
+        ).eq("user_id", user_id).gte("viewed_at", _utc(since)).execute()
+        return result.count or 0
+
+    async def record(self, views: List[dict]) -> None:
+        await self.client.table("advertisement_views").upsert(
+            views, on_conflict="dedup_id", ignore_duplicates=True
+        ).execute()
+
+
+def supabase_repositories(client: AsyncClient) -> Repositories:
+    return Repositories(
+        races=SupabaseRaces(client),
+        horses=SupabaseHorses(client),
+        bets=SupabaseBets(client),
+        users=SupabaseUsers(client),
+        rankings=SupabaseRankings(client),
+        coin_transactions=SupabaseCoinTransactions(client),
+        advertisement_views=SupabaseAdvertisementViews(client),
+    )
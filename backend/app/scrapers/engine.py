@@ -0,0 +1,318 @@
+"""スクレイピングエンジン
+
+複数ページを並行して取得しつつ、取得先のサイトに負荷をかけないよう制限する。
+
+- ホストごとに同時リクエスト数（SCRAPER_HOST_CONCURRENCY）をセマフォで制限
+- ホストごとにトークンバケットで平均リクエスト数（SCRAPER_HOST_RATE）を制限
+- 一時的なエラー（タイムアウト・429・5xx）は指数バックオフで再試行
+- ブラウザコンテキストを使い回し、ページごとのブラウザ起動を避ける
+
+取得方法は Fetcher として差し替えられる（本番は BrowserPool、
+静的なページ・ローカルのフィクスチャサーバーには HttpFetcher、
+保存済みページの再解析には replay.ReplayFetcher）。
+取得したページは store を指定すると PageStore に保存する。
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Protocol, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from app.config import get_settings
+from app.scrapers.store import PageStore
+
+settings = get_settings()
+
+# ブラウザで読み込まないリソース（HTMLの解析に不要）
+BLOCKED_RESOURCES = {"image", "media", "font", "stylesheet"}
+
+
+class FetchError(Exception):
+    """ページの取得に失敗"""
+
+    def __init__(self, url: str, reason: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.status = status
+
+
+class TransientFetchError(FetchError):
+    """再試行すれば取得できる可能性があるエラー"""
+
+
+def _check_status(url: str, status: Optional[int]) -> None:
+    if status is None or status < 400:
+        return
+    if status == 429 or status >= 500:
+        raise TransientFetchError(url, f"HTTP {status}", status)
+    raise FetchError(url, f"HTTP {status}", status)
+
+
+class TokenBucket:
+    """平均 rate 回/秒、最大 capacity 回まで連続で許可するトークンバケット"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """トークンを1つ取得（足りない場合は補充されるまで待つ）"""
+        if self.rate <= 0:
+            return
+
+        # ロックを持ったまま待つことで、待機中のリクエストを到着順に通す
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostLimiter:
+    """ホストごとの同時リクエスト数とリクエスト頻度の制限"""
+
+    def __init__(
+        self,
+        concurrency: int = settings.SCRAPER_HOST_CONCURRENCY,
+        rate: float = settings.SCRAPER_HOST_RATE,
+        burst: int = settings.SCRAPER_HOST_BURST,
+    ):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self._hosts: Dict[str, Tuple[asyncio.Semaphore, TokenBucket]] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """リクエスト1回分の枠を確保"""
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = (asyncio.Semaphore(self.concurrency), TokenBucket(self.rate, self.burst))
+        semaphore, bucket = self._hosts[host]
+
+        async with semaphore:
+            await bucket.acquire()
+            yield
+
+
+class Fetcher(Protocol):
+    """ページの取得方法"""
+
+    async def start(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+    async def fetch(self, url: str) -> str: ...
+
+
+class HttpFetcher:
+    """HTTPでHTMLを取得（JavaScriptを実行しない）"""
+
+    def __init__(
+        self,
+        timeout: float = settings.SCRAPER_TIMEOUT_SECONDS,
+        user_agent: str = settings.SCRAPER_USER_AGENT,
+    ):
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            headers={"User-Agent": self.user_agent},
+            follow_redirects=True,
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> str:
+        try:
+            response = await self._client.get(url)
+        except httpx.TransportError as e:
+            raise TransientFetchError(url, repr(e)) from e
+        _check_status(url, response.status_code)
+        return response.text
+
+
+class BrowserPool:
+    """使い回すブラウザコンテキストのプール
+
+    ブラウザは1つだけ起動し、コンテキストを size 個作ってキューで貸し出す。
+    メモリの増加を避けるため、max_pages ページごとにコンテキストを作り直す。
+    """
+
+    def __init__(
+        self,
+        size: int = settings.SCRAPER_BROWSER_CONTEXTS,
+        max_pages: int = settings.SCRAPER_CONTEXT_MAX_PAGES,
+        timeout: float = settings.SCRAPER_TIMEOUT_SECONDS,
+        user_agent: str = settings.SCRAPER_USER_AGENT,
+        wait_until: str = "networkidle",
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.wait_until = wait_until
+        self._playwright = None
+        self._browser = None
+        self._contexts: asyncio.Queue = asyncio.Queue()
+
+    async def start(self) -> None:
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        for _ in range(self.size):
+            self._contexts.put_nowait((await self._new_context(), 0))
+
+    async def close(self) -> None:
+        while not self._contexts.empty():
+            context, _ = self._contexts.get_nowait()
+            await context.close()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _new_context(self):
+        context = await self._browser.new_context(
+            user_agent=self.user_agent,
+            locale="ja-JP",
+            timezone_id="Asia/Tokyo",
+        )
+        context.set_default_timeout(self.timeout * 1000)
+        await context.route("**/*", _block_assets)
+        return context
+
+    async def fetch(self, url: str) -> str:
+        context, pages = await self._contexts.get()
+        broken = False
+        page = None
+        try:
+            page = await context.new_page()
+            response = await page.goto(url, wait_until=self.wait_until)
+            _check_status(url, response.status if response else None)
+            return await page.content()
+        except PlaywrightTimeoutError as e:
+            raise TransientFetchError(url, "timeout") from e
+        except PlaywrightError as e:
+            # ページを開けない・閉じたコンテキストは使い回さない
+            broken = True
+            raise TransientFetchError(url, e.message) from e
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except PlaywrightError:
+                    broken = True
+            await self._release(context, pages + 1, broken)
+
+    async def _release(self, context, pages: int, broken: bool = False) -> None:
+        """コンテキストをプールに戻す（壊れているか上限に達していれば作り直す）"""
+        if broken or pages >= self.max_pages:
+            try:
+                fresh = await self._new_context()
+            except PlaywrightError as e:
+                # 作り直せない場合は元のコンテキストを戻し、次の返却時に再度作り直す
+                logger.warning(f"Failed to recycle browser context: {e}")
+                pages = self.max_pages
+            else:
+                try:
+                    await context.close()
+                except PlaywrightError as e:
+                    logger.debug(f"Failed to close browser context: {e}")
+                context, pages = fresh, 0
+        self._contexts.put_nowait((context, pages))
+
+
+async def _block_assets(route) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class Scraper:
+    """制限付きで複数ページを並行取得する
+
+    使い方:
+        async with Scraper(BrowserPool()) as scraper:
+            pages = await scraper.fetch_all(urls)
+    """
+
+    def __init__(
+        self,
+        fetcher: Fetcher,
+        limiter: Optional[HostLimiter] = None,
+        store: Optional[PageStore] = None,
+        attempts: int = settings.SCRAPER_RETRY_ATTEMPTS,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+    ):
+        self.fetcher = fetcher
+        self.limiter = limiter or HostLimiter()
+        self.store = store
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    async def __aenter__(self) -> "Scraper":
+        await self.fetcher.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.fetcher.close()
+
+    async def fetch(self, url: str) -> str:
+        """1ページ取得（一時的なエラーは再試行）
+
+        再試行の待機中はホストの枠を解放し、他のリクエストを止めない。
+        """
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.attempts),
+            wait=wait_exponential_jitter(initial=self.backoff, max=self.max_backoff),
+            retry=retry_if_exception_type(TransientFetchError),
+            reraise=True,
+        )
+        async for attempt in retrying:
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    logger.debug(f"Retrying {url} (attempt {attempt.retry_state.attempt_number})")
+                async with self.limiter.slot(url):
+                    html = await self.fetcher.fetch(url)
+        if self.store is not None:
+            # ハッシュ・圧縮・書き込みはスレッドで行い、他のページの取得を止めない
+            await asyncio.to_thread(self.store.put, url, html, datetime.now(timezone.utc))
+        return html
+
+    async def fetch_all(self, urls: List[str]) -> List[Union[str, FetchError]]:
+        """複数ページを並行取得（失敗したページは FetchError を返す）"""
+        async def fetch_one(url: str) -> Union[str, FetchError]:
+            try:
+                return await self.fetch(url)
+            except FetchError as e:
+                logger.warning(f"Failed to fetch {e}")
+                return e
+
+        return await asyncio.gather(*(fetch_one(url) for url in urls))
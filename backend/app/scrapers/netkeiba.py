@@ -0,0 +1,185 @@
+"""netkeiba のレース一覧・出馬表
+
+レース一覧（開催日の全レースID）を取得し、各レースの出馬表を並行して取得・解析する。
+解析は取得済みHTMLだけを入力とする純粋な関数にしている。
+
+レースID（12桁）: 年(4) + 競馬場(2) + 回(2) + 日目(2) + レース番号(2)
+"""
+
+import asyncio
+import re
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+from loguru import logger
+
+from app.config import get_settings
+from app.models.race import Horse
+from app.scrapers.engine import FetchError, Scraper
+from app.services.clock import JST, db_timestamp
+
+settings = get_settings()
+
+VENUES = {
+    "01": "札幌", "02": "函館", "03": "福島", "04": "新潟", "05": "東京",
+    "06": "中山", "07": "中京", "08": "京都", "09": "阪神", "10": "小倉",
+}
+
+SURFACES = {"芝": "turf", "ダ": "dirt", "障": "turf"}
+
+SEXES = {"牡": "male", "牝": "female", "セ": "gelding"}
+
+GRADES = {"Icon_GradeType1": "G1", "Icon_GradeType2": "G2", "Icon_GradeType3": "G3"}
+
+RACE_ID_PATTERN = re.compile(r"race_id=(\d{12})")
+START_TIME_PATTERN = re.compile(r"(\d{1,2}):(\d{2})発走")
+COURSE_PATTERN = re.compile(r"(芝|ダ|障)\D*?(\d{3,4})m")
+WEATHER_PATTERN = re.compile(r"天候\s*:\s*(\S+)")
+CONDITION_PATTERN = re.compile(r"馬場\s*:\s*(\S+)")
+
+
+# 解析に使う要素だけを木にする（ページ全体を木にするより速い）
+RACE_LIST_PARTS = SoupStrainer(class_="RaceList_DataItem")
+RACE_CARD_PARTS = SoupStrainer(class_=["RaceName", "RaceData01", "HorseList"])
+
+
+class ParseError(ValueError):
+    """ページの構造が想定と異なる"""
+
+
+def race_list_url(day: date, base_url: str = settings.SCRAPER_BASE_URL) -> str:
+    """開催日のレース一覧"""
+    return f"{base_url}/top/race_list_sub.html?kaisai_date={day:%Y%m%d}"
+
+
+def race_card_url(race_id: str, base_url: str = settings.SCRAPER_BASE_URL) -> str:
+    """出馬表"""
+    return f"{base_url}/race/shutuba.html?race_id={race_id}"
+
+
+def parse_race_list(html: str) -> List[str]:
+    """レース一覧からレースIDを取り出す（ページ内の順序を保つ）"""
+    soup = BeautifulSoup(html, "lxml", parse_only=RACE_LIST_PARTS)
+    race_ids = []
+    for link in soup.select(".RaceList_DataItem a[href]"):
+        match = RACE_ID_PATTERN.search(link["href"])
+        if match:
+            race_ids.append(match.group(1))
+    return list(dict.fromkeys(race_ids))
+
+
+def _text(node) -> str:
+    return node.get_text(" ", strip=True) if node is not None else ""
+
+
+def _number(text: str, cast=float) -> Optional[float]:
+    try:
+        return cast(text.strip())
+    except ValueError:
+        return None
+
+
+def _parse_horse(row) -> Optional[dict]:
+    number = _number(_text(row.select_one("td[class^=Umaban]")), int)
+    if number is None:
+        return None
+
+    barei = row.select_one("td.Barei")
+    sex_age = _text(barei)
+    odds = _number(_text(row.select_one("span[id^=odds-]")))
+    popularity = _number(_text(row.select_one("span[id^=ninki-]")), int)
+
+    # オッズ発表前は "---.-" のため 0 とし、以後のオッズ更新で上書きする
+    horse = Horse(
+        number=number,
+        name=_text(row.select_one(".HorseName")),
+        jockey=_text(row.select_one("td.Jockey")),
+        trainer=_text(row.select_one("td.Trainer a")) or None,
+        weight=_number(_text(barei.find_next_sibling("td"))) if barei is not None else None,
+        odds=odds or 0.0,
+        popularity=popularity or 0,
+        age=_number(sex_age[1:], int) if sex_age else None,
+        sex=SEXES.get(sex_age[:1]),
+    )
+    return horse.model_dump()
+
+
+def parse_race_card(html: str, race_id: str, day: date) -> dict:
+    """出馬表からレースと出走馬を取り出す
+
+    Returns:
+        races テーブルの行（"horses" に horses テーブルの行のリスト）。
+        時刻はJSTの発走時刻をUTC（オフセットなし）にした文字列。
+        status は含めない（新規は既定値の upcoming、既存は進行中の状態を保つ）
+    """
+    soup = BeautifulSoup(html, "lxml", parse_only=RACE_CARD_PARTS)
+    venue = VENUES.get(race_id[4:6])
+    if venue is None:
+        raise ParseError(f"Unknown venue code in race_id: {race_id}")
+
+    race_name = soup.select_one(".RaceName")
+    data = _text(soup.select_one(".RaceData01"))
+    start = START_TIME_PATTERN.search(data)
+    course = COURSE_PATTERN.search(data)
+    if race_name is None or start is None or course is None:
+        raise ParseError(f"Unexpected race card layout: {race_id}")
+
+    grade = next(
+        (grade for css, grade in GRADES.items() if race_name.select_one(f".{css}") is not None),
+        None,
+    )
+    weather = WEATHER_PATTERN.search(data)
+    condition = CONDITION_PATTERN.search(data)
+    start_time = datetime.combine(day, time(int(start.group(1)), int(start.group(2))), tzinfo=JST)
+
+    horses = [horse for horse in map(_parse_horse, soup.select("tr.HorseList")) if horse]
+    if not horses:
+        raise ParseError(f"No horses in race card: {race_id}")
+
+    return {
+        "date": day.isoformat(),
+        "venue": venue,
+        "race_number": int(race_id[10:12]),
+        "race_name": _text(race_name),
+        "grade": grade,
+        "distance": int(course.group(2)),
+        "surface": SURFACES[course.group(1)],
+        "condition": condition.group(1) if condition else "良",
+        "weather": weather.group(1) if weather else None,
+        "start_time": db_timestamp(start_time),
+        "betting_start_time": db_timestamp(
+            start_time - timedelta(minutes=settings.BETTING_OPENS_MINUTES_BEFORE)
+        ),
+        "betting_end_time": db_timestamp(
+            start_time - timedelta(minutes=settings.BETTING_CLOSES_MINUTES_BEFORE)
+        ),
+        "horses": horses,
+    }
+
+
+async def scrape_race_day(
+    scraper: Scraper,
+    day: date,
+    base_url: str = settings.SCRAPER_BASE_URL,
+) -> List[dict]:
+    """開催日の全レースの出馬表を取得
+
+    出馬表は並行して取得し（同時数・頻度は Scraper の制限に従う）、届いたものから解析する。
+    取得・解析に失敗したレースはログに残して除外する。
+    """
+    async def scrape_card(race_id: str) -> Optional[dict]:
+        try:
+            page = await scraper.fetch(race_card_url(race_id, base_url))
+            return parse_race_card(page, race_id, day)
+        except FetchError as e:
+            logger.warning(f"Failed to fetch race card: {e}")
+        except ParseError as e:
+            logger.warning(f"Failed to parse race card: {e}")
+        return None
+
+    race_ids = parse_race_list(await scraper.fetch(race_list_url(day, base_url)))
+    races = [race for race in await asyncio.gather(*map(scrape_card, race_ids)) if race]
+
+    logger.info(f"Scraped {len(races)}/{len(race_ids)} races for {day}")
+    return races
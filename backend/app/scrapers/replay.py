@@ -0,0 +1,122 @@
+"""保存済みページの再解析（オフライン）
+
+PageStore に保存したページだけを使い、ネットワークにアクセスせずにパーサーを実行する。
+
+- ReplayFetcher: Scraper の取得方法として使い、本番と同じ処理を保存済みページで再現する
+- replay_days: 期間内の全出馬表をプロセスプールで並列に解析する（過去分の再作成用）
+
+実行:
+    cd backend && python -m app.scrapers.replay 2025-01-01 2025-03-31 --workers 8
+    cd backend && python -m app.scrapers.replay 2025-01-05 2025-01-05 --save  # DBに保存
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+from loguru import logger
+
+from app.config import get_settings
+from app.scrapers.engine import FetchError
+from app.scrapers.netkeiba import ParseError, parse_race_card, parse_race_list, race_card_url, race_list_url
+from app.scrapers.store import PageStore, read_blob
+
+settings = get_settings()
+
+# 1回にワーカーへ渡す出馬表の数
+CHUNK_SIZE = 16
+
+
+class ReplayFetcher:
+    """保存済みページを返す取得方法（as_of 指定時はその時点で最新の保存）"""
+
+    def __init__(self, store: PageStore, as_of: Optional[datetime] = None):
+        self.store = store
+        self.as_of = as_of
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def fetch(self, url: str) -> str:
+        page = self.store.latest(url, self.as_of)
+        if page is None:
+            raise FetchError(url, "not stored", 404)
+        return self.store.get(page.digest)
+
+
+def _parse_card(root: str, digest: str, race_id: str, day: date) -> Optional[dict]:
+    """ワーカープロセスで出馬表を1件解析"""
+    try:
+        return parse_race_card(read_blob(root, digest), race_id, day)
+    except ParseError as e:
+        logger.warning(f"Failed to parse race card: {e}")
+        return None
+
+
+def replay_days(
+    store: PageStore,
+    days: Iterable[date],
+    workers: Optional[int] = None,
+    as_of: Optional[datetime] = None,
+    base_url: str = settings.SCRAPER_BASE_URL,
+) -> List[dict]:
+    """指定日の保存済み出馬表をすべて解析
+
+    索引の参照は呼び出し元のプロセスで行い、HTMLの読み込み・展開・解析を
+    ワーカープロセスに分散する。
+
+    Returns:
+        scrape_race_day と同じ形式のレース（日付・レース番号順）
+    """
+    cards = []
+    for day in days:
+        listing = store.latest(race_list_url(day, base_url), as_of)
+        if listing is None:
+            continue
+        for race_id in parse_race_list(store.get(listing.digest)):
+            page = store.latest(race_card_url(race_id, base_url), as_of)
+            if page is not None:
+                cards.append((page.digest, race_id, day))
+
+    if not cards:
+        return []
+
+    digests, race_ids, card_days = zip(*cards)
+    roots = [str(store.root)] * len(cards)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        races = pool.map(_parse_card, roots, digests, race_ids, card_days, chunksize=CHUNK_SIZE)
+        return [race for race in races if race]
+
+
+def _date_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("start", type=date.fromisoformat, help="開始日（YYYY-MM-DD）")
+    parser.add_argument("end", type=date.fromisoformat, help="終了日（YYYY-MM-DD）")
+    parser.add_argument("--store", default=settings.SCRAPER_STORE_DIR, help="保存先")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数（既定: CPU数）")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None, help="この時点までの保存を使う")
+    parser.add_argument("--save", action="store_true", help="解析結果をDBに保存")
+    args = parser.parse_args()
+
+    store = PageStore(args.store)
+    races = replay_days(store, _date_range(args.start, args.end), args.workers, args.as_of)
+    logger.info(f"Replayed {len(races)} races from {args.start} to {args.end}")
+
+    if args.save:
+        from app.tasks.clients import get_redis, get_supabase
+        from app.tasks.race_tasks import save_races
+
+        logger.info(f"Saved races: {save_races(get_supabase(), races, get_redis())}")
+
+
+if __name__ == "__main__":
+    main()
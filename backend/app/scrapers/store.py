@@ -0,0 +1,136 @@
+"""取得したページの保存（コンテンツアドレス方式）
+
+スクレイピングで取得したHTMLをすべてディスクに保存し、パーサーを変更したときに
+取得先のサイトに再アクセスせずに解析し直せるようにする。
+
+- objects/<ハッシュ先頭2桁>/<SHA-256>.html.gz: gzip圧縮したHTML（内容が同じページは1つだけ保存）
+- index.sqlite3: URL・取得時刻 → ハッシュの索引（ハッシュからの逆引き用の索引付き）
+
+保存先は SCRAPER_STORE_DIR（空文字の場合は保存しない）。
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from app.config import get_settings
+
+settings = get_settings()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (url, fetched_at)
+);
+CREATE INDEX IF NOT EXISTS pages_digest_idx ON pages (digest);
+"""
+
+
+@dataclass(frozen=True)
+class StoredPage:
+    """索引の1行"""
+    url: str
+    fetched_at: str  # ISO 8601（UTC）
+    digest: str
+    size: int
+
+
+def blob_path(root: Union[str, Path], digest: str) -> Path:
+    """ハッシュに対応する保存先"""
+    return Path(root) / "objects" / digest[:2] / f"{digest}.html.gz"
+
+
+def read_blob(root: Union[str, Path], digest: str) -> str:
+    """保存したHTMLを読み込む（索引を開かずに読めるため、別プロセスからも使う）"""
+    return gzip.decompress(blob_path(root, digest).read_bytes()).decode("utf-8")
+
+
+class PageStore:
+    """取得したページの保存先
+
+    put は圧縮・書き込みでイベントループを止めないようスレッドから呼ぶため、
+    索引のSQLite接続はロックで1つずつ使う。
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.root / "index.sqlite3", check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def put(self, url: str, html: str, fetched_at: Optional[datetime] = None) -> str:
+        """ページを保存して索引に追加
+
+        Returns:
+            内容のハッシュ
+        """
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+
+        path = blob_path(self.root, digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+            tmp.write_bytes(gzip.compress(data, compresslevel=6))
+            os.replace(tmp, path)
+
+        fetched_at = (fetched_at or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, fetched_at, digest, size) VALUES (?, ?, ?, ?)",
+                (url, fetched_at.isoformat(), digest, len(data)),
+            )
+        return digest
+
+    def get(self, digest: str) -> str:
+        """ハッシュからHTMLを取得"""
+        return read_blob(self.root, digest)
+
+    def latest(self, url: str, as_of: Optional[datetime] = None) -> Optional[StoredPage]:
+        """URLの最新の保存（as_of 指定時はその時点で最新のもの）"""
+        query = "SELECT url, fetched_at, digest, size FROM pages WHERE url = ?"
+        params: tuple = (url,)
+        if as_of is not None:
+            query += " AND fetched_at <= ?"
+            params += (as_of.astimezone(timezone.utc).isoformat(),)
+        with self._lock:
+            row = self._db.execute(query + " ORDER BY fetched_at DESC LIMIT 1", params).fetchone()
+        return StoredPage(*row) if row else None
+
+    def history(self, url: str) -> Iterator[StoredPage]:
+        """URLの保存履歴（古い順）"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, fetched_at, digest, size FROM pages WHERE url = ? ORDER BY fetched_at", (url,)
+            ).fetchall()
+        return (StoredPage(*row) for row in rows)
+
+    def urls_for(self, digest: str) -> Iterator[StoredPage]:
+        """同じ内容のページの保存履歴"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, fetched_at, digest, size FROM pages WHERE digest = ? ORDER BY fetched_at", (digest,)
+            ).fetchall()
+        return (StoredPage(*row) for row in rows)
+
+
+def default_store() -> Optional[PageStore]:
+    """設定の保存先（SCRAPER_STORE_DIR が空の場合はNone）"""
+    if not settings.SCRAPER_STORE_DIR:
+        return None
+    return PageStore(settings.SCRAPER_STORE_DIR)
@@ -0,0 +1,53 @@
+"""買い目の展開（ボックス・フォーメーション）"""
+
+import math
+from itertools import combinations, permutations, product
+from typing import Iterable, List, Tuple
+
+Ticket = Tuple[int, ...]
+
+
+def normalize_ticket(selections: Iterable[int], ordered: bool) -> Ticket:
+    """買い目を正規化（順番を問わない券種は昇順に並べる）"""
+    ticket = tuple(selections)
+    return ticket if ordered else tuple(sorted(ticket))
+
+
+def count_box(horses: List[int], size: int, ordered: bool) -> int:
+    """ボックス買いの点数（展開せずに求める）"""
+    unique = len(set(horses))
+    return math.perm(unique, size) if ordered else math.comb(unique, size)
+
+
+def expand_box(horses: List[int], size: int, ordered: bool) -> List[Ticket]:
+    """ボックス買いを展開
+
+    例: 3連単 6頭ボックス → 6P3 = 120点、3連複 6頭ボックス → 6C3 = 20点
+    """
+    unique_horses = sorted(set(horses))
+    if ordered:
+        return list(permutations(unique_horses, size))
+    return list(combinations(unique_horses, size))
+
+
+def expand_formation(positions: List[List[int]], ordered: bool) -> List[Ticket]:
+    """フォーメーション買いを展開
+
+    positions は着順（もしくは選択順）ごとの候補馬番。
+    同じ馬を複数回含む組み合わせは除外し、順番を問わない券種では重複をまとめる。
+    """
+    tickets: dict[Ticket, None] = {}
+    for selections in product(*positions):
+        if len(set(selections)) != len(selections):
+            continue
+        tickets[normalize_ticket(selections, ordered)] = None
+    return list(tickets)
+
+
+def merge_tickets(groups: Iterable[Iterable[Ticket]]) -> List[Ticket]:
+    """複数の展開結果を重複なく順序を保って結合"""
+    tickets: dict[Ticket, None] = {}
+    for group in groups:
+        for ticket in group:
+            tickets[ticket] = None
+    return list(tickets)
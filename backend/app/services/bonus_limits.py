@@ -0,0 +1,135 @@
+"""ボーナスの1日あたりの受け取り制限
+
+ユーザーごと・日（JST）ごとの受け取り状況をRedisに持ち、DBを参照せずに制限を判定する。
+キーは翌日0時（JST）に失効する。
+
+- bonus:login:<user_id>:<YYYY-MM-DD>: ログインボーナスの受け取り済みマーカー（SET NX）
+- bonus:ad:<user_id>:<YYYY-MM-DD>: 広告視聴ボーナスの受け取り回数（INCR）
+- bonus:ad-claim:<user_id>:<YYYY-MM-DD>:<Idempotency-Key>: 再送時に返すレスポンス
+
+Redis未設定・障害時は各メソッドがNoneを返し、呼び出し側はDBで判定する。
+"""
+
+import json
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.services.clock import JST, jst_now
+
+KEY_PREFIX = "bonus:"
+
+# 日付の切り替わり直後に前日のキーが参照されても失効済みにならないよう少し長めに保持する
+EXPIRY_GRACE_SECONDS = 60
+
+
+def _day_keys(kind: str, user_id: str, now: datetime) -> tuple[str, int]:
+    """その日のキーと失効時刻（UNIX秒）"""
+    today = now.date()
+    expires_at = datetime.combine(today + timedelta(days=1), time(), tzinfo=JST)
+    key = f"{KEY_PREFIX}{kind}:{user_id}:{today.isoformat()}"
+    return key, int(expires_at.timestamp()) + EXPIRY_GRACE_SECONDS
+
+
+class BonusLimits:
+    """ボーナス受け取り制限のカウンター"""
+
+    async def claim_login(self, redis: Optional[Redis], user_id: str) -> Optional[bool]:
+        """今日のログインボーナスの受け取り権を取得
+
+        Returns:
+            True: 今回受け取れる / False: 今日は受け取り済み / None: Redisが使えない
+        """
+        if redis is None:
+            return None
+
+        key, expires_at = _day_keys("login", user_id, jst_now())
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(key, 1, nx=True)
+                pipe.expireat(key, expires_at)
+                claimed, _ = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Login bonus marker failed: {e}")
+            return None
+        return bool(claimed)
+
+    async def release_login(self, redis: Optional[Redis], user_id: str) -> None:
+        """付与に失敗した場合に受け取り権を戻す"""
+        if redis is None:
+            return
+
+        key, _ = _day_keys("login", user_id, jst_now())
+        try:
+            await redis.delete(key)
+        except RedisError as e:
+            logger.warning(f"Login bonus marker release failed: {e}")
+
+    async def claim_ad(self, redis: Optional[Redis], user_id: str) -> Optional[int]:
+        """今日の広告視聴ボーナスの受け取り回数を1増やす
+
+        Returns:
+            今回を含む今日の受け取り回数（上限を超えた値も返す） / None: Redisが使えない
+        """
+        if redis is None:
+            return None
+
+        key, expires_at = _day_keys("ad", user_id, jst_now())
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expireat(key, expires_at)
+                count, _ = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Ad bonus counter failed: {e}")
+            return None
+        return count
+
+    async def release_ad(self, redis: Optional[Redis], user_id: str) -> None:
+        """付与しなかった場合に受け取り回数を戻す"""
+        if redis is None:
+            return
+
+        key, _ = _day_keys("ad", user_id, jst_now())
+        try:
+            await redis.decr(key)
+        except RedisError as e:
+            logger.warning(f"Ad bonus counter release failed: {e}")
+
+    async def replay_ad(
+        self, redis: Optional[Redis], user_id: str, idempotency_key: Optional[str]
+    ) -> Optional[dict]:
+        """同じ冪等キーで受け取り済みの場合は前回のレスポンスを返す"""
+        if redis is None or not idempotency_key:
+            return None
+
+        key, _ = _day_keys("ad-claim", user_id, jst_now())
+        try:
+            raw = await redis.get(f"{key}:{idempotency_key}")
+        except RedisError as e:
+            logger.warning(f"Ad bonus replay lookup failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def remember_ad(
+        self,
+        redis: Optional[Redis],
+        user_id: str,
+        idempotency_key: Optional[str],
+        response: dict,
+    ) -> None:
+        """冪等キーに対するレスポンスを保存"""
+        if redis is None or not idempotency_key:
+            return
+
+        key, expires_at = _day_keys("ad-claim", user_id, jst_now())
+        try:
+            await redis.set(f"{key}:{idempotency_key}", json.dumps(response), exat=expires_at)
+        except RedisError as e:
+            logger.warning(f"Ad bonus replay store failed: {e}")
+
+
+bonus_limits = BonusLimits()
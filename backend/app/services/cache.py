@@ -0,0 +1,62 @@
+"""プロセス内キャッシュ"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """有効期限付きのLRUキャッシュ
+
+    エントリごとに有効期限を持ち、最大件数を超えた場合は最も古く参照されたものから破棄する。
+    ヒット・ミス数を記録し、キャッシュ効率の確認に使う。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """値を取得（期限切れ・未登録の場合はNone）"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """値を登録（ttlを省略した場合は既定の有効期限）"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """値を削除"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """全エントリを削除"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        """ヒット率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,47 @@
+"""日本時間（JST）の日付
+
+ボーナスの受け取り回数やランキングの集計期間は日本時間の日付で区切る。
+DBに保存する時刻はUTC（timestamp 列、タイムゾーンなし）で、JSTは日の区切りにだけ使う。
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+
+JST = timezone(timedelta(hours=9))
+
+
+def jst_now() -> datetime:
+    """現在時刻（JST）"""
+    return datetime.now(JST)
+
+
+def jst_today() -> date:
+    """今日の日付（JST）"""
+    return jst_now().date()
+
+
+def utc_now() -> datetime:
+    """現在時刻（UTC、DBの timestamp 列に保存する時刻）"""
+    return datetime.now(timezone.utc)
+
+
+def jst_day_start(moment: datetime) -> datetime:
+    """その時刻が属する日（JST）の0時"""
+    return datetime.combine(moment.astimezone(JST).date(), time(), tzinfo=JST)
+
+
+def db_timestamp(moment: datetime) -> str:
+    """DBの時刻の文字列（UTC、オフセットなし）"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def parse_timestamp(value: str) -> datetime:
+    """DBの時刻の文字列（オフセットなしはUTC）"""
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def epoch_seconds(value: str) -> float:
+    """DBの時刻の文字列をUNIX秒に（オフセットなしはUTC）"""
+    return parse_timestamp(value).timestamp()
@@ -0,0 +1,193 @@
+"""リクエスト単位のDB呼び出しのトレース
+
+DBへの1往復ごとに（テーブル, 操作, 時間）を実行中のトレースに記録する。記録するのはクライアントの層で、
+リポジトリの1メソッドが複数回問い合わせればその回数分になる。
+
+- Supabase（PostgREST）: HTTPクライアントの1リクエスト（trace_http、テーブルと HTTP メソッド、RPC は rpc.<関数名>）
+- postgres（asyncpg）: プールの1呼び出し（TracedPool、app/repositories/postgres.py）
+- memory: execute() の1回（app/repositories/memory.py）
+
+トレースは DBTraceMiddleware がリクエストごとに開始し、
+
+- 呼び出し回数が DB_TRACE_BUDGET を超えた場合、同じ操作を DB_TRACE_REPEAT_LIMIT 回より
+  多く呼んだ場合（N+1 の疑い）に警告を出す
+- DB_TRACE_SERVER_TIMING の場合のみ、応答に Server-Timing ヘッダー（操作ごとの合計時間と回数、
+  db は全体）を付ける（テーブル名が応答に出るため開発環境向け）
+
+ベンチマーク（benchmarks/scenarios.py）も trace() でリクエストごとの呼び出し回数を数える。
+"""
+
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+@dataclass
+class Span:
+    table: str
+    operation: str
+    duration: float
+
+    @property
+    def shape(self) -> str:
+        """呼び出しの形（同じ形の繰り返しを N+1 とみなす）"""
+        return f"{self.table}.{self.operation}"
+
+
+@dataclass
+class DBTrace:
+    """1リクエスト分のDB呼び出し"""
+
+    spans: List[Span] = field(default_factory=list)
+
+    def record(self, table: str, operation: str, duration: float) -> None:
+        self.spans.append(Span(table, operation, duration))
+
+    @property
+    def calls(self) -> int:
+        return len(self.spans)
+
+    @property
+    def duration(self) -> float:
+        return sum(span.duration for span in self.spans)
+
+    def shapes(self) -> Dict[str, Tuple[int, float]]:
+        """形ごとの (回数, 合計時間)（最初に呼んだ順）"""
+        summary: Dict[str, Tuple[int, float]] = {}
+        for span in self.spans:
+            count, duration = summary.get(span.shape, (0, 0.0))
+            summary[span.shape] = (count + 1, duration + span.duration)
+        return summary
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダーの値（時間はミリ秒）"""
+        metrics = [
+            f'{shape};dur={duration * 1000:.1f};desc="x{count}"'
+            for shape, (count, duration) in self.shapes().items()
+        ]
+        metrics.append(f'db;dur={self.duration * 1000:.1f};desc="x{self.calls}"')
+        return ", ".join(metrics)
+
+    def problems(self, budget: int, repeat_limit: int) -> List[str]:
+        """呼び出し回数の上限超過と、同じ形の繰り返し"""
+        problems = []
+        if self.calls > budget:
+            problems.append(f"{self.calls} DB calls (budget {budget})")
+        for shape, (count, _) in self.shapes().items():
+            if count > repeat_limit:
+                problems.append(f"{shape} called {count} times")
+        return problems
+
+
+_current: ContextVar[Optional[DBTrace]] = ContextVar("db_trace", default=None)
+
+
+def current_trace() -> Optional[DBTrace]:
+    """実行中のトレース（トレースの外では None）"""
+    return _current.get()
+
+
+@contextmanager
+def trace() -> Iterator[DBTrace]:
+    """このブロック内（と、そこから作られたタスク）のDB呼び出しを記録する"""
+    db_trace = DBTrace()
+    token = _current.set(db_trace)
+    try:
+        yield db_trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(table: str, operation: str) -> Iterator[None]:
+    """DBへの1往復を記録する（トレースの外では何もしない）"""
+    db_trace = _current.get()
+    if db_trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        db_trace.record(table, operation, time.perf_counter() - started)
+
+
+# PostgREST の HTTP メソッド → 操作
+HTTP_OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+def postgrest_shape(request: httpx.Request) -> Tuple[str, str]:
+    """PostgREST のリクエストの (テーブル, 操作)（/rest/v1/<テーブル>、/rest/v1/rpc/<関数>）"""
+    segments = request.url.path.rstrip("/").split("/")
+    if len(segments) >= 2 and segments[-2] == "rpc":
+        return "rpc", segments[-1]
+    return segments[-1], HTTP_OPERATIONS.get(request.method, request.method.lower())
+
+
+def trace_http(session: httpx.AsyncClient) -> None:
+    """HTTPクライアント（PostgREST）の1リクエストごとにトレースへ記録する
+
+    応答ヘッダーを受け取るまでの時間を記録する。応答のないリクエスト（接続エラー）は記録しない。
+    """
+    started: "weakref.WeakKeyDictionary[httpx.Request, float]" = weakref.WeakKeyDictionary()
+
+    async def on_request(request: httpx.Request) -> None:
+        if _current.get() is not None:
+            started[request] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        began = started.pop(response.request, None)
+        db_trace = _current.get()
+        if began is not None and db_trace is not None:
+            db_trace.record(*postgrest_shape(response.request), time.perf_counter() - began)
+
+    hooks = session.event_hooks
+    session.event_hooks = {
+        "request": [*hooks.get("request", []), on_request],
+        "response": [*hooks.get("response", []), on_response],
+    }
+
+
+class DBTraceMiddleware:
+    """リクエストごとにDB呼び出しを記録する ASGI ミドルウェア（server_timing の場合は Server-Timing ヘッダーも付ける）"""
+
+    def __init__(self, app: ASGIApp, budget: int, repeat_limit: int, server_timing: bool = False):
+        self.app = app
+        self.budget = budget
+        self.repeat_limit = repeat_limit
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with trace() as db_trace:
+            async def send_wrapper(message) -> None:
+                if self.server_timing and message["type"] == "http.response.start":
+                    # 応答開始までの呼び出し（バックグラウンドタスクの分は含まない）
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", db_trace.server_timing())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                problems = db_trace.problems(self.budget, self.repeat_limit)
+                if problems:
+                    # ルーティング後は scope にルートが入る（パスのテンプレートで出す）
+                    route = getattr(scope.get("route"), "path", scope["path"])
+                    logger.warning(
+                        f"DB trace {scope['method']} {route}: {'; '.join(problems)} "
+                        f"[{db_trace.duration * 1000:.1f}ms in DB, "
+                        f"{(time.perf_counter() - started) * 1000:.1f}ms total]"
+                    )
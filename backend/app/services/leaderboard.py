@@ -0,0 +1,193 @@
+"""ランキング用のリーダーボード
+
+総資産・収支・的中率の3種類のランキングをRedisのソート済みセットで保持する。
+ユーザーの残高や成績が変わるたびに該当ユーザーのスコアだけを更新し、
+上位N件のページ取得と自分の順位の取得をいずれも O(log n) で行う。
+
+- leaderboard:<board>: ユーザーIDをメンバー、スコアを値とするソート済みセット
+- leaderboard:profiles: ランキング表示用のユーザー情報（JSON）のハッシュ
+- leaderboard:built: 再構築済みの印。ない場合APIはDBから直接ランキングを作る
+
+的中率ランキングは予想数が WIN_RATE_MIN_BETS 以上のユーザーのみを対象とする。
+DBとの整合は rebuild（python -m app.tasks.ranking_tasks）で復元できる。
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+KEY_PREFIX = "leaderboard:"
+PROFILES_KEY = KEY_PREFIX + "profiles"
+BUILT_KEY = KEY_PREFIX + "built"
+REBUILD_SUFFIX = ":rebuild"
+
+BOARDS = ("assets", "profit", "win_rate")
+
+# 的中率ランキングの対象となる最低予想数
+WIN_RATE_MIN_BETS = 10
+
+# ランキング表示に使うユーザーの列
+PROFILE_COLUMNS = (
+    "id", "display_name", "avatar", "coins", "total_earnings", "total_spent",
+    "win_rate", "total_bets", "total_wins",
+)
+
+
+def board_key(board: str) -> str:
+    """ソート済みセットのキー"""
+    return KEY_PREFIX + board
+
+
+def scores(user: dict) -> Dict[str, Optional[float]]:
+    """ユーザー行から各ランキングのスコアを計算（対象外の場合はNone）"""
+    total_bets = user.get("total_bets") or 0
+    return {
+        "assets": float(user.get("coins") or 0),
+        "profit": float((user.get("total_earnings") or 0) - (user.get("total_spent") or 0)),
+        "win_rate": float(user.get("win_rate") or 0) if total_bets >= WIN_RATE_MIN_BETS else None,
+    }
+
+
+def profile(user: dict) -> str:
+    """ランキング表示用のユーザー情報"""
+    return json.dumps({column: user.get(column) for column in PROFILE_COLUMNS}, default=str)
+
+
+def _queue_update(pipe, user: dict, suffix: str = "") -> None:
+    """ユーザー1人分の更新コマンドをパイプラインに積む（同期・非同期共通）"""
+    user_id = user["id"]
+    for board, score in scores(user).items():
+        if score is None:
+            pipe.zrem(board_key(board) + suffix, user_id)
+        else:
+            pipe.zadd(board_key(board) + suffix, {user_id: score})
+    pipe.hset(PROFILES_KEY + suffix, user_id, profile(user))
+
+
+@dataclass
+class LeaderboardPage:
+    """ランキングの1ページ"""
+    rows: List[dict]
+    total: int
+    my_rank: Optional[int]
+
+
+class Leaderboard:
+    """API用のリーダーボード操作"""
+
+    async def update_user(self, redis: Optional[Redis], user: dict) -> None:
+        """ユーザーのスコアを更新"""
+        if redis is None or not user.get("id"):
+            return
+
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                _queue_update(pipe, user)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Leaderboard update failed: {e}")
+
+    async def page(
+        self,
+        redis: Optional[Redis],
+        board: str,
+        offset: int,
+        limit: int,
+        user_id: str,
+    ) -> Optional[LeaderboardPage]:
+        """スコアの降順で1ページ分と自分の順位を取得
+
+        リーダーボードが未構築・Redis未設定の場合はNone（呼び出し側でDBから取得する）。
+        """
+        if redis is None:
+            return None
+
+        key = board_key(board)
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.exists(BUILT_KEY)
+                pipe.zcard(key)
+                pipe.zrevrange(key, offset, offset + limit - 1)
+                pipe.zrevrank(key, user_id)
+                built, total, user_ids, my_index = await pipe.execute()
+
+            if not built:
+                return None
+
+            profiles = await redis.hmget(PROFILES_KEY, user_ids) if user_ids else []
+        except RedisError as e:
+            logger.warning(f"Leaderboard read failed: {e}")
+            return None
+
+        rows = [json.loads(raw) for raw in profiles if raw is not None]
+        return LeaderboardPage(
+            rows=rows,
+            total=total,
+            my_rank=my_index + 1 if my_index is not None else None,
+        )
+
+
+def update_users(redis: Optional[SyncRedis], users: Iterable[dict]) -> None:
+    """複数ユーザーのスコアを更新（タスク用）"""
+    if redis is None:
+        return
+
+    try:
+        with redis.pipeline(transaction=False) as pipe:
+            for user in users:
+                _queue_update(pipe, user)
+            pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Leaderboard update failed: {e}")
+
+
+def rebuild(redis: SyncRedis, supabase, batch_size: int = 1000) -> int:
+    """DBのusersテーブルからリーダーボードを作り直す（タスク用）
+
+    作業用のキーに書き込んでから RENAME で一括して置き換えるため、
+    再構築中もAPIは古いランキングを返し続ける。
+
+    Returns:
+        登録したユーザー数
+    """
+    keys = [board_key(board) for board in BOARDS] + [PROFILES_KEY]
+    redis.delete(*(key + REBUILD_SUFFIX for key in keys))
+
+    count = 0
+    last_id = None
+    while True:
+        query = supabase.table("users").select(", ".join(PROFILE_COLUMNS)).order("id").limit(batch_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        users = query.execute().data or []
+        if not users:
+            break
+
+        with redis.pipeline(transaction=False) as pipe:
+            for user in users:
+                _queue_update(pipe, user, suffix=REBUILD_SUFFIX)
+            pipe.execute()
+
+        count += len(users)
+        last_id = users[-1]["id"]
+        if len(users) < batch_size:
+            break
+
+    with redis.pipeline(transaction=True) as pipe:
+        for key in keys:
+            if redis.exists(key + REBUILD_SUFFIX):
+                pipe.rename(key + REBUILD_SUFFIX, key)
+            else:
+                pipe.delete(key)
+        pipe.set(BUILT_KEY, count)
+        pipe.execute()
+
+    return count
+
+
+leaderboard = Leaderboard()
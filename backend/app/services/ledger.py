@@ -0,0 +1,249 @@
+"""コイン取引履歴の非同期書き込み（write-behind）
+
+ボーナス付与などのAPIは coin_transactions に直接INSERTせず、取引記録をRedis Stream
+（ledger:transactions）に追加してすぐに応答する。書き込みワーカー（LedgerFlusher）は
+コンシューマーグループで記録を読み出し、件数（LEDGER_BATCH_SIZE）か経過時間
+（LEDGER_FLUSH_INTERVAL_SECONDS）のどちらかに達した時点でテーブルごとに1回のINSERTで書き込む。
+監査用の広告視聴履歴（advertisement_views）も同じストリームで書き込む。
+
+- 記録ごとに dedup_id を振り、各テーブルの dedup_id の一意制約で重複を無視する。
+  書き込み後に ACK するため、ワーカーが途中で落ちても未ACKの記録は他のワーカーが
+  引き取って再送する（at-least-once、重複は dedup_id で1件になる）。
+- 引き取った記録は1件ずつ書き込み、書き込めない記録（制約違反など）が他の記録を
+  巻き込まないようにする。配信回数が LEDGER_MAX_DELIVERIES を超えた記録は
+  デッドレター（ledger:dead-letter）に移してエラーログを出す。
+- Redis未設定・追加失敗時はその場でDBに書き込む。
+- 予想作成の取引履歴は place_bet の同一トランザクション内で記録するため対象外。
+"""
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from app.config import get_settings
+from app.repositories import Repositories
+
+settings = get_settings()
+
+STREAM_KEY = "ledger:transactions"
+DEAD_LETTER_KEY = "ledger:dead-letter"
+GROUP = "ledger-writers"
+
+# ストリーム経由で書き込めるテーブル（いずれも dedup_id に一意制約がある）
+TABLES = ("coin_transactions", "advertisement_views")
+
+Entry = Tuple[str, Dict[str, str]]
+
+
+def _with_dedup_id(transaction: dict) -> dict:
+    return {**transaction, "dedup_id": transaction.get("dedup_id") or str(uuid.uuid4())}
+
+
+class LedgerWriter:
+    """API用: 取引記録をストリームに追加"""
+
+    async def record(
+        self,
+        redis: Optional[Redis],
+        repos: Repositories,
+        transaction: dict,
+        table: str = "coin_transactions",
+    ) -> None:
+        """記録を書き込み待ちに追加（Redisが使えない場合は直接INSERT）"""
+        if table not in TABLES:
+            raise ValueError(f"Unsupported ledger table: {table}")
+        transaction = _with_dedup_id(transaction)
+
+        if redis is not None:
+            try:
+                await redis.xadd(STREAM_KEY, {
+                    "table": table,
+                    "record": json.dumps(transaction, default=str),
+                })
+                return
+            except RedisError as e:
+                logger.warning(f"Ledger enqueue failed; writing directly: {e}")
+
+        await repos.ledger(table).record([transaction])
+
+
+class LedgerFlusher:
+    """書き込みワーカー: ストリームから読み出してまとめてINSERT"""
+
+    def __init__(
+        self,
+        redis: SyncRedis,
+        supabase,
+        batch_size: int = settings.LEDGER_BATCH_SIZE,
+        flush_interval: float = settings.LEDGER_FLUSH_INTERVAL_SECONDS,
+        claim_idle: float = settings.LEDGER_CLAIM_IDLE_SECONDS,
+        max_deliveries: int = settings.LEDGER_MAX_DELIVERIES,
+        consumer: Optional[str] = None,
+    ):
+        self.redis = redis
+        self.supabase = supabase
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.claim_idle = claim_idle
+        self.max_deliveries = max_deliveries
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._group_ready = False
+
+    def ensure_group(self) -> None:
+        """コンシューマーグループを作成（既存の場合は何もしない）"""
+        if self._group_ready:
+            return
+        try:
+            self.redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def claim_stale(self) -> List[Entry]:
+        """一定時間ACKされていない記録（停止したワーカーの分、書き込みに失敗した分）を引き取る
+
+        配信回数が max_deliveries を超えた記録はデッドレターに移し、残りを返す。
+        """
+        self.ensure_group()
+        result = self.redis.xautoclaim(
+            STREAM_KEY, GROUP, self.consumer,
+            min_idle_time=int(self.claim_idle * 1000),
+            start_id="0-0",
+            count=self.batch_size,
+        )
+        entries = [(entry_id, fields) for entry_id, fields in result[1] if fields]
+        if not entries:
+            return []
+
+        deliveries = self._deliveries([entry_id for entry_id, _ in entries])
+        poisoned = [entry for entry in entries if deliveries[entry[0]] > self.max_deliveries]
+        if poisoned:
+            self.dead_letter(poisoned, deliveries)
+        return [entry for entry in entries if deliveries[entry[0]] <= self.max_deliveries]
+
+    def _deliveries(self, entry_ids: List[str]) -> Dict[str, int]:
+        """記録ごとの配信回数（引き取りで1ずつ増える）"""
+        with self.redis.pipeline(transaction=False) as pipe:
+            for entry_id in entry_ids:
+                pipe.xpending_range(STREAM_KEY, GROUP, min=entry_id, max=entry_id, count=1)
+            pending = pipe.execute()
+        return {
+            entry_id: info[0]["times_delivered"] if info else 0
+            for entry_id, info in zip(entry_ids, pending)
+        }
+
+    def dead_letter(self, entries: List[Entry], deliveries: Dict[str, int]) -> None:
+        """書き込めない記録をデッドレターに移してストリームから外す"""
+        entry_ids = [entry_id for entry_id, _ in entries]
+        with self.redis.pipeline(transaction=False) as pipe:
+            for entry_id, fields in entries:
+                pipe.xadd(DEAD_LETTER_KEY, {
+                    **fields,
+                    "entry_id": entry_id,
+                    "deliveries": str(deliveries[entry_id]),
+                })
+            pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+            pipe.xdel(STREAM_KEY, *entry_ids)
+            pipe.execute()
+        for entry_id, fields in entries:
+            logger.error(
+                f"Ledger entry moved to dead letter after {deliveries[entry_id]} deliveries: "
+                f"id={entry_id} table={fields.get('table')} record={fields.get('record')}"
+            )
+
+    def read(self, count: int, block: Optional[float] = None) -> List[Entry]:
+        """新しい記録を読み出す（block秒まで待機）"""
+        self.ensure_group()
+        response = self.redis.xreadgroup(
+            GROUP, self.consumer, {STREAM_KEY: ">"},
+            count=count,
+            block=max(int(block * 1000), 1) if block else None,
+        )
+        return [entry for _, entries in response or [] for entry in entries]
+
+    def write(self, entries: List[Entry]) -> int:
+        """記録をテーブルごとにまとめてINSERTしてACK
+
+        Returns:
+            書き込んだ記録数
+        """
+        if not entries:
+            return 0
+
+        tables: Dict[str, Dict[str, dict]] = {}
+        for _, fields in entries:
+            row = json.loads(fields["record"])
+            table = fields.get("table", "coin_transactions")
+            tables.setdefault(table, {})[row["dedup_id"]] = row
+
+        for table, rows in tables.items():
+            self.supabase.table(table).upsert(
+                list(rows.values()), on_conflict="dedup_id", ignore_duplicates=True
+            ).execute()
+
+        entry_ids = [entry_id for entry_id, _ in entries]
+        with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+            pipe.xdel(STREAM_KEY, *entry_ids)
+            pipe.execute()
+        return len(entries)
+
+    def write_each(self, entries: List[Entry]) -> int:
+        """記録を1件ずつ書き込む（失敗した記録は未ACKのまま残し、次の引き取りで再送する）"""
+        written = 0
+        for entry in entries:
+            try:
+                written += self.write([entry])
+            except Exception as e:
+                logger.error(f"Ledger entry write failed: id={entry[0]}: {e}")
+        return written
+
+    def drain(self) -> int:
+        """滞留している記録をすべて書き込む（定期タスク用）"""
+        written = self.write_each(self.claim_stale())
+        while True:
+            entries = self.read(self.batch_size)
+            if not entries:
+                return written
+            written += self.write(entries)
+
+    def run_forever(self) -> None:
+        """件数か経過時間のどちらかに達するたびに書き込む"""
+        logger.info(f"Ledger flusher started: consumer={self.consumer}")
+        self.write_each(self.claim_stale())
+        buffer: List[Entry] = []
+        deadline = time.monotonic() + self.flush_interval
+        next_claim = time.monotonic() + self.claim_idle
+
+        while True:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            try:
+                if len(buffer) < self.batch_size:
+                    buffer += self.read(self.batch_size - len(buffer), block=remaining)
+
+                now = time.monotonic()
+                if len(buffer) >= self.batch_size or now >= deadline:
+                    self.write(buffer)
+                    buffer = []
+                    deadline = now + self.flush_interval
+
+                if now >= next_claim:
+                    self.write_each(self.claim_stale())
+                    next_claim = now + self.claim_idle
+            except Exception as e:
+                # 書き込めなかった記録は未ACKのまま残り、claim_stale で再送される
+                logger.error(f"Ledger flush failed: {e}")
+                buffer = []
+                time.sleep(self.flush_interval)
+                deadline = time.monotonic() + self.flush_interval
+
+
+ledger_writer = LedgerWriter()
@@ -0,0 +1,255 @@
+"""Prometheus メトリクス（GET /metrics）
+
+- http_request_duration_seconds / http_requests_in_progress: ルート（パスのテンプレート）ごとの
+  レイテンシと、メソッドごとの処理中のリクエスト数（MetricsMiddleware）
+- db_call_duration_seconds: リポジトリの操作ごとの時間（app/repositories/instrumented.py）
+- cache_local_requests_total / cache_redis_requests_total: キャッシュのヒット・ミス。
+  プロセス内キャッシュ（TTLCache）は自身の hits / misses を収集時に読む
+- celery_task_duration_seconds / celery_queue_length / ledger_stream_length / ledger_dead_letter_length:
+  Celery ワーカーが Redis に記録したタスクの実行時間（app/tasks/monitoring.py）と、
+  キュー・取引記録の滞留数（収集時に読む）
+
+記録はプロセス内のカウンターの加算のみで、Redis への問い合わせは収集時（スクレイプ）だけ行う。
+
+複数ワーカー（uvicorn --workers / gunicorn）で動かす場合は、起動前に環境変数
+PROMETHEUS_MULTIPROC_DIR に空のディレクトリを指定する。各ワーカーの値をそのディレクトリに書き、
+スクレイプ時に全ワーカー分を合算する（プロセス内キャッシュの件数・ヒット数はワーカーごとの値のため出さない）。
+"""
+
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.registry import Collector
+from redis import Redis as SyncRedis, from_url as redis_from_url
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+from app.services.cache import TTLCache
+from app.services.ledger import DEAD_LETTER_KEY, STREAM_KEY
+
+settings = get_settings()
+
+# 予想受付終了前の集中でも、どこで時間を使っているか分かる刻み
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+TASK_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+# ルートに一致しないリクエスト（404など）はパスごとに分けない
+UNMATCHED = "<unmatched>"
+
+# Celery ワーカーが記録するタスクの実行時間（ハッシュ）
+TASK_METRICS_KEY = "metrics:celery-tasks"
+
+# 複数ワーカーの値をファイル経由で合算する（prometheus_client と同じ環境変数で判定）
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+MULTIPROCESS = bool(MULTIPROCESS_DIR)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTPリクエストの処理時間",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "処理中のHTTPリクエスト数",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_CALL_DURATION = Histogram(
+    "db_call_duration_seconds",
+    "リポジトリの操作（DB呼び出し）の時間",
+    ["backend", "table", "operation", "outcome"],
+    buckets=DB_BUCKETS,
+)
+CACHE_REDIS_REQUESTS = Counter(
+    "cache_redis_requests_total",
+    "キャッシュの参照（Redis の層）",
+    ["cache", "result"],
+)
+
+
+def task_bucket(seconds: float) -> str:
+    """実行時間が入るヒストグラムの刻み（le ラベルの値）"""
+    for bound in TASK_BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+class MetricsMiddleware:
+    """ルートごとのレイテンシと処理中のリクエスト数を記録する ASGI ミドルウェア
+
+    ルートはルーティング後に scope に入るもの（scope["route"]）を使う。
+    処理中の数はルーティング前に数えるため、メソッドごとにする。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", UNMATCHED)
+            REQUEST_DURATION.labels(method, route, str(status_code)).observe(time.perf_counter() - started)
+            in_progress.dec()
+
+
+class CacheCollector(Collector):
+    """プロセス内キャッシュのヒット・ミス数（収集時に読む）"""
+
+    def __init__(self):
+        self.caches: Dict[str, TTLCache] = {}
+
+    def register(self, name: str, cache: TTLCache) -> None:
+        self.caches[name] = cache
+
+    def describe(self) -> Iterable:
+        return []
+
+    def collect(self) -> Iterable:
+        requests = CounterMetricFamily(
+            "cache_local_requests", "キャッシュの参照（プロセス内の層）", labels=["cache", "result"]
+        )
+        entries = GaugeMetricFamily("cache_local_entries", "プロセス内キャッシュの件数", labels=["cache"])
+        for name, cache in self.caches.items():
+            requests.add_metric([name, "hit"], cache.hits)
+            requests.add_metric([name, "miss"], cache.misses)
+            entries.add_metric([name], len(cache))
+        yield requests
+        yield entries
+
+
+class CeleryCollector(Collector):
+    """Celery のタスク実行時間とキューの滞留数（収集時に Redis から読む）"""
+
+    def __init__(
+        self,
+        redis_factory: Callable[[], Optional[SyncRedis]],
+        broker_factory: Callable[[], Optional[SyncRedis]],
+        queues: List[str],
+    ):
+        self.redis_factory = redis_factory
+        self.broker_factory = broker_factory
+        self.queues = queues
+
+    def describe(self) -> Iterable:
+        # 登録時に collect() が呼ばれて Redis を読まないようにする
+        return []
+
+    def collect(self) -> Iterable:
+        redis, broker = self.redis_factory(), self.broker_factory()
+        try:
+            if redis is not None:
+                yield self._task_durations(redis.hgetall(TASK_METRICS_KEY))
+                stream = GaugeMetricFamily("ledger_stream_length", "書き込み待ちの取引記録数")
+                stream.add_metric([], redis.xlen(STREAM_KEY))
+                yield stream
+                dead_letter = GaugeMetricFamily("ledger_dead_letter_length", "書き込めずデッドレターに移した取引記録数")
+                dead_letter.add_metric([], redis.xlen(DEAD_LETTER_KEY))
+                yield dead_letter
+            if broker is not None:
+                queue = GaugeMetricFamily("celery_queue_length", "Celery キューの滞留タスク数", labels=["queue"])
+                for name in self.queues:
+                    queue.add_metric([name], broker.llen(name))
+                yield queue
+        except RedisError as e:
+            logger.warning(f"Failed to collect Celery metrics: {e}")
+
+    def _task_durations(self, fields: Dict[str, str]) -> HistogramMetricFamily:
+        # "<タスク>|<状態>|<le または sum>" → 値
+        series: Dict[Tuple[str, str], Dict[str, float]] = {}
+        for field, value in fields.items():
+            task, state, key = field.rsplit("|", 2)
+            series.setdefault((task, state), {})[key] = float(value)
+
+        family = HistogramMetricFamily(
+            "celery_task_duration_seconds", "Celery タスクの実行時間", labels=["task", "state"]
+        )
+        for (task, state), values in sorted(series.items()):
+            buckets, cumulative = [], 0.0
+            for bound in [*map(str, TASK_BUCKETS), "+Inf"]:
+                cumulative += values.get(bound, 0.0)
+                buckets.append((bound, cumulative))
+            family.add_metric([task, state], buckets, values.get("sum", 0.0))
+        return family
+
+
+# 収集用の同期クライアント（スクレイプを長く止めないよう短いタイムアウト）
+_redis: Optional[SyncRedis] = None
+_broker: Optional[SyncRedis] = None
+
+
+def get_redis() -> Optional[SyncRedis]:
+    global _redis
+    if _redis is None and settings.REDIS_URL:
+        _redis = redis_from_url(settings.REDIS_URL, decode_responses=True, socket_timeout=1.0)
+    return _redis
+
+
+def get_broker() -> Optional[SyncRedis]:
+    """Celery ブローカーの Redis（キューの滞留数の取得用）"""
+    global _broker
+    if _broker is None and settings.CELERY_BROKER_URL.startswith("redis"):
+        _broker = redis_from_url(settings.CELERY_BROKER_URL, socket_timeout=1.0)
+    return _broker
+
+
+cache_collector = CacheCollector()
+celery_collector = CeleryCollector(get_redis, get_broker, queues=["celery"])
+
+
+def register_collectors() -> None:
+    """収集時に読むコレクターを登録（METRICS_ENABLED の場合に API の起動時に呼ぶ）"""
+    if not MULTIPROCESS:
+        REGISTRY.register(cache_collector)
+        REGISTRY.register(celery_collector)
+
+
+def render() -> Tuple[bytes, str]:
+    """/metrics の本文と Content-Type（収集時に Redis を読むためスレッドで呼ぶ）"""
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    # 全ワーカーの書き出したファイルを合算する
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(celery_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """終了するワーカーの処理中のリクエスト数（livesum）を合算から外す"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid(), MULTIPROCESS_DIR)
@@ -0,0 +1,135 @@
+"""オッズスナップショットのキャッシュ
+
+update_race_odds が計算したオッズを、バージョン番号付きのスナップショットとして
+Redisのハッシュ（odds:<race_id>）に公開する。APIワーカーはスナップショットを
+プロセス内にも保持し、ODDS_LOCAL_TTL_SECONDS ごとにRedis上のバージョン番号だけを確認して、
+変わっていた場合のみ全体を読み直す。予想作成時の価格決定はDBを参照しない。
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.services.cache import TTLCache
+from app.services.odds_engine import canonical_ticket, ticket_field
+
+settings = get_settings()
+
+VERSION_FIELD = "version"
+PUBLISHED_AT_FIELD = "published_at"
+
+
+def snapshot_key(race_id: str) -> str:
+    """スナップショットのRedisキー"""
+    return f"odds:{race_id}"
+
+
+def version_key(race_id: str) -> str:
+    """バージョン番号の採番キー"""
+    return f"odds-version:{race_id}"
+
+
+@dataclass
+class OddsSnapshot:
+    """レースのオッズスナップショット"""
+    race_id: str
+    version: int
+    published_at: float
+    odds: Dict[str, float] = field(default_factory=dict)
+
+    def get(self, bet_type: str, selections: Sequence[int]) -> Optional[float]:
+        """買い目のオッズを取得"""
+        return self.odds.get(ticket_field(bet_type, canonical_ticket(bet_type, selections)))
+
+    @classmethod
+    def from_hash(cls, race_id: str, fields: Dict[str, str]) -> Optional["OddsSnapshot"]:
+        """Redisハッシュから復元"""
+        if VERSION_FIELD not in fields:
+            return None
+        version = int(fields.pop(VERSION_FIELD))
+        published_at = float(fields.pop(PUBLISHED_AT_FIELD, 0))
+        return cls(
+            race_id=race_id,
+            version=version,
+            published_at=published_at,
+            odds={name: float(value) for name, value in fields.items()},
+        )
+
+
+def publish_snapshot(redis: SyncRedis, race_id: str, odds: Dict[str, float], ttl: int) -> int:
+    """オッズを新しいバージョンのスナップショットとして公開（タスク用）
+
+    Returns:
+        公開したバージョン番号
+    """
+    version = redis.incr(version_key(race_id))
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(snapshot_key(race_id))
+        pipe.hset(snapshot_key(race_id), mapping={
+            **odds,
+            VERSION_FIELD: version,
+            PUBLISHED_AT_FIELD: time.time(),
+        })
+        pipe.expire(snapshot_key(race_id), ttl)
+        pipe.expire(version_key(race_id), ttl)
+        pipe.execute()
+    return version
+
+
+class OddsCache:
+    """オッズスナップショットのプロセス内キャッシュ"""
+
+    def __init__(self, local_ttl: float, max_size: int):
+        # 直近にバージョンを確認したレース（期限内はRedisを参照しない）
+        self.checked = TTLCache(max_size=max_size, ttl=local_ttl)
+        self._snapshots: Dict[str, OddsSnapshot] = {}
+
+    async def get(self, redis: Optional[Redis], race_id: str) -> Optional[OddsSnapshot]:
+        """レースの最新スナップショットを取得（未公開の場合はNone）"""
+        snapshot = self._snapshots.get(race_id)
+        if snapshot is not None and self.checked.get(race_id) is not None:
+            return snapshot
+
+        if redis is None:
+            return snapshot
+
+        try:
+            version = await redis.hget(snapshot_key(race_id), VERSION_FIELD)
+            if version is None:
+                self._snapshots.pop(race_id, None)
+                return None
+
+            if snapshot is None or snapshot.version != int(version):
+                fields = await redis.hgetall(snapshot_key(race_id))
+                snapshot = OddsSnapshot.from_hash(race_id, fields)
+                if snapshot is None:
+                    return None
+                self._store(snapshot)
+        except RedisError as e:
+            logger.warning(f"Failed to read odds snapshot: race={race_id}: {e}")
+            return snapshot
+
+        self.checked.set(race_id, True)
+        return snapshot
+
+    def _store(self, snapshot: OddsSnapshot) -> None:
+        self._snapshots[snapshot.race_id] = snapshot
+        # 古いレースのスナップショットを溜め込まない
+        while len(self._snapshots) > self.checked.max_size:
+            self._snapshots.pop(next(iter(self._snapshots)))
+
+    def invalidate(self, race_id: str) -> None:
+        """次回の参照でRedisのバージョンを確認させる"""
+        self.checked.delete(race_id)
+
+
+odds_cache = OddsCache(
+    local_ttl=settings.ODDS_LOCAL_TTL_SECONDS,
+    max_size=settings.ODDS_CACHE_MAX_RACES,
+)
@@ -0,0 +1,234 @@
+"""パリミュチュエル方式のオッズエンジン
+
+レース・券種・買い目ごとの投票金額（プール）をRedisのハッシュに保持し、
+予想が作成されるたびに加算する。オッズ計算時はプールを券種ごとの
+NumPy配列（馬番を添字とする密な配列）に読み込み、全買い目のオッズを一括で求める。
+
+- 投票のある買い目: (プール総額 × (1 - 控除率)) / 買い目の投票額
+- 投票のない買い目: 単勝の支持率からHarvilleモデルで求めた的中確率による推定オッズ
+  （支持率は単勝の投票額に、基準の単勝オッズによる事前分布を PRIOR_STAKE 分の投票として加えて求める。
+  推定オッズは MAX_MODEL_ODDS を上限とする）
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.services.bet_combinations import Ticket, normalize_ticket
+
+# 券種ごとの選択頭数・着順の区別・控除率（JRA準拠）
+POOLS = {
+    "win": {"selections": 1, "ordered": False, "takeout": 0.20},
+    "place": {"selections": 1, "ordered": False, "takeout": 0.20},
+    "exacta": {"selections": 2, "ordered": False, "takeout": 0.225},
+    "wide": {"selections": 2, "ordered": False, "takeout": 0.225},
+    "trio": {"selections": 3, "ordered": False, "takeout": 0.25},
+    "trifecta": {"selections": 3, "ordered": True, "takeout": 0.275},
+}
+
+# 的中となる買い目が複数ある券種（複勝・ワイドは3着まで）
+MULTI_WINNER_POOLS = {"place": 3, "wide": 3}
+
+MIN_ODDS = 1.0
+MAX_ODDS = 99999.9
+
+# 推定オッズの上限（予想作成時のオッズで払い戻すため、投票の少ない買い目が極端な値にならないようにする）
+MAX_MODEL_ODDS = 999.9
+
+# 支持率の事前分布の重み（単勝の投票額に換算）
+PRIOR_STAKE = 10000.0
+
+
+def pool_key(race_id: str, bet_type: str) -> str:
+    """プールのRedisキー"""
+    return f"pool:{race_id}:{bet_type}"
+
+
+def ticket_field(bet_type: str, ticket: Sequence[int]) -> str:
+    """買い目のフィールド名（例: trifecta:3-7-12）"""
+    return f"{bet_type}:" + "-".join(str(n) for n in ticket)
+
+
+def canonical_ticket(bet_type: str, selections: Sequence[int]) -> Ticket:
+    """プール上の買い目表現（順不同の券種は昇順）"""
+    return normalize_ticket(selections, POOLS[bet_type]["ordered"])
+
+
+# --- プールの記録（API） ---
+
+async def record_stakes(
+    redis: Optional[Redis],
+    race_id: str,
+    bet_type: str,
+    tickets: Iterable[Sequence[int]],
+    amount: int,
+) -> None:
+    """投票金額をプールに加算"""
+    if redis is None:
+        return
+
+    key = pool_key(race_id, bet_type)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for ticket in tickets:
+                pipe.hincrby(key, "-".join(str(n) for n in canonical_ticket(bet_type, ticket)), amount)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to record stakes: race={race_id}, type={bet_type}: {e}")
+
+
+# --- オッズ計算（タスク） ---
+
+class RacePools:
+    """レースの全券種のプール（馬番1〜runners を添字0〜runners-1 とする密な配列）"""
+
+    def __init__(self, runners: int):
+        self.runners = runners
+        self.stakes: Dict[str, np.ndarray] = {
+            bet_type: np.zeros((runners,) * spec["selections"], dtype=np.float64)
+            for bet_type, spec in POOLS.items()
+        }
+
+    def add(self, bet_type: str, ticket: Sequence[int], amount: float) -> None:
+        """買い目の投票金額を加算"""
+        index = tuple(n - 1 for n in canonical_ticket(bet_type, ticket))
+        if all(0 <= i < self.runners for i in index):
+            self.stakes[bet_type][index] += amount
+
+    @classmethod
+    def load(cls, redis: SyncRedis, race_id: str, runners: int) -> "RacePools":
+        """Redisからプールを読み込む"""
+        pools = cls(runners)
+        with redis.pipeline(transaction=False) as pipe:
+            for bet_type in POOLS:
+                pipe.hgetall(pool_key(race_id, bet_type))
+            results = pipe.execute()
+
+        for bet_type, fields in zip(POOLS, results):
+            for field, amount in fields.items():
+                pools.add(bet_type, [int(n) for n in field.split("-")], float(amount))
+        return pools
+
+
+def _distinct_mask(runners: int, dims: int) -> np.ndarray:
+    """同じ馬を含まない添字の組み合わせのマスク"""
+    idx = np.indices((runners,) * dims)
+    mask = np.ones((runners,) * dims, dtype=bool)
+    for a in range(dims):
+        for b in range(a + 1, dims):
+            mask &= idx[a] != idx[b]
+    return mask
+
+
+def _canonical_mask(runners: int, dims: int, ordered: bool) -> np.ndarray:
+    """プール上で有効な買い目のマスク（順不同の券種は昇順の組み合わせのみ）"""
+    if dims == 1:
+        return np.ones(runners, dtype=bool)
+    if ordered:
+        return _distinct_mask(runners, dims)
+    idx = np.indices((runners,) * dims)
+    mask = np.ones((runners,) * dims, dtype=bool)
+    for a in range(dims - 1):
+        mask &= idx[a] < idx[a + 1]
+    return mask
+
+
+def harville_probabilities(win_probs: np.ndarray) -> Dict[str, np.ndarray]:
+    """単勝の的中確率から全券種の的中確率を推定（Harvilleモデル）"""
+    p = win_probs
+    n = len(p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 1着i・2着j・3着k となる確率
+        second = p[None, :] / (1.0 - p[:, None])
+        third = p[None, None, :] / (1.0 - p[:, None, None] - p[None, :, None])
+        order = p[:, None, None] * second[:, :, None] * third
+    order = np.where(_distinct_mask(n, 3), np.nan_to_num(order), 0.0)
+
+    first_second = order.sum(axis=2)
+    # i が j より先着し、残り1頭と合わせて3着以内となる確率
+    before = order.sum(axis=2) + order.sum(axis=1) + order.sum(axis=0)
+    trio = sum(np.transpose(order, axes) for axes in
+               ((0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)))
+
+    return {
+        "win": p,
+        "place": order.sum(axis=(1, 2)) + order.sum(axis=(0, 2)) + order.sum(axis=(0, 1)),
+        "exacta": first_second + first_second.T,
+        "wide": before + before.T,
+        "trio": trio,
+        "trifecta": order,
+    }
+
+
+def prior_win_probs(runners: int, base_win_odds: Optional[np.ndarray] = None) -> np.ndarray:
+    """基準の単勝オッズによる支持率（オッズが0・未設定の馬は出走取消として0、基準がなければ均等）"""
+    if base_win_odds is not None:
+        odds = np.nan_to_num(np.asarray(base_win_odds, dtype=np.float64))
+        support = np.where(odds > 0, 1.0 / np.where(odds > 0, odds, 1.0), 0.0)
+        if support.sum() > 0:
+            return support / support.sum()
+    return np.full(runners, 1.0 / runners)
+
+
+def compute_odds(pools: RacePools, base_win_odds: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """全券種・全買い目のオッズを計算
+
+    base_win_odds は支持率の事前分布に使う単勝オッズ（馬番順）。
+    無効な買い目（同じ馬を含む・順不同の券種で昇順でない）はNaN。
+    """
+    n = pools.runners
+
+    win_stakes = pools.stakes["win"]
+    weighted = win_stakes + PRIOR_STAKE * prior_win_probs(n, base_win_odds)
+    win_probs = weighted / weighted.sum()
+    model = harville_probabilities(win_probs)
+
+    odds: Dict[str, np.ndarray] = {}
+    for bet_type, spec in POOLS.items():
+        stakes = pools.stakes[bet_type]
+        net = stakes.sum() * (1.0 - spec["takeout"])
+        valid = _canonical_mask(n, spec["selections"], spec["ordered"])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if bet_type in MULTI_WINNER_POOLS:
+                # 他の的中買い目の投票額を平均値で見積もり、払戻を的中数で按分
+                winners = MULTI_WINNER_POOLS[bet_type]
+                average = stakes[valid].mean() if valid.any() else 0.0
+                pool_odds = 1.0 + (net - stakes - (winners - 1) * average) / (winners * stakes)
+            else:
+                pool_odds = net / stakes
+            model_odds = (1.0 - spec["takeout"]) / model[bet_type]
+
+        model_odds = np.nan_to_num(model_odds, nan=MAX_MODEL_ODDS, posinf=MAX_MODEL_ODDS)
+        result = np.where(stakes > 0, pool_odds, np.minimum(model_odds, MAX_MODEL_ODDS))
+        result = np.floor(np.nan_to_num(result, nan=MAX_ODDS, posinf=MAX_ODDS) * 10) / 10
+        odds[bet_type] = np.where(valid, np.clip(result, MIN_ODDS, MAX_ODDS), np.nan)
+
+    return odds
+
+
+@lru_cache(maxsize=64)
+def _field_names(bet_type: str, runners: int) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """有効な買い目のフィールド名と、配列上の位置（平坦化した添字）"""
+    spec = POOLS[bet_type]
+    mask = _canonical_mask(runners, spec["selections"], spec["ordered"])
+    positions = np.flatnonzero(mask)
+    indices = np.unravel_index(positions, mask.shape)
+    names = tuple(
+        ticket_field(bet_type, [int(i) + 1 for i in index]) for index in zip(*indices)
+    )
+    return names, positions
+
+
+def odds_to_fields(odds: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """計算したオッズを公開用のフィールドに変換"""
+    fields: Dict[str, float] = {}
+    for bet_type, values in odds.items():
+        names, positions = _field_names(bet_type, values.shape[0])
+        fields.update(zip(names, values.ravel()[positions].tolist()))
+    return fields
@@ -0,0 +1,170 @@
+"""オッズ更新のスケジューラー
+
+予想受付中のレースを次回の更新時刻順の優先度付きキュー（Redisのソート済みセット）で管理し、
+時刻が来たレースだけ update_race_odds を投入する。
+
+- 更新間隔は受付終了（betting_end_time）までの残り時間に比例して短くする
+  （残り時間 × ODDS_POLL_INTERVAL_RATIO を ODDS_POLL_MIN/MAX_INTERVAL_SECONDS の範囲に収める）。
+  受付終了時刻にちょうど1回更新して（最終オッズ）キューから外す
+- 受付中（status = betting）でなくなったレースは次回の同期でキューから外す
+- 実行中の update_race_odds は ODDS_MAX_CONCURRENT_UPDATES 件までに制限する
+
+- odds:schedule: レースID → 次回の更新時刻（UNIX秒）のソート済みセット
+- odds:deadlines: レースID → 受付終了時刻（UNIX秒）のハッシュ
+- odds:inflight: 実行中のレースID → 投入時刻のソート済みセット
+"""
+
+import time
+from typing import Callable, List, Optional
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.services.clock import epoch_seconds
+
+settings = get_settings()
+
+KEY_PREFIX = "odds:"
+SCHEDULE_KEY = KEY_PREFIX + "schedule"
+DEADLINES_KEY = KEY_PREFIX + "deadlines"
+INFLIGHT_KEY = KEY_PREFIX + "inflight"
+SYNCED_KEY = KEY_PREFIX + "schedule-synced"
+LOCK_KEY = KEY_PREFIX + "schedule-lock"
+
+
+def poll_interval(remaining: float) -> float:
+    """受付終了までの残り秒数に対する更新間隔（秒）"""
+    return min(
+        max(remaining * settings.ODDS_POLL_INTERVAL_RATIO, settings.ODDS_POLL_MIN_INTERVAL_SECONDS),
+        settings.ODDS_POLL_MAX_INTERVAL_SECONDS,
+    )
+
+
+class OddsScheduler:
+    """オッズ更新の投入（定期タスク schedule_odds から数秒ごとに呼ぶ）"""
+
+    def __init__(
+        self,
+        redis: SyncRedis,
+        supabase,
+        dispatch: Callable[[str], None],
+        max_concurrent: int = settings.ODDS_MAX_CONCURRENT_UPDATES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.redis = redis
+        self.supabase = supabase
+        self.dispatch = dispatch
+        self.max_concurrent = max_concurrent
+        self.clock = clock
+
+    def sync(self) -> int:
+        """受付中のレースをDBから読み込み、キューを揃える
+
+        新しく受付中になったレースはすぐに更新する（受付終了時刻を過ぎたものは追加しない）。
+
+        Returns:
+            受付中のレース数
+        """
+        races = self.supabase.table("races").select("id, betting_end_time").eq(
+            "status", "betting"
+        ).execute().data or []
+        deadlines = {race["id"]: epoch_seconds(race["betting_end_time"]) for race in races}
+
+        scheduled = set(self.redis.zrange(SCHEDULE_KEY, 0, -1))
+        stale = scheduled - set(deadlines)
+        now = self.clock()
+        new = {
+            race_id: now for race_id in deadlines.keys() - scheduled
+            if deadlines[race_id] > now
+        }
+
+        with self.redis.pipeline(transaction=True) as pipe:
+            if stale:
+                pipe.zrem(SCHEDULE_KEY, *stale)
+                pipe.hdel(DEADLINES_KEY, *stale)
+            if deadlines:
+                pipe.hset(DEADLINES_KEY, mapping=deadlines)
+            if new:
+                pipe.zadd(SCHEDULE_KEY, new)
+            pipe.execute()
+        return len(deadlines)
+
+    def tick(self) -> List[str]:
+        """更新時刻が来たレースを投入
+
+        Returns:
+            投入したレースID
+        """
+        # 定期タスクの実行が重なった場合に二重に投入しない
+        if not self.redis.set(LOCK_KEY, 1, nx=True, ex=settings.ODDS_SCHEDULER_TICK_SECONDS * 2):
+            return []
+        try:
+            if self.redis.set(SYNCED_KEY, 1, nx=True, ex=settings.ODDS_SCHEDULER_SYNC_SECONDS):
+                self.sync()
+            return self._dispatch_due()
+        finally:
+            self.redis.delete(LOCK_KEY)
+
+    def _dispatch_due(self) -> List[str]:
+        now = self.clock()
+
+        # 終了を報告しないまま時間が経ったもの（ワーカー停止など）は実行中から外す
+        self.redis.zremrangebyscore(INFLIGHT_KEY, "-inf", now - settings.ODDS_UPDATE_TIMEOUT_SECONDS)
+        available = self.max_concurrent - self.redis.zcard(INFLIGHT_KEY)
+        if available <= 0:
+            return []
+
+        # 実行中のレースは飛ばすため、空き枠より多めに取り出す
+        due = self.redis.zrangebyscore(SCHEDULE_KEY, "-inf", now, start=0, num=available * 2)
+        if not due:
+            return []
+
+        inflight = set(self.redis.zrange(INFLIGHT_KEY, 0, -1))
+        candidates = [race_id for race_id in due if race_id not in inflight][:available]
+        if not candidates:
+            return []
+        deadlines = dict(zip(candidates, self.redis.hmget(DEADLINES_KEY, candidates)))
+
+        dispatched = []
+        with self.redis.pipeline(transaction=True) as pipe:
+            for race_id in candidates:
+                deadline = deadlines[race_id]
+                if deadline is None or now >= float(deadline):
+                    # 受付終了後の最終更新
+                    pipe.zrem(SCHEDULE_KEY, race_id)
+                    pipe.hdel(DEADLINES_KEY, race_id)
+                else:
+                    deadline = float(deadline)
+                    next_due = min(now + poll_interval(deadline - now), deadline)
+                    pipe.zadd(SCHEDULE_KEY, {race_id: next_due})
+                pipe.zadd(INFLIGHT_KEY, {race_id: now})
+                dispatched.append(race_id)
+            pipe.execute()
+
+        for race_id in dispatched:
+            try:
+                self.dispatch(race_id)
+            except Exception as e:
+                logger.error(f"Failed to dispatch odds update: race={race_id}: {e}")
+                release(self.redis, race_id)
+        return dispatched
+
+
+def release(redis: Optional[SyncRedis], race_id: str) -> None:
+    """update_race_odds の終了時に呼び、同時実行数の枠を戻す"""
+    if redis is None:
+        return
+    try:
+        redis.zrem(INFLIGHT_KEY, race_id)
+    except RedisError as e:
+        logger.warning(f"Failed to release odds update slot: race={race_id}: {e}")
+
+
+def next_due(redis: Optional[SyncRedis]) -> Optional[float]:
+    """次に更新するレースの時刻（監視用）"""
+    if redis is None:
+        return None
+    head = redis.zrange(SCHEDULE_KEY, 0, 0, withscores=True)
+    return head[0][1] if head else None
@@ -0,0 +1,107 @@
+"""予想受付時間帯の公開
+
+状態遷移のスケジューラー（app/services/race_lifecycle.py）が、受付終了前のレースの
+受付時間帯をRedisのハッシュ（races:open）に公開する。APIワーカーはそれをプロセス内に保持し、
+OPEN_RACES_LOCAL_TTL_SECONDS ごとにバージョン番号だけを確認して、変わっていた場合のみ読み直す。
+予想作成時の受付確認は手元の時間帯と現在時刻の比較で済み、DBを参照しない。
+
+- races:open: レースID → "<受付開始>,<受付終了>"（UNIX秒）のハッシュ
+- races:open-version: 変更のたびに振り直すバージョン（失効していれば未公開）
+
+公開されていない（Redis未設定・スケジューラー未起動）場合は判定せず、place_bet RPC 側の確認に任せる。
+"""
+
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+OPEN_KEY = "races:open"
+VERSION_KEY = "races:open-version"
+
+Window = Tuple[float, float]
+
+
+def _format(window: Window) -> str:
+    return f"{window[0]:.3f},{window[1]:.3f}"
+
+
+def _parse(value: str) -> Window:
+    opens_at, _, closes_at = value.partition(",")
+    return float(opens_at), float(closes_at)
+
+
+def publish_windows(redis: SyncRedis, windows: Dict[str, Window], ttl: int) -> None:
+    """受付時間帯を丸ごと置き換える（タスク用）
+
+    ttl 秒のうちに次の公開がなければ（スケジューラー停止）、APIは判定をやめてRPC側に任せる。
+    """
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(OPEN_KEY)
+        if windows:
+            pipe.hset(OPEN_KEY, mapping={race_id: _format(window) for race_id, window in windows.items()})
+            pipe.expire(OPEN_KEY, ttl)
+        pipe.set(VERSION_KEY, uuid.uuid4().hex, ex=ttl)
+        pipe.execute()
+
+
+def remove_windows(redis: SyncRedis, race_ids: Iterable[str]) -> None:
+    """受付を終えたレースを外す（タスク用）"""
+    race_ids = list(race_ids)
+    if not race_ids:
+        return
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.hdel(OPEN_KEY, *race_ids)
+        # 失効後に作り直すと、公開されていない状態が「受付中のレースなし」に見えてしまう
+        pipe.set(VERSION_KEY, uuid.uuid4().hex, xx=True, keepttl=True)
+        pipe.execute()
+
+
+class OpenRaces:
+    """受付時間帯のプロセス内コピー"""
+
+    def __init__(self, local_ttl: float):
+        self.local_ttl = local_ttl
+        self._windows: Optional[Dict[str, Window]] = None
+        self._version: Optional[str] = None
+        self._checked_at = float("-inf")
+
+    async def is_open(self, redis: Optional[Redis], race_id: str, now: Optional[float] = None) -> Optional[bool]:
+        """予想を受け付けているか（受付時間帯が公開されていない場合はNone）"""
+        windows = await self._load(redis)
+        if windows is None:
+            return None
+        window = windows.get(race_id)
+        now = time.time() if now is None else now
+        return window is not None and window[0] <= now < window[1]
+
+    async def _load(self, redis: Optional[Redis]) -> Optional[Dict[str, Window]]:
+        checked_at = time.monotonic()
+        if checked_at - self._checked_at < self.local_ttl or redis is None:
+            return self._windows
+
+        try:
+            version = await redis.get(VERSION_KEY)
+            if version is None:
+                self._windows, self._version = None, None
+            elif version != self._version:
+                fields = await redis.hgetall(OPEN_KEY)
+                self._windows = {race_id: _parse(value) for race_id, value in fields.items()}
+                self._version = version
+        except RedisError as e:
+            logger.warning(f"Failed to read open races: {e}")
+            return self._windows
+
+        self._checked_at = checked_at
+        return self._windows
+
+
+open_races = OpenRaces(local_ttl=settings.OPEN_RACES_LOCAL_TTL_SECONDS)
@@ -0,0 +1,105 @@
+"""キーセット（カーソル）ページネーション
+
+一覧APIを (並び順の列, id) の複合キーで位置決めする。offset と違い先頭から
+読み飛ばす行がないため、何ページ目でも1ページ目と同じコストで取得できる。
+
+カーソルは最後に返した行の (列の値, id) をJSONにしてbase64urlで符号化した
+不透明な文字列。総件数は count=exact の場合のみ正確に数え、既定ではPostgRESTの
+推定件数（プランナーの見積もり）を使う。
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, List, Literal, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+CountMode = Literal["exact", "estimated", "none"]
+
+
+def encode_cursor(value: Any, row_id: str) -> str:
+    """カーソルを符号化"""
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """カーソルを復号（不正な場合は400）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return value, str(row_id)
+
+
+def _quote(value: Any) -> str:
+    # PostgRESTの論理式で予約文字（, . : ( )）を含む値を扱うため二重引用符で囲む
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def count_method(count: CountMode) -> Optional[str]:
+    """PostgRESTに渡す件数の取得方法"""
+    return None if count == "none" else count
+
+
+@dataclass(frozen=True)
+class Keyset:
+    """(column, id) の複合キーによる並び順"""
+    column: str
+    desc: bool = False
+
+    def apply(self, query, cursor: Optional[str], page: int, limit: int):
+        """並び順と範囲をクエリに適用
+
+        cursor がある場合はその次の行から、ない場合は page による offset で取得する。
+        次ページの有無を判定するため limit + 1 行を要求する。
+        """
+        offset = 0
+        if cursor:
+            value, row_id = decode_cursor(cursor)
+            op = "lt" if self.desc else "gt"
+            query = query.or_(
+                f"{self.column}.{op}.{_quote(value)},"
+                f"and({self.column}.eq.{_quote(value)},id.{op}.{_quote(row_id)})"
+            )
+        else:
+            offset = (page - 1) * limit
+
+        return (
+            query.order(self.column, desc=self.desc)
+            .order("id", desc=self.desc)
+            .range(offset, offset + limit)
+        )
+
+    def paginate(
+        self,
+        rows: List[dict],
+        limit: int,
+        page: int,
+        total: Optional[int],
+        count: CountMode,
+    ) -> Tuple[List[dict], dict]:
+        """取得した行を1ページ分に切り詰め、ページネーション情報を作成"""
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = encode_cursor(last[self.column], last["id"])
+
+        return rows, {
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "totalPages": (total + limit - 1) // limit if total is not None else None,
+            "estimated": count == "estimated",
+            "hasMore": has_more,
+            "nextCursor": next_cursor,
+        }
@@ -0,0 +1,148 @@
+"""一覧APIの射影（sparse fieldsets）
+
+クエリパラメータからPostgRESTのselect句を組み立て、必要な列だけを取得する。
+
+- view=full（既定）: 従来と同じ全列＋既定の埋め込み
+- view=summary: 一覧表示用の最小限の列。埋め込みは include で指定したもののみ
+- fields=a,b,horses.name: 取得する列を明示（"埋め込み名.列名" で埋め込み側の列）
+- include=horses: 埋め込むリソース（列は fields の指定がなければ要約用の列）
+
+列・埋め込みはホワイトリストで検証し、未知の名前は400を返す。
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+VIEWS = ("full", "summary")
+
+
+@dataclass(frozen=True)
+class Embed:
+    """埋め込みリソース"""
+    columns: Tuple[str, ...]
+    summary: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class Resource:
+    """射影可能なリソース"""
+    columns: Tuple[str, ...]
+    summary: Tuple[str, ...]
+    embeds: Dict[str, Embed] = field(default_factory=dict)
+    # view=full で埋め込む select 句（従来の挙動）
+    full_embeds: Tuple[str, ...] = ()
+    # 射影しても必ず返す列（キーセットページネーションのカーソルに使う）
+    required: Tuple[str, ...] = ("id",)
+
+
+HORSE = Embed(
+    columns=(
+        "id", "race_id", "number", "name", "jockey", "trainer", "weight", "odds",
+        "popularity", "age", "sex", "previous_results", "created_at", "updated_at",
+    ),
+    summary=("number", "name", "jockey", "odds", "popularity"),
+)
+
+RACE_RESULT = Embed(
+    columns=("id", "race_id", "first", "second", "third", "payout", "finish_time", "created_at"),
+    summary=("first", "second", "third"),
+)
+
+RACES = Resource(
+    columns=(
+        "id", "date", "venue", "race_number", "race_name", "grade", "distance", "surface",
+        "condition", "weather", "status", "start_time", "betting_start_time",
+        "betting_end_time", "created_at", "updated_at",
+    ),
+    summary=(
+        "id", "date", "venue", "race_number", "race_name", "grade", "distance", "surface",
+        "status", "start_time", "betting_end_time",
+    ),
+    embeds={"horses": HORSE, "race_results": RACE_RESULT},
+    full_embeds=("horses(*)",),
+    required=("id", "start_time"),
+)
+
+BET_RACE = Embed(
+    columns=(
+        "id", "date", "venue", "race_number", "race_name", "grade", "status", "start_time",
+    ),
+    summary=("race_name", "venue", "date"),
+)
+
+BETS = Resource(
+    columns=(
+        "id", "user_id", "race_id", "bet_type", "selections", "amount", "odds", "odds_version",
+        "status", "payout", "idempotency_key", "created_at", "settled_at",
+    ),
+    summary=("id", "race_id", "bet_type", "selections", "amount", "odds", "status", "payout", "created_at"),
+    embeds={"races": BET_RACE},
+    full_embeds=("races(race_name, venue, date)",),
+    required=("id", "created_at"),
+)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _invalid(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def build_select(
+    resource: Resource,
+    view: str = "full",
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+) -> str:
+    """射影パラメータからselect句を組み立てる
+
+    パラメータを何も指定しない場合は従来と同じselect句を返す。
+    """
+    if view not in VIEWS:
+        raise _invalid(f"Invalid view: {view}")
+
+    requested = _split(fields)
+    includes = _split(include)
+    if view == "full" and not requested and not includes:
+        return ", ".join(("*",) + resource.full_embeds)
+
+    columns: List[str] = []
+    embed_columns: Dict[str, List[str]] = {}
+    for name in requested:
+        embed, _, column = name.rpartition(".")
+        if embed:
+            spec = resource.embeds.get(embed)
+            if spec is None:
+                raise _invalid(f"Invalid include: {embed}")
+            if column not in spec.columns:
+                raise _invalid(f"Invalid field: {name}")
+            embed_columns.setdefault(embed, []).append(column)
+        elif column in resource.columns:
+            columns.append(column)
+        else:
+            raise _invalid(f"Invalid field: {name}")
+
+    for embed in includes:
+        spec = resource.embeds.get(embed)
+        if spec is None:
+            raise _invalid(f"Invalid include: {embed}")
+        embed_columns.setdefault(embed, [])
+
+    if columns:
+        columns = list(resource.required) + [c for c in columns if c not in resource.required]
+    elif view == "summary":
+        columns = list(resource.summary)
+    else:
+        columns = ["*"]
+
+    parts = list(dict.fromkeys(columns))
+    for embed, selected in embed_columns.items():
+        selected = selected or list(resource.embeds[embed].summary)
+        parts.append(f"{embed}({', '.join(dict.fromkeys(selected))})")
+    return ", ".join(parts)
@@ -0,0 +1,143 @@
+"""出馬表の変更検出
+
+スクレイピングしたレース・出走馬を正規化してハッシュ（ダイジェスト）を取り、
+前回保存した内容から変わった行だけをDBに書き込むために使う。
+出馬表の再取得はほとんどの場合内容が変わらないため、書き込みとキャッシュの無効化を省ける。
+
+- race-digest:<YYYY-MM-DD>: 開催日ごとのハッシュ。フィールド "<venue>:<race_number>" に
+  {"id": レースID, "race": レースのダイジェスト, "horses": {馬番: ダイジェスト}} のJSON
+
+対象の列は app/models/race.py の Race・Horse の項目（ID・状態・結果・日時の管理列を除く）。
+Redis未設定・障害時・ハッシュの失効後はすべて変更ありとして扱う（DB側でも同じ内容の行は書き込まない）。
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.exceptions import RedisError
+
+from app.models.race import Horse, Race
+
+KEY_PREFIX = "race-digest:"
+
+# 開催日のハッシュの保持期間（過去の開催日を再取得することはほとんどない）
+DIGEST_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# スクレイピングで更新しない Race の項目
+UNTRACKED_RACE_FIELDS = {"id", "status", "horses", "result", "created_at", "updated_at"}
+RACE_FIELDS = tuple(name for name in Race.model_fields if name not in UNTRACKED_RACE_FIELDS)
+
+RaceKey = Tuple[str, str, int]
+
+
+def _digest(record: dict) -> str:
+    data = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def race_key(race: dict) -> RaceKey:
+    """races の一意制約 (date, venue, race_number)"""
+    return race["date"], race["venue"], int(race["race_number"])
+
+
+def race_digest(race: dict) -> str:
+    """レースのダイジェスト"""
+    return _digest({name: race.get(name) for name in RACE_FIELDS})
+
+
+def horse_digest(horse: dict) -> str:
+    """出走馬のダイジェスト（型の揺れを Horse モデルで正規化してから取る）"""
+    return _digest(Horse.model_validate(horse).model_dump(mode="json"))
+
+
+@dataclass
+class CardDigest:
+    """1レース分のダイジェスト"""
+    race: str
+    horses: Dict[int, str]
+    race_id: Optional[str] = None
+
+    @classmethod
+    def of(cls, race: dict) -> "CardDigest":
+        return cls(
+            race=race_digest(race),
+            horses={int(horse["number"]): horse_digest(horse) for horse in race.get("horses") or []},
+        )
+
+    def changed_horses(self, previous: Optional["CardDigest"]) -> set:
+        """前回から変わった（または新しい）出走馬の馬番"""
+        if previous is None:
+            return set(self.horses)
+        return {number for number, digest in self.horses.items() if previous.horses.get(number) != digest}
+
+    def unchanged_since(self, previous: Optional["CardDigest"]) -> bool:
+        return (
+            previous is not None
+            and previous.race_id is not None
+            and previous.race == self.race
+            and not self.changed_horses(previous)
+        )
+
+    def dumps(self) -> str:
+        return json.dumps({"id": self.race_id, "race": self.race, "horses": self.horses})
+
+    @classmethod
+    def loads(cls, raw: str) -> "CardDigest":
+        data = json.loads(raw)
+        return cls(
+            race=data["race"],
+            horses={int(number): digest for number, digest in data["horses"].items()},
+            race_id=data.get("id"),
+        )
+
+
+@dataclass
+class RaceDigests:
+    """保存済みのダイジェスト（タスク用）"""
+    cards: Dict[RaceKey, CardDigest] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, redis: Optional[SyncRedis], dates: Iterable[str]) -> "RaceDigests":
+        """開催日のダイジェストをまとめて読み込む"""
+        dates = sorted(set(dates))
+        if redis is None or not dates:
+            return cls()
+
+        try:
+            with redis.pipeline(transaction=False) as pipe:
+                for day in dates:
+                    pipe.hgetall(KEY_PREFIX + day)
+                results = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to load race digests: {e}")
+            return cls()
+
+        cards = {}
+        for day, fields in zip(dates, results):
+            for name, raw in fields.items():
+                venue, _, race_number = name.rpartition(":")
+                cards[(day, venue, int(race_number))] = CardDigest.loads(raw)
+        return cls(cards)
+
+    def get(self, key: RaceKey) -> Optional[CardDigest]:
+        return self.cards.get(key)
+
+    @staticmethod
+    def save(redis: Optional[SyncRedis], cards: Dict[RaceKey, CardDigest]) -> None:
+        """書き込んだレースのダイジェストを保存"""
+        if redis is None or not cards:
+            return
+
+        try:
+            with redis.pipeline(transaction=False) as pipe:
+                for (day, venue, race_number), card in cards.items():
+                    pipe.hset(KEY_PREFIX + day, f"{venue}:{race_number}", card.dumps())
+                for day in {day for day, _, _ in cards}:
+                    pipe.expire(KEY_PREFIX + day, DIGEST_TTL_SECONDS)
+                pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to save race digests: {e}")
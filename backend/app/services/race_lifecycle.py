@@ -0,0 +1,182 @@
+"""レースの状態遷移のスケジューラー
+
+受付開始・受付終了・発走の時刻を最小ヒープで管理し、時刻が来た遷移をまとめて処理する。
+
+- 受付開始（betting_start_time）: upcoming → betting
+- 受付終了（betting_end_time）: 受付時間帯の公開（app/services/open_races.py）から外す。
+  状態は発走まで betting のまま（最終オッズの更新は odds_scheduler が受付終了時刻に行う）
+- 発走（start_time）: upcoming / betting → running
+
+状態の更新は遷移先ごとに1回のUPDATEで行い、遷移前の状態を条件にする（重複して実行しても同じ結果）。
+状態が変わったレースはキャッシュを無効化し、race-events に状態の変更を発行する。
+LIFECYCLE_SYNC_SECONDS ごとに対象のレースをDBから読み直し、ヒープと受付時間帯の公開を作り直す。
+"""
+
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.services.clock import epoch_seconds
+from app.services.open_races import Window, publish_windows, remove_windows
+from app.services.race_stream import publish_status
+from app.services.response_cache import invalidate_race
+
+settings = get_settings()
+
+OPEN = "open"
+CLOSE = "close"
+START = "start"
+
+# 遷移先の状態と、遷移前として許す状態
+TRANSITIONS = {
+    OPEN: ("betting", ("upcoming",)),
+    START: ("running", ("upcoming", "betting")),
+}
+
+# 遷移が残っているレースの状態
+ACTIVE_STATUSES = ("upcoming", "betting")
+
+# 同じ時刻の遷移の処理順
+ORDER = {OPEN: 0, CLOSE: 1, START: 2}
+
+# 処理に失敗した場合に読み直すまでの待ち時間（秒）
+RETRY_DELAY_SECONDS = 5.0
+
+# (時刻, 処理順, レースID, 遷移)
+Event = Tuple[float, int, str, str]
+
+
+class RaceLifecycle:
+    """レースの状態遷移（常駐プロセスか定期タスク advance_race_statuses から呼ぶ）"""
+
+    def __init__(
+        self,
+        redis: Optional[SyncRedis],
+        supabase,
+        sync_interval: int = settings.LIFECYCLE_SYNC_SECONDS,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.redis = redis
+        self.supabase = supabase
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self.sleep = sleep
+        self._heap: List[Event] = []
+
+    def sync(self) -> int:
+        """遷移の残っているレースをDBから読み込み、ヒープと受付時間帯の公開を作り直す
+
+        時刻を過ぎた受付開始・発走もヒープに入れ、次の advance ですぐに処理する。
+
+        Returns:
+            対象のレース数
+        """
+        races = self.supabase.table("races").select(
+            "id, status, start_time, betting_start_time, betting_end_time"
+        ).in_("status", list(ACTIVE_STATUSES)).execute().data or []
+
+        now = self.clock()
+        heap: List[Event] = []
+        windows: Dict[str, Window] = {}
+        for race in races:
+            opens_at = epoch_seconds(race["betting_start_time"])
+            closes_at = epoch_seconds(race["betting_end_time"])
+            starts_at = epoch_seconds(race["start_time"])
+
+            if race["status"] == "upcoming":
+                heap.append((opens_at, ORDER[OPEN], race["id"], OPEN))
+            if closes_at > now:
+                heap.append((closes_at, ORDER[CLOSE], race["id"], CLOSE))
+                windows[race["id"]] = (opens_at, closes_at)
+            heap.append((starts_at, ORDER[START], race["id"], START))
+
+        heapq.heapify(heap)
+        self._heap = heap
+
+        if self.redis is not None:
+            try:
+                # 次の読み直しが何回か失敗するまでは公開を保つ
+                publish_windows(self.redis, windows, ttl=self.sync_interval * 3)
+            except RedisError as e:
+                logger.warning(f"Failed to publish open races: {e}")
+        return len(races)
+
+    def next_at(self) -> Optional[float]:
+        """次の遷移の時刻"""
+        return self._heap[0][0] if self._heap else None
+
+    def advance(self) -> Dict[str, List[str]]:
+        """時刻が来た遷移をまとめて処理
+
+        Returns:
+            遷移 → 状態を変えた（受付終了は公開から外した）レースID
+        """
+        now = self.clock()
+        flips: Dict[str, str] = {}
+        closing: Set[str] = set()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, race_id, event = heapq.heappop(self._heap)
+            if event == CLOSE:
+                closing.add(race_id)
+            else:
+                # 受付開始と発走が両方来ている場合は発走だけ行う
+                flips[race_id] = event
+
+        done: Dict[str, List[str]] = {OPEN: [], CLOSE: sorted(closing), START: []}
+        for event in (OPEN, START):
+            race_ids = [race_id for race_id, due in flips.items() if due == event]
+            if race_ids:
+                done[event] = self._flip(event, race_ids)
+
+        removed = closing | {race_id for race_id, due in flips.items() if due == START}
+        if removed and self.redis is not None:
+            try:
+                remove_windows(self.redis, removed)
+            except RedisError as e:
+                logger.warning(f"Failed to remove open races: {e}")
+        return done
+
+    def _flip(self, event: str, race_ids: List[str]) -> List[str]:
+        status, previous = TRANSITIONS[event]
+        rows = self.supabase.table("races").update({
+            "status": status,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }).in_("id", race_ids).in_("status", list(previous)).execute().data or []
+
+        for row in rows:
+            invalidate_race(self.redis, row["id"])
+            publish_status(self.redis, row["id"], row.get("date"), status)
+        if rows:
+            logger.info(f"Race status changed to {status}: {len(rows)} race(s)")
+        return [row["id"] for row in rows]
+
+    def tick(self) -> Dict[str, List[str]]:
+        """読み直してから時刻が来た遷移を処理（定期タスク用）"""
+        self.sync()
+        return self.advance()
+
+    def run_forever(self) -> None:
+        """次の遷移の時刻まで待って処理する"""
+        logger.info("Race lifecycle scheduler started")
+        next_sync = float("-inf")
+        while True:
+            try:
+                if self.clock() >= next_sync:
+                    self.sync()
+                    next_sync = self.clock() + self.sync_interval
+                self.advance()
+                next_at = self.next_at()
+                wake = next_sync if next_at is None else min(next_at, next_sync)
+            except Exception as e:
+                # 処理できなかった遷移は読み直しでヒープに戻る
+                logger.error(f"Race lifecycle update failed: {e}")
+                next_sync = float("-inf")
+                wake = self.clock() + RETRY_DELAY_SECONDS
+            self.sleep(max(wake - self.clock(), 0))
@@ -0,0 +1,256 @@
+"""オッズ・レース状態の配信
+
+タスクがオッズの更新やレース状態の変更をRedisのチャンネル（race-events）に発行し、
+各APIワーカーは1つの購読でそれを受け取って、接続中のクライアントへ配る。
+クライアントはレース単位（race:<race_id>）か開催日単位（day:<YYYY-MM-DD>）で購読する。
+
+イベント（JSON）:
+- {"type": "odds", "race_id", "date", "version", "base", "odds": {買い目: オッズ}}
+  odds は base（前のバージョン）から変わった買い目のみ。base が手元のバージョンと
+  異なる場合、クライアントはレース詳細を取得し直す
+- {"type": "status", "race_id", "date", "status"}
+- {"type": "resync"}: 取りこぼしがあった（受信が遅い・Redis再接続）。現在の状態を取得し直す
+
+受信が遅いクライアントの送信待ちは STREAM_QUEUE_SIZE 件までとし、溢れた場合は
+未送信分を捨てて resync を送る。STREAM_MAX_OVERFLOWS 回溢れたら切断する。
+ワーカーあたりの接続数は STREAM_MAX_CONNECTIONS までとし、超えた接続は StreamFull で断る。
+"""
+
+import asyncio
+import json
+from typing import Dict, Iterable, Optional, Set
+
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+CHANNEL = "race-events"
+
+RESYNC = json.dumps({"type": "resync"})
+
+# 閉じたことを待機中の next に知らせる（キューに入れる）
+CLOSED = object()
+
+# 購読の再接続までの待ち時間（秒）
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+def race_topic(race_id: str) -> str:
+    return f"race:{race_id}"
+
+
+def day_topic(day: str) -> str:
+    return f"day:{day}"
+
+
+def _publish(redis: Optional[SyncRedis], event: dict) -> None:
+    if redis is None:
+        return
+    # date 列が日時で返る場合も開催日の購読に一致させる
+    event["date"] = str(event["date"])[:10] if event.get("date") else None
+    try:
+        redis.publish(CHANNEL, json.dumps(event, separators=(",", ":"), ensure_ascii=False))
+    except RedisError as e:
+        logger.warning(f"Failed to publish race event: {e}")
+
+
+def odds_delta(previous: Dict[str, str], odds: Dict[str, float], precision: int = 1) -> Dict[str, float]:
+    """前回のスナップショットから表示上変わった買い目のオッズ"""
+    delta = {}
+    for name, value in odds.items():
+        value = round(value, precision)
+        old = previous.get(name)
+        if old is None or round(float(old), precision) != value:
+            delta[name] = value
+    return delta
+
+
+def publish_odds(
+    redis: Optional[SyncRedis],
+    race_id: str,
+    day: Optional[str],
+    version: int,
+    base: Optional[int],
+    odds: Dict[str, float],
+) -> None:
+    """オッズの更新を発行（タスク用）"""
+    _publish(redis, {
+        "type": "odds", "race_id": race_id, "date": day,
+        "version": version, "base": base, "odds": odds,
+    })
+
+
+def publish_status(redis: Optional[SyncRedis], race_id: str, day: Optional[str], status: str) -> None:
+    """レース状態の変更を発行（タスク用）"""
+    _publish(redis, {"type": "status", "race_id": race_id, "date": day, "status": status})
+
+
+class StreamFull(Exception):
+    """ワーカーの接続数が上限に達している"""
+
+
+class Subscriber:
+    """1クライアント分の送信待ちキュー"""
+
+    def __init__(self, topics: Set[str], queue_size: int, max_overflows: int):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.max_overflows = max_overflows
+        self.overflows = 0
+        self.closed = asyncio.Event()
+
+    def offer(self, message: str) -> None:
+        """送信待ちに追加（溢れた場合は未送信分を resync に置き換える）"""
+        if self.closed.is_set():
+            return
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        self.overflows += 1
+        if self.overflows >= self.max_overflows:
+            self.close()
+        else:
+            self._clear()
+            self.queue.put_nowait(RESYNC)
+
+    def close(self) -> None:
+        """配信を終える（未送信分を捨て、待機中の next をすぐに戻す）"""
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self._clear()
+        self.queue.put_nowait(CLOSED)
+
+    def _clear(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def next(self, timeout: float) -> Optional[str]:
+        """次の送信メッセージ（timeout 秒なければ、または閉じた場合はNone）"""
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return None if message is CLOSED else message
+
+
+class RaceStream:
+    """APIワーカー内の配信ハブ（Redisの購読は1つ）"""
+
+    def __init__(self, queue_size: int, max_overflows: int, max_subscribers: int = 0):
+        self.queue_size = queue_size
+        self.max_overflows = max_overflows
+        self.max_subscribers = max_subscribers
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def full(self) -> bool:
+        """接続数が上限に達している（max_subscribers が 0 の場合は無制限）"""
+        return 0 < self.max_subscribers <= len(self._subscribers)
+
+    def subscribe(self, redis: Redis, topics: Iterable[str]) -> Subscriber:
+        """クライアントを登録（最初の登録時にRedisの購読を始める）
+
+        Raises:
+            StreamFull: 接続数が上限に達している
+        """
+        subscriber = self.add(topics)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(redis))
+        return subscriber
+
+    def add(self, topics: Iterable[str]) -> Subscriber:
+        """クライアントを登録（Redisの購読は始めない）"""
+        if self.full:
+            raise StreamFull(f"Too many stream connections (max {self.max_subscribers})")
+        subscriber = Subscriber(set(topics), self.queue_size, self.max_overflows)
+        self._subscribers.add(subscriber)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscriber.close()
+        self._subscribers.discard(subscriber)
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def dispatch(self, message: str) -> int:
+        """受け取ったイベントを該当する購読者へ配る（JSONは1回だけ解析する）
+
+        Returns:
+            配った購読者数
+        """
+        try:
+            event = json.loads(message)
+        except ValueError:
+            logger.warning(f"Invalid race event: {message[:100]}")
+            return 0
+
+        targets: Set[Subscriber] = set()
+        for topic in (race_topic(event.get("race_id")), day_topic(event.get("date"))):
+            targets |= self._topics.get(topic, set())
+        for subscriber in targets:
+            subscriber.offer(message)
+        return len(targets)
+
+    def broadcast(self, message: str) -> None:
+        for subscribers in list(self._topics.values()):
+            for subscriber in subscribers:
+                subscriber.offer(message)
+
+    async def _listen(self, redis: Redis) -> None:
+        reconnecting = False
+        while True:
+            try:
+                async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    if reconnecting:
+                        # 切断中のイベントを取りこぼしている
+                        self.broadcast(RESYNC)
+                        reconnecting = False
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                logger.warning(f"Race event subscription lost: {e}")
+                reconnecting = True
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        for subscriber in list(self._subscribers):
+            self.unsubscribe(subscriber)
+
+
+race_stream = RaceStream(
+    queue_size=settings.STREAM_QUEUE_SIZE,
+    max_overflows=settings.STREAM_MAX_OVERFLOWS,
+    max_subscribers=settings.STREAM_MAX_CONNECTIONS,
+)
@@ -0,0 +1,254 @@
+"""レースAPIのレスポンスキャッシュ
+
+レース一覧・詳細は多数のクライアントが同じ内容を数秒おきにポーリングするため、
+シリアライズ済みのレスポンス本文をETag付きでキャッシュする。
+
+- キーは正規化したクエリ条件と「世代番号」から作る。オッズ更新や状態変更のたびに
+  タスク側が世代番号を進める（invalidate_race）ため、古いエントリは参照されなくなる。
+- 世代番号はRedisで共有し、各ワーカーは RACE_CACHE_GENERATION_TTL_SECONDS ごとに確認する。
+- 結果が入った確定済み（finished）のレースと中止（cancelled）のレースは変化しないため、
+  世代番号に依存しないキーで長期間保持し、Cache-Control に immutable を付ける
+  （is_final_race）。結果は状態が finished になった後に書き込まれるため、状態だけでは判断しない。
+- 同一プロセス内で同じキーの生成が重なった場合は1回のDB問い合わせを共有する。
+"""
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Response, status
+from loguru import logger
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.services.cache import TTLCache
+from app.services.metrics import CACHE_REDIS_REQUESTS
+
+settings = get_settings()
+
+KEY_PREFIX = "race-cache:"
+GENERATION_PREFIX = "race-cache-gen:"
+FINAL_PREFIX = "final:"
+
+LIST_SCOPE = "races"
+
+REDIS_HITS = CACHE_REDIS_REQUESTS.labels("race_response", "hit")
+REDIS_MISSES = CACHE_REDIS_REQUESTS.labels("race_response", "miss")
+
+
+def is_final_race(race: dict) -> bool:
+    """今後内容が変わらないレースか（中止、または結果が書き込まれた確定済みレース）
+
+    race_results を含まない表現（一覧の summary など）は結果の書き込みで本文が変わらないため、
+    状態だけで判断する。
+    """
+    race_status = race.get("status")
+    if race_status == "cancelled":
+        return True
+    if race_status != "finished":
+        return False
+    return "race_results" not in race or bool(race["race_results"])
+
+
+def race_scope(race_id: str) -> str:
+    """レース詳細の世代番号スコープ"""
+    return f"race:{race_id}"
+
+
+def cache_key(name: str, **params) -> str:
+    """クエリ条件を正規化したキャッシュキー（未指定の条件は含めない）"""
+    items = sorted((k, str(v).strip()) for k, v in params.items() if v is not None)
+    return f"{name}?{urlencode(items)}"
+
+
+@dataclass
+class CachedResponse:
+    """シリアライズ済みレスポンス"""
+    body: bytes
+    etag: str
+    immutable: bool = False
+
+    @classmethod
+    def build(cls, body: bytes, immutable: bool = False) -> "CachedResponse":
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        return cls(body=body, etag=etag, immutable=immutable)
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "body": self.body.decode(),
+            "etag": self.etag,
+            "immutable": self.immutable,
+        })
+
+    @classmethod
+    def loads(cls, raw: str) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(body=data["body"].encode(), etag=data["etag"], immutable=data["immutable"])
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match が現在のETagと一致するか"""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+    def to_response(self, if_none_match: Optional[str]) -> Response:
+        """レスポンスを作成（一致するETagが送られてきた場合は304）"""
+        if self.immutable:
+            cache_control = f"private, max-age={settings.RACE_CACHE_FINAL_TTL_SECONDS}, immutable"
+        else:
+            cache_control = "private, no-cache"
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+        if self.matches(if_none_match):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+Builder = Callable[[], Awaitable[Tuple[bytes, bool]]]
+
+
+class ResponseCache:
+    """世代番号で無効化するレスポンスキャッシュ"""
+
+    def __init__(self, ttl: int, final_ttl: int, generation_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.final_ttl = final_ttl
+        self.generation_ttl = generation_ttl
+        self.local = TTLCache(max_size=max_size, ttl=ttl)
+        self.generations = TTLCache(max_size=max_size, ttl=generation_ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_build(
+        self,
+        redis: Optional[Redis],
+        key: str,
+        scope: str,
+        build: Builder,
+    ) -> CachedResponse:
+        """キャッシュ済みレスポンスを取得し、なければ build() で作成する
+
+        build は (JSON本文, 確定済みか) を返す。
+        """
+        final_key = FINAL_PREFIX + key
+        entry = self.local.get(final_key)
+        if entry is not None:
+            return entry
+
+        generation = await self._generation(redis, scope)
+        versioned_key = f"{key}@{generation}"
+        entry = self.local.get(versioned_key)
+        if entry is not None:
+            return entry
+
+        inflight = self._inflight.get(versioned_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[versioned_key] = future
+        try:
+            entry = await self._read(redis, versioned_key, final_key)
+            if entry is None:
+                body, final = await build()
+                entry = CachedResponse.build(body, immutable=final)
+                await self._write(redis, final_key if final else versioned_key, entry)
+            else:
+                self._store_local(redis, final_key if entry.immutable else versioned_key, entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # 待機者がいない場合に "exception was never retrieved" を出さない
+            future.exception()
+            raise
+        finally:
+            del self._inflight[versioned_key]
+
+    async def _generation(self, redis: Optional[Redis], scope: str) -> str:
+        if redis is None:
+            return "0"
+
+        generation = self.generations.get(scope)
+        if generation is not None:
+            return generation
+
+        try:
+            generation = await redis.get(GENERATION_PREFIX + scope) or "0"
+        except RedisError as e:
+            logger.warning(f"Response cache generation read failed: {e}")
+            return "0"
+
+        self.generations.set(scope, generation)
+        return generation
+
+    async def _read(
+        self, redis: Optional[Redis], versioned_key: str, final_key: str
+    ) -> Optional[CachedResponse]:
+        if redis is None:
+            return None
+
+        try:
+            versioned, final = await redis.mget(KEY_PREFIX + versioned_key, KEY_PREFIX + final_key)
+        except RedisError as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+
+        raw = final or versioned
+        if not raw:
+            REDIS_MISSES.inc()
+            return None
+        REDIS_HITS.inc()
+        return CachedResponse.loads(raw)
+
+    async def _write(self, redis: Optional[Redis], key: str, entry: CachedResponse) -> None:
+        self._store_local(redis, key, entry)
+        if redis is None:
+            return
+
+        try:
+            await redis.set(
+                KEY_PREFIX + key,
+                entry.dumps(),
+                ex=self.final_ttl if entry.immutable else self.ttl,
+            )
+        except RedisError as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    def _store_local(self, redis: Optional[Redis], key: str, entry: CachedResponse) -> None:
+        if entry.immutable:
+            ttl = self.final_ttl
+        elif redis is None:
+            # 無効化が届かないため、世代番号の確認間隔と同じだけ保持する
+            ttl = self.generation_ttl
+        else:
+            ttl = None
+        self.local.set(key, entry, ttl=ttl)
+
+
+def invalidate_race(redis: Optional[SyncRedis], race_id: str) -> None:
+    """レースの詳細と一覧のキャッシュを無効化（タスク用）"""
+    if redis is None:
+        return
+
+    try:
+        with redis.pipeline(transaction=False) as pipe:
+            for scope in (LIST_SCOPE, race_scope(race_id)):
+                pipe.incr(GENERATION_PREFIX + scope)
+                pipe.expire(GENERATION_PREFIX + scope, settings.RACE_CACHE_FINAL_TTL_SECONDS)
+            pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to invalidate race cache: race={race_id}: {e}")
+
+
+response_cache = ResponseCache(
+    ttl=settings.RACE_CACHE_TTL_SECONDS,
+    final_ttl=settings.RACE_CACHE_FINAL_TTL_SECONDS,
+    generation_ttl=settings.RACE_CACHE_GENERATION_TTL_SECONDS,
+    max_size=settings.RACE_CACHE_MAX_ENTRIES,
+)
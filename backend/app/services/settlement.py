@@ -0,0 +1,206 @@
+"""予想の精算エンジン
+
+レースの未確定予想をチャンクごとに NumPy 配列へ読み込み、
+全券種の的中判定と配当計算を配列演算でまとめて行う。
+予想は pending_bet_columns RPC で列ごとの配列として読み込む（行ごとの dict を作らない）。
+予想ステータス・ユーザー残高・コイン取引履歴の更新は
+settle_bets_chunk RPC（backend/sql/settle_bets_chunk.sql）でチャンク単位に一括実行する。
+"""
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+from supabase import Client
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# 券種コード（配列上の表現）
+BET_TYPE_CODES = {
+    "win": 0,
+    "place": 1,
+    "exacta": 2,
+    "wide": 3,
+    "trio": 4,
+    "trifecta": 5,
+}
+
+# 選択馬番の列数（3連系に合わせる。未使用の列は NO_SELECTION）
+MAX_SELECTIONS = 3
+NO_SELECTION = -1
+
+# 的中判定（False/True）から精算後ステータスへの対応
+SETTLED_STATUSES = np.array(["lost", "won"], dtype=object)
+
+
+@dataclass
+class BetArrays:
+    """未確定予想の配列表現"""
+    ids: List[str]
+    bet_types: np.ndarray  # int8 (n,)
+    selections: np.ndarray  # int16 (n, MAX_SELECTIONS)
+    amounts: np.ndarray  # int64 (n,)
+    odds: np.ndarray  # float64 (n,)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def columns_to_arrays(columns: dict) -> BetArrays:
+    """pending_bet_columns RPC の列ごとの配列を変換
+
+    selections は1行 MAX_SELECTIONS 列（不足分は NO_SELECTION）に詰めて平坦にした配列。
+    """
+    ids = columns["ids"]
+    n = len(ids)
+    return BetArrays(
+        ids=ids,
+        bet_types=np.fromiter(map(BET_TYPE_CODES.__getitem__, columns["bet_types"]), dtype=np.int8, count=n),
+        selections=np.array(columns["selections"], dtype=np.int16).reshape(n, MAX_SELECTIONS),
+        amounts=np.array(columns["amounts"], dtype=np.int64),
+        odds=np.array(columns["odds"], dtype=np.float64),
+    )
+
+
+def bets_to_arrays(rows: List[dict]) -> BetArrays:
+    """予想行（dict）を配列に変換"""
+    n = len(rows)
+    selections = [row["selections"] for row in rows]
+    lengths = np.fromiter(map(len, selections), dtype=np.int64, count=n)
+    flat = np.fromiter(chain.from_iterable(selections), dtype=np.int16, count=int(lengths.sum()))
+
+    # 各行の馬番数までのマスクで (n, MAX_SELECTIONS) に詰める
+    padded = np.full((n, MAX_SELECTIONS), NO_SELECTION, dtype=np.int16)
+    padded[np.arange(MAX_SELECTIONS) < lengths[:, None]] = flat
+
+    return BetArrays(
+        ids=[row["id"] for row in rows],
+        bet_types=np.fromiter((BET_TYPE_CODES[row["bet_type"]] for row in rows), dtype=np.int8, count=n),
+        selections=padded,
+        amounts=np.array([row["amount"] for row in rows], dtype=np.int64),
+        odds=np.array([row["odds"] for row in rows], dtype=np.float64),
+    )
+
+
+def evaluate_hits(
+    bets: BetArrays,
+    first: int,
+    second: int,
+    third: int,
+    place_positions: int = 3,
+) -> np.ndarray:
+    """全券種の的中判定
+
+    place_positions は複勝・ワイドの対象着順数（出走7頭以下は2着まで）。
+    """
+    selections = bets.selections
+    s0 = selections[:, 0]
+    s1 = selections[:, 1]
+    s2 = selections[:, 2]
+
+    is_first = selections == first
+    is_second = selections == second
+    is_third = selections == third
+    in_top2 = is_first | is_second
+    in_top3 = in_top2 | is_third
+    in_places = in_top3 if place_positions >= 3 else in_top2
+
+    conditions = {
+        "win": s0 == first,
+        "place": in_places[:, 0],
+        # 馬連: 2頭とも2着以内（順不同）
+        "exacta": in_top2[:, 0] & in_top2[:, 1],
+        "wide": in_places[:, 0] & in_places[:, 1],
+        # 3連複: 3頭とも3着以内（順不同）
+        "trio": in_top3.all(axis=1),
+        "trifecta": (s0 == first) & (s1 == second) & (s2 == third),
+    }
+
+    hits = np.zeros(len(bets), dtype=bool)
+    for bet_type, condition in conditions.items():
+        hits |= (bets.bet_types == BET_TYPE_CODES[bet_type]) & condition
+    return hits
+
+
+def compute_payouts(bets: BetArrays, hits: np.ndarray) -> np.ndarray:
+    """配当計算（賭け金 × 購入時オッズ、1コイン未満切り捨て）"""
+    payouts = np.floor(bets.amounts * bets.odds).astype(np.int64)
+    return np.where(hits, payouts, 0)
+
+
+def build_settlement(bets: BetArrays, result: Optional[dict], place_positions: int = 3) -> dict:
+    """精算内容（settle_bets_chunk RPC のパラメータ）を作成
+
+    result が None の場合はレース中止として全額返還する。
+    """
+    if result is None:
+        statuses = np.full(len(bets), "refunded", dtype=object)
+        payouts = bets.amounts
+    else:
+        hits = evaluate_hits(bets, result["first"], result["second"], result["third"], place_positions)
+        statuses = SETTLED_STATUSES[hits.view(np.int8)]
+        payouts = compute_payouts(bets, hits)
+
+    return {
+        "p_bet_ids": bets.ids,
+        "p_statuses": statuses.tolist(),
+        "p_payouts": payouts.tolist(),
+    }
+
+
+def settle_race(supabase: Client, race_id: str, chunk_size: Optional[int] = None) -> dict:
+    """レースの未確定予想を精算
+
+    Returns:
+        精算件数と残高が変わったユーザーIDの一覧
+    """
+    chunk_size = chunk_size or settings.SETTLEMENT_CHUNK_SIZE
+
+    race = supabase.table("races").select(
+        "id, status, race_results(*)"
+    ).eq("id", race_id).single().execute()
+    if not race.data:
+        raise ValueError(f"Race not found: {race_id}")
+
+    result = race.data.get("race_results")
+    if isinstance(result, list):
+        result = result[0] if result else None
+
+    if race.data["status"] == "cancelled":
+        result = None
+    elif result is None:
+        raise ValueError(f"Race result is not available: {race_id}")
+
+    runners = supabase.table("horses").select(
+        "id", count="exact"
+    ).eq("race_id", race_id).limit(1).execute()
+    place_positions = 2 if (runners.count or 0) <= 7 else 3
+
+    settled = 0
+    user_ids: set[str] = set()
+    last_id = ""
+
+    while True:
+        columns = supabase.rpc("pending_bet_columns", {
+            "p_race_id": race_id, "p_after_id": last_id, "p_limit": chunk_size,
+        }).execute().data
+        if not columns["ids"]:
+            break
+
+        bets = columns_to_arrays(columns)
+        params = build_settlement(bets, result, place_positions)
+        response = supabase.rpc("settle_bets_chunk", {"p_race_id": race_id, **params}).execute()
+
+        settled += response.data["settled"]
+        user_ids.update(response.data["user_ids"])
+        last_id = bets.ids[-1]
+        logger.info(f"Settled chunk: race={race_id}, bets={len(bets)}")
+
+        if len(bets) < chunk_size:
+            break
+
+    return {"settled": settled, "user_ids": sorted(user_ids)}
@@ -0,0 +1,90 @@
+"""ユーザー情報キャッシュ
+
+get_current_user が毎リクエスト users テーブルを読むのを避けるため、
+ユーザー行をプロセス内LRU（短いTTL）とRedis（共有、やや長いTTL）の2段でキャッシュする。
+コインを更新するAPIはキャッシュを破棄し、次の読み込みでDBから読み直す。
+更新後の行を書き込む（write-through）と、同時に更新した場合に古い行が後から書き込まれ、
+TTLの間古い残高を返すことがあるため。
+"""
+
+import json
+from typing import Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.services.cache import TTLCache
+from app.services.metrics import CACHE_REDIS_REQUESTS
+
+settings = get_settings()
+
+KEY_PREFIX = "user:"
+
+REDIS_HITS = CACHE_REDIS_REQUESTS.labels("user", "hit")
+REDIS_MISSES = CACHE_REDIS_REQUESTS.labels("user", "miss")
+
+
+class UserCache:
+    """ユーザー行の2段キャッシュ"""
+
+    def __init__(self, local_ttl: float, redis_ttl: int, max_size: int):
+        self.local = TTLCache(max_size=max_size, ttl=local_ttl)
+        self.redis_ttl = redis_ttl
+
+    async def get(self, redis: Optional[Redis], user_id: str) -> Optional[dict]:
+        """キャッシュからユーザー行を取得"""
+        user = self.local.get(user_id)
+        if user is not None:
+            return user
+
+        if redis is None:
+            return None
+
+        try:
+            raw = await redis.get(KEY_PREFIX + user_id)
+        except RedisError as e:
+            logger.warning(f"User cache read failed: {e}")
+            return None
+
+        if raw is None:
+            REDIS_MISSES.inc()
+            return None
+
+        REDIS_HITS.inc()
+        user = json.loads(raw)
+        self.local.set(user_id, user)
+        return user
+
+    async def set(self, redis: Optional[Redis], user: dict) -> None:
+        """ユーザー行をキャッシュに書き込む"""
+        user_id = user["id"]
+        self.local.set(user_id, user)
+
+        if redis is None:
+            return
+
+        try:
+            await redis.set(KEY_PREFIX + user_id, json.dumps(user, default=str), ex=self.redis_ttl)
+        except RedisError as e:
+            logger.warning(f"User cache write failed: {e}")
+
+    async def invalidate(self, redis: Optional[Redis], user_id: str) -> None:
+        """キャッシュを破棄（ユーザー行を更新した後に呼ぶ）"""
+        self.local.delete(user_id)
+
+        if redis is None:
+            return
+
+        try:
+            await redis.delete(KEY_PREFIX + user_id)
+        except RedisError as e:
+            logger.warning(f"User cache invalidation failed: {e}")
+
+
+user_cache = UserCache(
+    local_ttl=settings.USER_CACHE_LOCAL_TTL_SECONDS,
+    redis_ttl=settings.USER_CACHE_TTL_SECONDS,
+    max_size=settings.USER_CACHE_MAX_SIZE,
+)
@@ -13,6 +13,11 @@ celery_app = Celery(
     include=[
         "app.tasks.race_tasks",
         "app.tasks.odds_tasks",
+        "app.tasks.ranking_tasks",
+        "app.tasks.ledger_tasks",
+        "app.tasks.lifecycle_tasks",
+        # タスクの実行時間の記録（シグナルの登録のみ）
+        "app.tasks.monitoring",
     ]
 )
 
@@ -35,9 +40,24 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.race_tasks.fetch_daily_races",
         "schedule": {"hour": 5, "minute": 0},
     },
-    # 5分ごとにオッズを更新
-    "update-odds": {
-        "task": "app.tasks.odds_tasks.update_odds",
+    # 1分ごとに時刻を過ぎたレースの状態遷移を反映（通常は常駐のスケジューラーが時刻ちょうどに行う）
+    "advance-race-statuses": {
+        "task": "app.tasks.lifecycle_tasks.advance_race_statuses",
+        "schedule": float(settings.LIFECYCLE_SYNC_SECONDS),
+    },
+    # 更新時刻が来たレースのオッズを更新（間隔は受付終了が近いほど短い）
+    "schedule-odds": {
+        "task": "app.tasks.odds_tasks.schedule_odds",
+        "schedule": float(settings.ODDS_SCHEDULER_TICK_SECONDS),
+    },
+    # 30秒ごとに滞留しているコイン取引履歴を書き込む
+    "flush-ledger": {
+        "task": "app.tasks.ledger_tasks.flush_ledger",
+        "schedule": 30.0,
+    },
+    # 5分ごとに週間・月間ランキングを更新
+    "refresh-rankings": {
+        "task": "app.tasks.ranking_tasks.refresh_rankings",
         "schedule": 300.0,  # 5分
     },
 }
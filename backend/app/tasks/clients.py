@@ -0,0 +1,35 @@
+"""Celery タスク用のクライアント
+
+タスクは同期処理のため、APIとは別に同期版のクライアントを使う。
+"""
+
+from redis import Redis, from_url as redis_from_url
+from supabase import create_client, Client
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_supabase_client: Client | None = None
+_redis_client: Redis | None = None
+
+
+def get_supabase() -> Client:
+    """Supabaseクライアントを取得"""
+    global _supabase_client
+    if _supabase_client is None:
+        if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+        _supabase_client = create_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_KEY
+        )
+    return _supabase_client
+
+
+def get_redis() -> Redis | None:
+    """Redisクライアントを取得（REDIS_URL未設定の場合はNone）"""
+    global _redis_client
+    if _redis_client is None and settings.REDIS_URL:
+        _redis_client = redis_from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_client
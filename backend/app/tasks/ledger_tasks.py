@@ -0,0 +1,35 @@
+"""コイン取引履歴の書き込みタスク
+
+書き込みワーカーは常駐プロセスとして実行する:
+    cd backend && python -m app.tasks.ledger_tasks
+定期タスク flush_ledger は、ワーカーが動いていない場合の取りこぼしを書き込む。
+"""
+
+from app.tasks import celery_app
+from app.tasks.clients import get_supabase, get_redis
+from app.services.ledger import LedgerFlusher
+from loguru import logger
+
+
+@celery_app.task
+def flush_ledger():
+    """滞留している取引記録を書き込む"""
+    redis = get_redis()
+    if redis is None:
+        return 0
+
+    written = LedgerFlusher(redis, get_supabase()).drain()
+    if written:
+        logger.info(f"Flushed {written} coin transactions")
+    return written
+
+
+def main() -> None:
+    redis = get_redis()
+    if redis is None:
+        raise ValueError("REDIS_URL must be set")
+    LedgerFlusher(redis, get_supabase()).run_forever()
+
+
+if __name__ == "__main__":
+    main()
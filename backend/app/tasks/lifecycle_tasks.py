@@ -0,0 +1,24 @@
+"""レースの状態遷移タスク
+
+スケジューラーは常駐プロセスとして実行し、遷移の時刻ちょうどに状態を変える:
+    cd backend && python -m app.tasks.lifecycle_tasks
+定期タスク advance_race_statuses は、スケジューラーが動いていない場合の遅れを取り戻す。
+"""
+
+from app.tasks import celery_app
+from app.tasks.clients import get_supabase, get_redis
+from app.services.race_lifecycle import RaceLifecycle
+
+
+@celery_app.task
+def advance_race_statuses():
+    """時刻を過ぎた受付開始・受付終了・発走を反映"""
+    return RaceLifecycle(get_redis(), get_supabase()).tick()
+
+
+def main() -> None:
+    RaceLifecycle(get_redis(), get_supabase()).run_forever()
+
+
+if __name__ == "__main__":
+    main()
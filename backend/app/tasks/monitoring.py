@@ -0,0 +1,42 @@
+"""Celery タスクの実行時間の記録
+
+タスクの終了ごとに、実行時間をヒストグラムの刻みごとの件数と合計として Redis のハッシュ
+（metrics:celery-tasks）に加算する。APIの /metrics が収集時に読み出す（app/services/metrics.py）。
+ワーカーは複数のプロセス・ホストで動くため、プロセス内ではなく Redis に集計する。
+"""
+
+import time
+from typing import Dict
+
+from celery.signals import task_postrun, task_prerun
+from loguru import logger
+from redis.exceptions import RedisError
+
+from app.services.metrics import TASK_METRICS_KEY, task_bucket
+from app.tasks.clients import get_redis
+
+# タスクID → 開始時刻
+_started: Dict[str, float] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs) -> None:
+    _started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _started.pop(task_id, None)
+    redis = get_redis()
+    if started is None or redis is None:
+        return
+
+    elapsed = time.perf_counter() - started
+    prefix = f"{task.name}|{state or 'UNKNOWN'}|"
+    try:
+        with redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(TASK_METRICS_KEY, prefix + task_bucket(elapsed), 1)
+            pipe.hincrbyfloat(TASK_METRICS_KEY, prefix + "sum", elapsed)
+            pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to record task metrics: {e}")
@@ -1,21 +1,79 @@
 """オッズ関連タスク"""
 
+import numpy as np
+
 from app.tasks import celery_app
+from app.tasks.clients import get_supabase, get_redis
+from app.services.odds_engine import RacePools, compute_odds, odds_to_fields
+from app.services.odds_cache import VERSION_FIELD, publish_snapshot, snapshot_key
+from app.services.odds_scheduler import OddsScheduler, release
+from app.services.race_stream import odds_delta, publish_odds
+from app.services.response_cache import invalidate_race
+from app.config import get_settings
 from loguru import logger
 
+settings = get_settings()
+
+
+@celery_app.task
+def schedule_odds():
+    """更新時刻が来たレースのオッズ更新を投入（数秒ごと）"""
+    redis = get_redis()
+    if redis is None:
+        return []
+    return OddsScheduler(redis, get_supabase(), dispatch=update_race_odds.delay).tick()
+
 
 @celery_app.task
 def update_odds():
-    """オッズを更新"""
+    """受付中の全レースのオッズをすぐに更新（手動実行用。定期更新は schedule_odds）"""
     logger.info("Updating odds...")
-    # TODO: オッズ更新実装
-    pass
+    supabase = get_supabase()
+    races = supabase.table("races").select("id").eq("status", "betting").execute()
+
+    for race in races.data or []:
+        update_race_odds.delay(race["id"])
 
 
 @celery_app.task
 def update_race_odds(race_id: str):
     """特定レースのオッズを更新"""
     logger.info(f"Updating odds for race: {race_id}")
-    # TODO: 特定レースのオッズ更新実装
-    pass
+    redis = get_redis()
+    if redis is None:
+        logger.warning("REDIS_URL is not configured; odds are not published")
+        return
+
+    try:
+        return _update_race_odds(redis, race_id)
+    finally:
+        release(redis, race_id)
+
+
+def _update_race_odds(redis, race_id: str):
+    supabase = get_supabase()
+    horses = supabase.table("horses").select("number, odds, races(date)").eq("race_id", race_id).execute()
+    if not horses.data:
+        logger.warning(f"No horses for race: {race_id}")
+        return
+
+    # 投票のない馬の推定には取得済みの単勝オッズを使う
+    runners = max(horse["number"] for horse in horses.data)
+    base_win_odds = np.zeros(runners)
+    for horse in horses.data:
+        base_win_odds[horse["number"] - 1] = horse.get("odds") or 0
+
+    pools = RacePools.load(redis, race_id, runners)
+    odds = compute_odds(pools, base_win_odds)
+    fields = odds_to_fields(odds)
+    previous = redis.hgetall(snapshot_key(race_id))
+    version = publish_snapshot(redis, race_id, fields, ttl=settings.ODDS_TTL_SECONDS)
+    invalidate_race(redis, race_id)
+
+    # 接続中のクライアントには前のバージョンから変わった買い目だけを送る
+    race = horses.data[0].get("races") or {}
+    base = int(previous[VERSION_FIELD]) if VERSION_FIELD in previous else None
+    publish_odds(redis, race_id, race.get("date"), version, base, odds_delta(previous, fields))
 
+    logger.info(f"Published {len(fields)} odds for race: {race_id} (version {version})")
+    return version
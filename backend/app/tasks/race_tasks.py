@@ -1,15 +1,95 @@
 """レース関連タスク"""
 
+import asyncio
+from datetime import date
+from typing import Optional
+
 from app.tasks import celery_app
+from app.tasks.clients import get_supabase, get_redis
+from app.scrapers.engine import BrowserPool, Scraper
+from app.scrapers.netkeiba import scrape_race_day
+from app.scrapers.store import default_store
+from app.services.clock import jst_today
+from app.services.race_digest import CardDigest, RaceDigests, race_key
+from app.services.response_cache import invalidate_race
+from app.services.leaderboard import PROFILE_COLUMNS, update_users
+from app.services.settlement import settle_race
+from app.services.user_cache import KEY_PREFIX as USER_CACHE_KEY_PREFIX
 from loguru import logger
+from redis.exceptions import RedisError
+
+# ランキング更新時に1回で読み込むユーザー数
+LEADERBOARD_BATCH_SIZE = 500
+
+
+async def _scrape(day: date) -> list:
+    store = default_store()
+    try:
+        async with Scraper(BrowserPool(), store=store) as scraper:
+            return await scrape_race_day(scraper, day)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def save_races(supabase, races: list, redis=None) -> dict:
+    """スクレイピングしたレースと出走馬を保存
+
+    前回保存時のダイジェストと比べて変わったレース・出走馬だけを、
+    1レース1回の upsert_race_card で書き込む。実際に書き込んだレースのみキャッシュを無効化する。
+
+    Returns:
+        {"races": 書き込んだレース数, "horses": 書き込んだ出走馬数, "unchanged": 変更がなかったレース数}
+    """
+    digests = RaceDigests.load(redis, (race["date"] for race in races))
+    saved = {}
+    stats = {"races": 0, "horses": 0, "unchanged": 0}
+
+    for race in races:
+        key = race_key(race)
+        card = CardDigest.of(race)
+        previous = digests.get(key)
+        if card.unchanged_since(previous):
+            stats["unchanged"] += 1
+            continue
+
+        changed = card.changed_horses(previous)
+        result = supabase.rpc("upsert_race_card", {
+            "p_race": {k: v for k, v in race.items() if k != "horses"},
+            "p_horses": [horse for horse in race["horses"] if horse["number"] in changed],
+        }).execute().data
+
+        card.race_id = result["race_id"]
+        saved[key] = card
+        stats["races"] += result["race_written"]
+        stats["horses"] += result["horses_written"]
+        if result["race_written"] or result["horses_written"]:
+            invalidate_race(redis, card.race_id)
+        else:
+            stats["unchanged"] += 1
+
+    RaceDigests.save(redis, saved)
+    return stats
 
 
 @celery_app.task
-def fetch_daily_races():
-    """毎日のレースデータを取得"""
-    logger.info("Fetching daily races...")
-    # TODO: スクレイピング実装
-    pass
+def fetch_daily_races(day: Optional[str] = None):
+    """毎日のレースデータを取得
+
+    Args:
+        day: 開催日（YYYY-MM-DD、省略時は今日）
+    """
+    target = date.fromisoformat(day) if day else jst_today()
+    logger.info(f"Fetching races for {target}...")
+
+    races = asyncio.run(_scrape(target))
+    stats = save_races(get_supabase(), races, get_redis())
+
+    logger.info(
+        f"Saved races for {target}: {stats['races']} races, {stats['horses']} horses written, "
+        f"{stats['unchanged']} unchanged"
+    )
+    return {"date": target.isoformat(), **stats}
 
 
 @celery_app.task
@@ -17,13 +97,35 @@ def fetch_race_results(race_id: str):
     """レース結果を取得"""
     logger.info(f"Fetching results for race: {race_id}")
     # TODO: 結果取得・配当計算実装
-    pass
+    # 結果（race_results）を書き込んだら、確定済みとして保持される前の詳細を無効化する
+    invalidate_race(get_redis(), race_id)
 
 
 @celery_app.task
 def settle_bets(race_id: str):
     """予想を精算"""
     logger.info(f"Settling bets for race: {race_id}")
-    # TODO: 予想精算実装
-    pass
+    result = settle_race(get_supabase(), race_id)
+    # 精算は結果の書き込み後に実行されるため、結果なしでキャッシュされた詳細を無効化する
+    invalidate_race(get_redis(), race_id)
+
+    # 残高が変わったユーザーのキャッシュを破棄
+    redis = get_redis()
+    if redis is not None and result["user_ids"]:
+        try:
+            redis.delete(*(USER_CACHE_KEY_PREFIX + user_id for user_id in result["user_ids"]))
+        except RedisError as e:
+            logger.warning(f"Failed to invalidate user cache: {e}")
+
+    # 成績が変わったユーザーのランキングを更新
+    if redis is not None:
+        user_ids = list(result["user_ids"])
+        for start in range(0, len(user_ids), LEADERBOARD_BATCH_SIZE):
+            users = get_supabase().table("users").select(", ".join(PROFILE_COLUMNS)).in_(
+                "id", user_ids[start:start + LEADERBOARD_BATCH_SIZE]
+            ).execute()
+            update_users(redis, users.data or [])
+
+    logger.info(f"Settled {result['settled']} bets for race: {race_id}")
+    return {"settled": result["settled"], "users": len(result["user_ids"])}
 
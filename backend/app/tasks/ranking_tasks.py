@@ -0,0 +1,37 @@
+"""ランキング関連タスク
+
+リーダーボードの再構築はコマンドとしても実行できる:
+    cd backend && python -m app.tasks.ranking_tasks
+"""
+
+from app.tasks import celery_app
+from app.tasks.clients import get_supabase, get_redis
+from app.services.leaderboard import WIN_RATE_MIN_BETS, rebuild
+from loguru import logger
+
+
+@celery_app.task
+def rebuild_leaderboards():
+    """DBからリーダーボードを再構築"""
+    redis = get_redis()
+    if redis is None:
+        logger.warning("REDIS_URL is not configured; leaderboards are not built")
+        return 0
+
+    count = rebuild(redis, get_supabase())
+    logger.info(f"Rebuilt leaderboards for {count} users")
+    return count
+
+
+@celery_app.task
+def refresh_rankings():
+    """日別収支の集計から rankings（週間・月間収支と各順位）を更新"""
+    result = get_supabase().rpc(
+        "refresh_rankings", {"p_win_rate_min_bets": WIN_RATE_MIN_BETS}
+    ).execute()
+    logger.info(f"Refreshed rankings for {result.data} users")
+    return result.data
+
+
+if __name__ == "__main__":
+    rebuild_leaderboards()
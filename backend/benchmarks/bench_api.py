@@ -0,0 +1,162 @@
+"""APIの負荷試験: インメモリの Supabase（SimulatedSupabase）に対するシナリオの実行
+
+シナリオ（benchmarks/scenarios.py）ごとに、エンドポイント別のレイテンシ（p50 / p95 / p99）、
+スループット、1リクエストあたりのラウンドトリップ数（RTT/req、PostgREST へのリクエスト数）と
+リポジトリの呼び出し数（DB/req、リクエストごとのトレースから）を表示する。
+
+--check で保存済みのベースライン（benchmarks/baselines/bench_api.json）と比較し、
+次のいずれかに当たれば終了コード1で終わる:
+- ラウンドトリップ数・リポジトリの呼び出し数が増えた（--rtt-tolerance を超えて）
+- p95 / p99 が --tolerance を超えて（かつ --slack-ms より大きく）遅くなった、
+  スループットが --tolerance を超えて下がった
+- ベースラインでは発生しなかったエラーが発生した
+
+実行:
+    cd backend && python -m benchmarks.bench_api
+    cd backend && python -m benchmarks.bench_api --check
+    cd backend && python -m benchmarks.bench_api --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from loguru import logger
+
+from benchmarks.scenarios import SCENARIOS, Recorder, make_client, reset_caches
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "bench_api.json"
+
+Metrics = Dict[str, float]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近傍法のパーセンタイル（values は昇順）"""
+    index = max(int(round(q / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+async def run_scenario(name: str, rtt: float, max_connections: int, users: int, seed: int) -> Dict[str, Metrics]:
+    scenario = SCENARIOS[name]
+    users = users or scenario.users
+    client = make_client(rtt, max_connections, users=max(users, 1000), seed=seed)
+    recorder = Recorder()
+    reset_caches()
+
+    started = time.perf_counter()
+    await scenario.run(client, recorder, users, random.Random(seed))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        results[endpoint] = {
+            "requests": len(latencies),
+            "errors": recorder.errors[endpoint],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "throughput": round(len(latencies) / elapsed, 1),
+            "round_trips": round(client.by_endpoint[endpoint] / len(latencies), 3),
+            "db_calls": round(sum(t.calls for t in recorder.traces[endpoint]) / len(latencies), 3),
+        }
+    return results
+
+
+def print_results(name: str, results: Dict[str, Metrics]) -> None:
+    print(f"\n[{name}]")
+    print(
+        f"  {'endpoint':36s} {'req':>6s} {'err':>4s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'req/s':>8s} "
+        f"{'RTT/req':>8s} {'DB/req':>7s}"
+    )
+    for endpoint, m in results.items():
+        print(
+            f"  {endpoint:36s} {m['requests']:6d} {m['errors']:4d} {m['p50_ms']:7.1f}ms "
+            f"{m['p95_ms']:7.1f}ms {m['p99_ms']:7.1f}ms {m['throughput']:8.1f} {m['round_trips']:8.2f} "
+            f"{m['db_calls']:7.2f}"
+        )
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Metrics]],
+    current: Dict[str, Dict[str, Metrics]],
+    tolerance: float,
+    rtt_tolerance: float,
+    slack_ms: float,
+) -> List[str]:
+    """ベースラインからの悪化を列挙"""
+    regressions = []
+    for scenario, endpoints in current.items():
+        for endpoint, m in endpoints.items():
+            base = baseline.get(scenario, {}).get(endpoint)
+            if base is None:
+                continue
+            label = f"{scenario} {endpoint}"
+            if m["round_trips"] > base["round_trips"] * (1 + rtt_tolerance) + 0.01:
+                regressions.append(f"{label}: round trips {base['round_trips']} -> {m['round_trips']}")
+            if "db_calls" in base and m["db_calls"] > base["db_calls"] * (1 + rtt_tolerance) + 0.01:
+                regressions.append(f"{label}: DB calls {base['db_calls']} -> {m['db_calls']}")
+            for key in ("p95_ms", "p99_ms"):
+                if m[key] > base[key] * (1 + tolerance) and m[key] - base[key] > slack_ms:
+                    regressions.append(f"{label}: {key} {base[key]} -> {m[key]}")
+            if m["throughput"] < base["throughput"] / (1 + tolerance):
+                regressions.append(f"{label}: throughput {base['throughput']} -> {m['throughput']}")
+            if m["errors"] > base["errors"]:
+                regressions.append(f"{label}: errors {base['errors']} -> {m['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="実行するシナリオ（複数指定可、既定は全部）")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="1ラウンドトリップの遅延（ミリ秒）")
+    parser.add_argument("--max-connections", type=int, default=50, help="同時に実行できるラウンドトリップ数")
+    parser.add_argument("--users", type=int, default=0, help="ユーザー（クライアント）数（既定はシナリオごと）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="ベースラインのJSON")
+    parser.add_argument("--check", action="store_true", help="ベースラインと比較し、悪化していれば失敗する")
+    parser.add_argument("--update-baseline", action="store_true", help="結果をベースラインとして保存")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="レイテンシ・スループットの許容悪化率")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="これ以下のレイテンシの悪化は無視する（キャッシュ応答の揺れ）")
+    parser.add_argument("--rtt-tolerance", type=float, default=0.1, help="ラウンドトリップ数・呼び出し数の許容増加率")
+    args = parser.parse_args()
+
+    logger.disable("app")
+    settings = {"rtt_ms": args.rtt_ms, "max_connections": args.max_connections, "users": args.users, "seed": args.seed}
+    names = args.scenario or list(SCENARIOS)
+
+    current = {}
+    for name in names:
+        current[name] = asyncio.run(run_scenario(name, args.rtt_ms / 1000, args.max_connections, args.users, args.seed))
+        print_results(name, current[name])
+
+    if args.update_baseline:
+        stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        if stored.get("settings") != settings:
+            stored = {"settings": settings, "results": {}}
+        stored["results"].update(current)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(stored, indent=2, ensure_ascii=False) + "\n")
+        print(f"\nBaseline saved: {args.baseline}")
+
+    if args.check:
+        stored = json.loads(args.baseline.read_text())
+        if stored["settings"] != settings:
+            print(f"\nBaseline was recorded with different settings: {stored['settings']}")
+            sys.exit(2)
+        regressions = compare(stored["results"], current, args.tolerance, args.rtt_tolerance, args.slack_ms)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
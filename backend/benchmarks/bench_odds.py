@@ -0,0 +1,56 @@
+"""オッズ計算ベンチマーク: 1レース全券種・全買い目の再計算
+
+実行:
+    cd backend && python -m benchmarks.bench_odds --runners 18
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.odds_engine import POOLS, RacePools, compute_odds, odds_to_fields
+
+
+def make_pools(runners: int, bets: int, seed: int = 0) -> RacePools:
+    """ランダムな投票でプールを作成"""
+    rng = np.random.default_rng(seed)
+    strength = rng.dirichlet(np.ones(runners) * 0.7)
+    pools = RacePools(runners)
+    bet_types = list(POOLS)
+    for _ in range(bets):
+        bet_type = bet_types[rng.integers(len(bet_types))]
+        size = POOLS[bet_type]["selections"]
+        ticket = rng.choice(runners, size=size, replace=False, p=strength) + 1
+        pools.add(bet_type, ticket.tolist(), float(rng.choice((100, 500, 1000))))
+    return pools
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runners", type=int, default=18, help="出走頭数")
+    parser.add_argument("--bets", type=int, default=50_000, help="プールに入れる投票数")
+    parser.add_argument("--repeat", type=int, default=20, help="計測回数")
+    args = parser.parse_args()
+
+    pools = make_pools(args.runners, args.bets)
+    base_win_odds = np.linspace(2.0, 150.0, args.runners)
+
+    compute_times, publish_times = [], []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        odds = compute_odds(pools, base_win_odds)
+        compute_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        fields = odds_to_fields(odds)
+        publish_times.append(time.perf_counter() - started)
+
+    combos = {bet_type: int(np.count_nonzero(~np.isnan(values))) for bet_type, values in odds.items()}
+    print(f"runners={args.runners} combinations={combos} fields={len(fields)}")
+    print(f"compute_odds    median={np.median(compute_times) * 1000:.2f} ms")
+    print(f"odds_to_fields  median={np.median(publish_times) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""予想作成ベンチマーク: 逐次5ラウンドトリップ vs place_bet RPC 1ラウンドトリップ
+
+実行:
+    cd backend && python -m benchmarks.bench_place_bet --rtt-ms 20 --bets 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+from fastapi import Response
+from loguru import logger
+
+from app.api.bets import BET_TYPES, create_bet
+from app.models.bet import BetCreate
+from app.repositories.supabase import supabase_repositories
+from benchmarks.simulated import SimulatedSupabase
+
+RACE_ID = "race-1"
+
+
+async def legacy_create_bet(client: SimulatedSupabase, user: dict, bet_data: BetCreate) -> None:
+    """RPC化前の create_bet と同じ呼び出し順（レース→オッズ→予想→ユーザー→取引履歴）"""
+    race = await client.table("races").select("*").eq("id", bet_data.race_id).single().execute()
+    assert race.data["status"] == "betting"
+
+    horse = await client.table("horses").select("odds").eq(
+        "race_id", bet_data.race_id
+    ).eq("number", bet_data.selections[0]).single().execute()
+    odds = horse.data["odds"]
+
+    now = datetime.now(timezone.utc)
+    bet_result = await client.table("bets").insert({
+        "user_id": user["id"],
+        "race_id": bet_data.race_id,
+        "bet_type": bet_data.bet_type,
+        "selections": bet_data.selections,
+        "amount": bet_data.amount,
+        "odds": odds,
+        "status": "pending",
+        "created_at": now.isoformat()
+    }).execute()
+
+    new_coins = user["coins"] - bet_data.amount
+    await client.table("users").update({
+        "coins": new_coins,
+        "total_bets": user["total_bets"] + 1,
+        "total_spent": user["total_spent"] + bet_data.amount
+    }).eq("id", user["id"]).execute()
+
+    await client.table("coin_transactions").insert({
+        "user_id": user["id"],
+        "type": "spend",
+        "amount": -bet_data.amount,
+        "balance": new_coins,
+        "reason": f"予想購入（{BET_TYPES[bet_data.bet_type]['name']}）",
+        "metadata": {"race_id": bet_data.race_id, "bet_id": bet_result.data[0]["id"]},
+        "created_at": now.isoformat()
+    }).execute()
+
+
+async def rpc_create_bet(client: SimulatedSupabase, user: dict, bet_data: BetCreate) -> None:
+    """現在の create_bet（place_bet RPC）"""
+    await create_bet(
+        bet_data, Response(), None, current_user=user, repos=supabase_repositories(client), redis=None
+    )
+
+
+def make_client(rtt: float, users: int) -> SimulatedSupabase:
+    client = SimulatedSupabase(rtt=rtt)
+    client.tables["races"] = [{"id": RACE_ID, "status": "betting", "betting_end_time": "2999-01-01T00:00:00"}]
+    client.tables["horses"] = [
+        {"race_id": RACE_ID, "number": n, "odds": 2.0 + n} for n in range(1, 19)
+    ]
+    client.tables["users"] = [
+        {"id": f"user-{i}", "coins": 10 ** 9, "total_bets": 0, "total_spent": 0, "is_premium": False}
+        for i in range(users)
+    ]
+    return client
+
+
+async def run(path, rtt: float, bets: int, concurrency: int) -> dict:
+    client = make_client(rtt, users=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        user = dict(client.tables["users"][i % concurrency])
+        bet_data = BetCreate(race_id=RACE_ID, bet_type="win", selections=[i % 18 + 1], amount=100)
+        async with semaphore:
+            started = time.perf_counter()
+            await path(client, user, bet_data)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(bets)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "round_trips_per_bet": client.round_trips / bets,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "throughput": bets / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="1ラウンドトリップの遅延（ミリ秒）")
+    parser.add_argument("--bets", type=int, default=200, help="予想件数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時リクエスト数")
+    args = parser.parse_args()
+
+    logger.disable("app")
+    rtt = args.rtt_ms / 1000
+    for name, path in (("legacy (5 RTT)", legacy_create_bet), ("place_bet RPC", rpc_create_bet)):
+        result = asyncio.run(run(path, rtt, args.bets, args.concurrency))
+        print(
+            f"{name:16s} round_trips/bet={result['round_trips_per_bet']:.1f} "
+            f"mean={result['mean_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+            f"throughput={result['throughput']:.0f} bets/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""レース一覧の射影ベンチマーク: 全列（従来）と summary / fields 指定の比較
+
+1ページ分のレース（既定100件×18頭）を生成し、build_select の select 句どおりに
+射影した結果を RaceListResponse としてシリアライズする。本文サイズ（生・gzip）と
+シリアライズ時間を比較する。
+
+実行:
+    cd backend && python -m benchmarks.bench_projection --races 100 --runners 18
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from app.models.race import RaceListResponse
+from app.services.projection import RACES, build_select
+
+CASES = [
+    ("full (default)", {}),
+    ("summary", {"view": "summary"}),
+    ("summary+horses", {"view": "summary", "include": "horses"}),
+    ("fields", {"fields": "race_name,start_time,horses.number,horses.name"}),
+]
+
+
+def make_races(races: int, runners: int) -> List[Dict[str, Any]]:
+    """全列を持つレース行を生成"""
+    start = datetime(2024, 1, 6, 1, 0, tzinfo=timezone.utc)
+    rows = []
+    for i in range(races):
+        race_id = f"00000000-0000-0000-0000-{i:012d}"
+        start_time = start + timedelta(minutes=30 * i)
+        rows.append({
+            "id": race_id,
+            "date": "2024-01-06",
+            "venue": ("中山", "京都", "中京")[i % 3],
+            "race_number": i % 12 + 1,
+            "race_name": f"第{i + 1}レース サンプルステークス",
+            "grade": "G3" if i % 12 == 10 else None,
+            "distance": 1200 + 200 * (i % 6),
+            "surface": "turf" if i % 2 else "dirt",
+            "condition": "良",
+            "weather": "晴",
+            "status": "betting",
+            "start_time": start_time.isoformat(),
+            "betting_start_time": (start_time - timedelta(minutes=30)).isoformat(),
+            "betting_end_time": (start_time - timedelta(minutes=2)).isoformat(),
+            "created_at": start.isoformat(),
+            "updated_at": start.isoformat(),
+            "horses": [
+                {
+                    "id": f"{race_id[:-3]}{n:03d}",
+                    "race_id": race_id,
+                    "number": n,
+                    "name": f"サンプルホース{n}",
+                    "jockey": f"騎手{n}",
+                    "trainer": f"調教師{n}",
+                    "weight": 55.0 + n % 4,
+                    "odds": round(1.5 + n * 3.7, 1),
+                    "popularity": n,
+                    "age": 3 + n % 5,
+                    "sex": "male" if n % 2 else "female",
+                    "previous_results": [n % 9 + 1, n % 5 + 1, n % 7 + 1, 1, 2],
+                    "created_at": start.isoformat(),
+                    "updated_at": start.isoformat(),
+                }
+                for n in range(1, runners + 1)
+            ],
+            "race_results": None,
+        })
+    return rows
+
+
+def split_select(select: str) -> List[str]:
+    """select 句をトップレベルのカンマで分割"""
+    parts, depth, current = [], 0, ""
+    for char in select:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    parts.append(current.strip())
+    return parts
+
+
+def project(row: Dict[str, Any], select: str) -> Dict[str, Any]:
+    """PostgREST と同じように select 句で行を射影"""
+    result: Dict[str, Any] = {}
+    for part in split_select(select):
+        if "(" in part:
+            name, inner = part[:-1].split("(", 1)
+            value = row.get(name)
+            if isinstance(value, list):
+                result[name] = [project(item, inner) for item in value]
+            else:
+                result[name] = project(value, inner) if value else value
+        elif part == "*":
+            result.update({k: v for k, v in row.items() if not isinstance(v, (list, dict)) or k == "previous_results"})
+        else:
+            result[part] = row.get(part)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=100, help="1ページのレース数")
+    parser.add_argument("--runners", type=int, default=18, help="出走頭数")
+    parser.add_argument("--repeat", type=int, default=50, help="計測回数")
+    args = parser.parse_args()
+
+    rows = make_races(args.races, args.runners)
+    pagination = {"page": 1, "limit": args.races, "total": args.races, "totalPages": 1}
+
+    baseline = None
+    print(f"races={args.races} runners={args.runners}")
+    for name, params in CASES:
+        select = build_select(RACES, **params)
+        races = [project(row, select) for row in rows]
+
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = RaceListResponse(races=races, pagination=pagination).model_dump_json().encode()
+            times.append(time.perf_counter() - started)
+
+        size, compressed = len(body), len(gzip.compress(body))
+        baseline = baseline or (size, statistics.median(times))
+        print(
+            f"{name:16s} bytes={size:8d} gzip={compressed:7d} "
+            f"({size / baseline[0]:6.1%})  serialize median={statistics.median(times) * 1000:6.2f} ms "
+            f"({statistics.median(times) / baseline[1]:6.1%})"
+        )
+        print(f"{'':16s} select={select}")
+
+
+if __name__ == "__main__":
+    main()
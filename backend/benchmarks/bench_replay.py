@@ -0,0 +1,76 @@
+"""再解析ベンチマーク: 保存済みページからの出馬表の再作成
+
+一時ディレクトリの PageStore に数か月分のフィクスチャページを保存し、
+ワーカー1プロセスと複数プロセスで replay_days の処理時間を比較する。
+ReplayFetcher 経由（本番と同じ処理）の結果と一致することも確認する。
+
+実行:
+    cd backend && python -m benchmarks.bench_replay --days 60 --workers 8
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from app.scrapers.engine import HostLimiter, Scraper
+from app.scrapers.netkeiba import race_card_url, race_list_url, scrape_race_day
+from app.scrapers.replay import ReplayFetcher, replay_days
+from app.scrapers.store import PageStore
+from benchmarks.bench_scraper import DAY, race_card_page, race_ids, race_list_page
+
+
+def populate(store: PageStore, days: list, venues: int) -> int:
+    """開催日ごとのレース一覧と出馬表を保存"""
+    pages = 0
+    for offset, day in enumerate(days):
+        # 回・日目の桁を開催日ごとに変えて、日ごとに別のレースIDにする
+        day_ids = [
+            f"{day.year}{race_id[4:6]}{offset // 12 + 1:02d}{offset % 12 + 1:02d}{race_id[10:]}"
+            for race_id in race_ids(venues)
+        ]
+        store.put(race_list_url(day), race_list_page(day_ids))
+        for race_id in day_ids:
+            store.put(race_card_url(race_id), race_card_page(race_id))
+        pages += len(day_ids) + 1
+    return pages
+
+
+async def replay_one(store: PageStore, day) -> list:
+    async with Scraper(ReplayFetcher(store), HostLimiter(concurrency=64, rate=0)) as scraper:
+        return await scrape_race_day(scraper, day)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=60, help="開催日数")
+    parser.add_argument("--venues", type=int, default=3, help="開催会場数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="ワーカープロセス数")
+    args = parser.parse_args()
+
+    days = [DAY + timedelta(days=offset) for offset in range(args.days)]
+    with tempfile.TemporaryDirectory() as root:
+        store = PageStore(root)
+        started = time.perf_counter()
+        pages = populate(store, days, args.venues)
+        print(f"stored {pages} pages in {time.perf_counter() - started:.2f}s")
+
+        baseline = None
+        for workers in (1, args.workers):
+            started = time.perf_counter()
+            races = replay_days(store, days, workers=workers)
+            elapsed = time.perf_counter() - started
+            print(f"  workers={workers}: {elapsed:6.2f}s  races={len(races)} ({len(races) / elapsed:.0f} races/s)")
+            assert baseline is None or races == baseline, "replay must be deterministic"
+            baseline = races
+
+        online = asyncio.run(replay_one(store, days[0]))
+        assert online == [race for race in baseline if race["date"] == days[0].isoformat()]
+        print("  ReplayFetcher matches replay_days")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
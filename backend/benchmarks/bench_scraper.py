@@ -0,0 +1,165 @@
+"""スクレイピングベンチマーク: 開催日1日分の出馬表取得（ローカルのフィクスチャサーバー）
+
+netkeiba と同じ構造のレース一覧・出馬表を返すHTTPサーバーをローカルで起動し、
+全会場×12レースの取得・解析を、逐次（同時1）と並行で比較する。
+一部のリクエストには 503 を返し、再試行で全レースを取得できることも確認する。
+
+実行:
+    cd backend && python -m benchmarks.bench_scraper --venues 3 --latency 0.2
+    cd backend && python -m benchmarks.bench_scraper --browser  # Playwright（要 playwright install chromium）
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.scrapers.engine import BrowserPool, HostLimiter, HttpFetcher, Scraper
+from app.scrapers.netkeiba import VENUES, scrape_race_day
+
+RACES_PER_VENUE = 12
+DAY = date(2025, 1, 5)
+
+
+def race_ids(venues: int) -> list:
+    codes = list(VENUES)[:venues]
+    return [f"{DAY.year}{code}0101{number:02d}" for code in codes for number in range(1, RACES_PER_VENUE + 1)]
+
+
+def race_list_page(ids: list) -> str:
+    items = "".join(
+        f'<li class="RaceList_DataItem"><a href="../race/shutuba.html?race_id={race_id}&rf=race_list">'
+        f'<div class="Race_Num"><span>{int(race_id[10:])}R</span></div></a></li>'
+        for race_id in ids
+    )
+    return f'<html><body><dl class="RaceList_DataList"><dd class="RaceList_Data"><ul>{items}</ul></dd></dl></body></html>'
+
+
+def race_card_page(race_id: str, runners: int = 16) -> str:
+    number = int(race_id[10:])
+    grade = '<span class="Icon_GradeType Icon_GradeType3"></span>' if number == 11 else ""
+    rows = "".join(
+        f'<tr class="HorseList"><td class="Waku1">1</td><td class="Umaban1">{n}</td>'
+        f'<td class="HorseInfo"><span class="HorseName"><a>ホース{race_id[-4:]}{n:02d}</a></span></td>'
+        f'<td class="Barei">{"牡牝セ"[n % 3]}{3 + n % 5}</td><td class="Txt_C">{54 + n % 4}.0</td>'
+        f'<td class="Jockey"><a>騎手{n}</a></td><td class="Trainer"><span>美浦</span><a>調教師{n}</a></td>'
+        f'<td class="Weight">480(+2)</td>'
+        f'<td class="Popular"><span id="odds-1_{n:02d}">{1.5 + n * 2.3:.1f}</span></td>'
+        f'<td class="Popular_Ninki"><span id="ninki-1_{n:02d}">{n}</span></td></tr>'
+        for n in range(1, runners + 1)
+    )
+    return (
+        f'<html><body><div class="RaceList_NameBox">'
+        f'<h1 class="RaceName">テスト{number}R {grade}</h1>'
+        f'<div class="RaceData01">{9 + number // 2}:{(number % 2) * 30:02d}発走 / 芝{1200 + number * 100}m (右 A) / 天候:晴 / 馬場:良</div>'
+        f'</div><table class="Shutuba_Table"><tbody>{rows}</tbody></table></body></html>'
+    )
+
+
+class FixtureServer:
+    """フィクスチャを返すローカルHTTPサーバー（latency秒の遅延、failure_rateの割合で503）"""
+
+    def __init__(self, venues: int, latency: float, failure_rate: float, seed: int = 0):
+        self.ids = race_ids(venues)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fixture._lock:
+                    fixture.requests += 1
+                    fixture._in_flight += 1
+                    fixture.max_in_flight = max(fixture.max_in_flight, fixture._in_flight)
+                    fail = fixture.random.random() < fixture.failure_rate
+                try:
+                    time.sleep(fixture.latency)
+                    url = urlsplit(self.path)
+                    if url.path.endswith("race_list_sub.html"):
+                        body = race_list_page(fixture.ids)
+                    elif url.path.endswith("shutuba.html") and not fail:
+                        body = race_card_page(parse_qs(url.query)["race_id"][0])
+                    else:
+                        with fixture._lock:
+                            fixture.failures += 1
+                        self.send_error(503)
+                        return
+                    payload = body.encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with fixture._lock:
+                        fixture._in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FixtureServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+async def run(server: FixtureServer, concurrency: int, rate: float, browser: bool) -> tuple:
+    fetcher = BrowserPool(size=concurrency, wait_until="domcontentloaded") if browser else HttpFetcher()
+    limiter = HostLimiter(concurrency=concurrency, rate=rate, burst=concurrency)
+    started = time.perf_counter()
+    async with Scraper(fetcher, limiter, backoff=0.05, max_backoff=0.5) as scraper:
+        races = await scrape_race_day(scraper, DAY, base_url=server.base_url)
+    return races, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--venues", type=int, default=3, help="開催会場数")
+    parser.add_argument("--latency", type=float, default=0.2, help="1リクエストの応答時間（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="出馬表に503を返す割合")
+    parser.add_argument("--concurrency", type=int, default=4, help="ホストごとの同時リクエスト数")
+    parser.add_argument("--rate", type=float, default=0.0, help="ホストごとのリクエスト数/秒（0で無制限）")
+    parser.add_argument("--browser", action="store_true", help="Playwrightのブラウザプールで取得")
+    args = parser.parse_args()
+
+    expected = args.venues * RACES_PER_VENUE
+    print(f"races={expected} latency={args.latency}s failure_rate={args.failure_rate} "
+          f"fetcher={'browser' if args.browser else 'http'}")
+
+    for concurrency in (1, args.concurrency):
+        with FixtureServer(args.venues, args.latency, args.failure_rate) as server:
+            races, elapsed = asyncio.run(run(server, concurrency, args.rate, args.browser))
+        horses = sum(len(race["horses"]) for race in races)
+        print(
+            f"  concurrency={concurrency}: {elapsed:6.2f}s  races={len(races)}/{expected} horses={horses} "
+            f"requests={server.requests} (503={server.failures}) max_in_flight={server.max_in_flight}"
+        )
+        assert len(races) == expected, "all races should be scraped after retries"
+        assert server.max_in_flight <= concurrency, "per-host concurrency exceeded"
+
+
+if __name__ == "__main__":
+    main()
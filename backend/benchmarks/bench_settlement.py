@@ -0,0 +1,138 @@
+"""精算ベンチマーク: 1レース10万件の予想の的中判定・配当計算
+
+NumPy による一括判定と、1件ずつ判定する素朴な実装を比較する。
+NumPy は、行（dict）から変換する場合と、pending_bet_columns RPC の列ごとの配列から
+変換する場合（settle_race が使う経路）の両方を計測する。応答の JSON の解析時間も
+行と列の形式で比較する。
+
+実行:
+    cd backend && python -m benchmarks.bench_settlement --bets 100000
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+
+from app.services.settlement import MAX_SELECTIONS, NO_SELECTION, bets_to_arrays, build_settlement, columns_to_arrays
+
+BET_SIZES = {"win": 1, "place": 1, "exacta": 2, "wide": 2, "trio": 3, "trifecta": 3}
+RESULT = {"first": 3, "second": 7, "third": 12}
+
+
+def make_bets(n: int, runners: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    bet_types = list(BET_SIZES)
+    rows = []
+    for _ in range(n):
+        bet_type = rng.choice(bet_types)
+        selections = rng.sample(range(1, runners + 1), BET_SIZES[bet_type])
+        if bet_type not in ("trifecta",):
+            selections.sort()
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": f"user-{rng.randrange(n // 10 or 1)}",
+            "bet_type": bet_type,
+            "selections": selections,
+            "amount": rng.choice((100, 200, 500, 1000)),
+            "odds": round(rng.uniform(1.1, 500.0), 1),
+        })
+    return rows
+
+
+def to_columns(rows: list[dict]) -> dict:
+    """pending_bet_columns RPC と同じ形式"""
+    padding = [NO_SELECTION] * MAX_SELECTIONS
+    return {
+        "ids": [row["id"] for row in rows],
+        "bet_types": [row["bet_type"] for row in rows],
+        "selections": [n for row in rows for n in (row["selections"] + padding)[:MAX_SELECTIONS]],
+        "amounts": [row["amount"] for row in rows],
+        "odds": [row["odds"] for row in rows],
+    }
+
+
+def settle_naive(rows: list[dict]) -> dict:
+    """1件ずつ判定する実装（比較用）"""
+    first, second, third = RESULT["first"], RESULT["second"], RESULT["third"]
+    top2 = {first, second}
+    top3 = {first, second, third}
+    statuses, payouts = [], []
+    for row in rows:
+        s = row["selections"]
+        bet_type = row["bet_type"]
+        if bet_type == "win":
+            hit = s[0] == first
+        elif bet_type == "place":
+            hit = s[0] in top3
+        elif bet_type == "exacta":
+            hit = set(s) == top2
+        elif bet_type == "wide":
+            hit = set(s) <= top3
+        elif bet_type == "trio":
+            hit = set(s) == top3
+        else:
+            hit = s == [first, second, third]
+        statuses.append("won" if hit else "lost")
+        payouts.append(int(row["amount"] * row["odds"]) if hit else 0)
+    return {"p_bet_ids": [r["id"] for r in rows], "p_statuses": statuses, "p_payouts": payouts}
+
+
+def settle_rows(rows: list[dict]) -> dict:
+    return build_settlement(bets_to_arrays(rows), RESULT)
+
+
+def settle_columns(columns: dict) -> dict:
+    return build_settlement(columns_to_arrays(columns), RESULT)
+
+
+def timed(fn, rows, repeat: int) -> tuple[float, dict]:
+    best = float("inf")
+    result = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bets", type=int, default=100_000, help="予想件数")
+    parser.add_argument("--runners", type=int, default=18, help="出走頭数")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（最良値を表示）")
+    args = parser.parse_args()
+
+    rows = make_bets(args.bets, args.runners)
+    columns = to_columns(rows)
+    naive_time, naive = timed(settle_naive, rows, args.repeat)
+    rows_time, vector = timed(settle_rows, rows, args.repeat)
+    columns_time, from_columns = timed(settle_columns, columns, args.repeat)
+
+    for result in (vector, from_columns):
+        assert naive["p_statuses"] == result["p_statuses"]
+        assert naive["p_payouts"] == result["p_payouts"]
+
+    rows_json, columns_json = json.dumps(rows), json.dumps(columns)
+    rows_parse, _ = timed(json.loads, rows_json, args.repeat)
+    columns_parse, _ = timed(json.loads, columns_json, args.repeat)
+
+    arrays = bets_to_arrays(rows)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        build_settlement(arrays, RESULT)
+    evaluate_time = (time.perf_counter() - started) / args.repeat
+
+    won = vector["p_statuses"].count("won")
+    print(f"bets={args.bets} won={won} payout={sum(vector['p_payouts'])}")
+    print(f"naive loop           {naive_time * 1000:8.1f} ms")
+    print(f"numpy (from rows)    {rows_time * 1000:8.1f} ms")
+    print(f"numpy (from columns) {columns_time * 1000:8.1f} ms")
+    print(f"numpy (evaluate)     {evaluate_time * 1000:8.1f} ms")
+    print(f"JSON parse (rows)    {rows_parse * 1000:8.1f} ms")
+    print(f"JSON parse (columns) {columns_parse * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""配信ベンチマーク: 1ワーカーから多数のクライアントへのイベント配布
+
+開催日単位・レース単位で購読するクライアントを多数登録し、オッズ差分イベント1件あたりの
+配布時間を計測する。一部のクライアントは受信しない（遅いクライアント）ものとし、
+送信待ちが上限で止まり、最後は切断されることも確認する。
+
+実行:
+    cd backend && python -m benchmarks.bench_stream --subscribers 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.race_stream import RaceStream, day_topic, race_topic
+
+DAY = "2025-01-05"
+RACES = 36
+
+
+async def run(subscribers: int, events: int, slow_ratio: float, queue_size: int) -> None:
+    stream = RaceStream(queue_size=queue_size, max_overflows=3)
+    subs = []
+    for i in range(subscribers):
+        topics = {day_topic(DAY)} if i % 2 else {race_topic(f"race-{i % RACES}")}
+        subs.append(stream.add(topics))
+
+    # 遅いクライアントは開催日単位の購読（全イベントを受け取る）から選ぶ
+    slow = set(range(1, subscribers, 2)[:int(subscribers * slow_ratio)])
+    odds = {f"win:{n}": 2.0 + n for n in range(1, 19)}
+
+    delivered = 0
+    started = time.perf_counter()
+    for version in range(1, events + 1):
+        message = json.dumps({
+            "type": "odds", "race_id": f"race-{version % RACES}", "date": DAY,
+            "version": version, "base": version - 1, "odds": odds,
+        })
+        delivered += stream.dispatch(message)
+        # 速いクライアントは毎回受信する
+        for i, sub in enumerate(subs):
+            if i not in slow:
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+    elapsed = time.perf_counter() - started
+
+    backlog = max(subs[i].queue.qsize() for i in slow) if slow else 0
+    dropped = sum(subs[i].closed.is_set() for i in slow)
+    print(f"subscribers={subscribers} events={events} deliveries={delivered}")
+    print(f"  {elapsed / events * 1000:.2f} ms/event  {delivered / elapsed:,.0f} deliveries/s")
+    print(f"  slow clients={len(slow)} max backlog={backlog} (limit {queue_size}) disconnected={dropped}")
+    assert backlog <= queue_size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=5000, help="接続数")
+    parser.add_argument("--events", type=int, default=500, help="イベント数")
+    parser.add_argument("--slow-ratio", type=float, default=0.01, help="受信しないクライアントの割合")
+    parser.add_argument("--queue-size", type=int, default=100, help="1クライアントの送信待ちの上限")
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.events, args.slow_ratio, args.queue_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""APIの負荷試験シナリオ
+
+SimulatedSupabase に1開催日分のレース・出走馬とユーザーを用意し、ルーターの関数を
+実際の呼び出しと同じ引数で直接呼ぶ（認証とHTTPの処理は含まない）。リポジトリは Supabase
+バックエンドを API と同じく計測用ラッパーで包んで使う。Redisは使わない
+（キャッシュ・リーダーボード未構築時のDB経路を計測する）。
+
+- bet_burst: 受付終了間際に多数のユーザーが同時に予想する（一部は一括予想）
+- races_polling: 多数のクライアントがレース一覧・詳細をポーリングする
+- ranking_reads: ランキング各種の読み込み
+- bonus_spike: 日付の切り替わり直後のログイン・広告視聴ボーナスの集中
+
+各シナリオは Recorder.call でリクエストごとのレイテンシと、DB呼び出しのトレース
+（app/services/db_trace.py）を記録する。
+"""
+
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+
+from fastapi import HTTPException, Response
+
+from app.api.bets import create_bet, create_bet_batch
+from app.api.coins import claim_ad_bonus
+from app.api.races import get_race, get_races
+from app.api.ranking import get_assets_ranking, get_profit_ranking, get_win_rate_ranking
+from app.api.users import claim_login_bonus
+from app.models.bet import BetBatchCreate, BetCreate
+from app.repositories import Repositories
+from app.repositories.instrumented import instrument
+from app.repositories.supabase import supabase_repositories
+from app.services.db_trace import DBTrace, trace
+from app.services.clock import jst_today
+from app.services.response_cache import response_cache
+from benchmarks.simulated import SimulatedSupabase, current_endpoint
+
+VENUES = ("中山", "京都", "中京")
+RACES_PER_VENUE = 12
+RUNNERS = 16
+
+
+def make_client(rtt: float, max_connections: int, users: int, seed: int = 0) -> SimulatedSupabase:
+    """今日（JST）の開催日1日分と users 人のユーザーを用意"""
+    rng = random.Random(seed)
+    client = SimulatedSupabase(rtt=rtt, max_connections=max_connections)
+    today = jst_today().isoformat()
+    now = datetime.now(timezone.utc)
+
+    races, horses = [], []
+    for v, venue in enumerate(VENUES):
+        for number in range(1, RACES_PER_VENUE + 1):
+            race_id = f"race-{v}-{number:02d}"
+            start_time = now + timedelta(minutes=30 * number + v)
+            races.append({
+                "id": race_id, "date": today, "venue": venue, "race_number": number,
+                "race_name": f"{venue}{number}R", "grade": None, "distance": 1600 + 200 * (number % 5),
+                "surface": "turf" if number % 2 else "dirt", "condition": "良", "weather": "晴",
+                "status": "betting", "start_time": start_time.isoformat(),
+                "betting_start_time": (start_time - timedelta(minutes=30)).isoformat(),
+                "betting_end_time": (start_time - timedelta(minutes=5)).isoformat(),
+                "created_at": now.isoformat(), "updated_at": now.isoformat(),
+            })
+            for n in range(1, RUNNERS + 1):
+                horses.append({
+                    "id": f"{race_id}-{n:02d}", "race_id": race_id, "number": n, "name": f"ホース{n}",
+                    "jockey": f"騎手{n}", "trainer": f"調教師{n}", "weight": 480, "age": 4, "sex": "male",
+                    "odds": round(1.5 + n * rng.uniform(0.5, 3.0), 1), "popularity": n,
+                    "previous_results": [], "created_at": now.isoformat(), "updated_at": now.isoformat(),
+                })
+
+    yesterday = (now - timedelta(days=1)).isoformat()
+    user_rows, rankings, daily = [], [], []
+    for i in range(users):
+        user_id = f"user-{i:05d}"
+        bets = rng.randint(0, 200)
+        wins = rng.randint(0, bets)
+        earnings, spent = rng.randint(0, 200_000), rng.randint(0, 200_000)
+        user_rows.append({
+            "id": user_id, "display_name": f"ユーザー{i}", "avatar": None,
+            "coins": rng.randint(1_000, 100_000), "total_bets": bets, "total_wins": wins,
+            "total_earnings": earnings, "total_spent": spent,
+            "win_rate": round(wins / bets * 100, 1) if bets else 0.0,
+            "consecutive_login_days": rng.randint(0, 40), "last_login_at": yesterday,
+            "is_premium": i % 10 == 0, "created_at": yesterday,
+        })
+        rankings.append({
+            "user_id": user_id, "net_profit": earnings - spent,
+            "weekly_profit": rng.randint(-50_000, 50_000), "weekly_rank": None,
+            "monthly_profit": rng.randint(-100_000, 100_000), "monthly_rank": None,
+        })
+        daily.append({"user_id": user_id, "day": today, "profit": rng.randint(-10_000, 10_000)})
+
+    for column, rank_column in (("weekly_profit", "weekly_rank"), ("monthly_profit", "monthly_rank")):
+        for rank, row in enumerate(sorted(rankings, key=lambda r: -r[column]), start=1):
+            row[rank_column] = rank
+
+    client.tables.update({
+        "races": races, "horses": horses, "users": user_rows, "rankings": rankings,
+        "user_daily_profits": daily, "race_results": [], "bets": [],
+        "coin_transactions": [], "advertisement_views": [],
+    })
+    return client
+
+
+def repositories(client: SimulatedSupabase) -> Repositories:
+    """APIと同じく計測用ラッパーで包んだ Supabase バックエンド（トレースに記録される）"""
+    return instrument(supabase_repositories(client), "supabase")
+
+
+class Recorder:
+    """エンドポイントごとのレイテンシ、エラー数、DB呼び出しのトレース"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.traces: Dict[str, List[DBTrace]] = defaultdict(list)
+
+    async def call(self, endpoint: str, request: Callable[[], Awaitable]) -> None:
+        token = current_endpoint.set(endpoint)
+        started = time.perf_counter()
+        with trace() as db_trace:
+            try:
+                await request()
+            except HTTPException:
+                self.errors[endpoint] += 1
+            finally:
+                self.latencies[endpoint].append(time.perf_counter() - started)
+                self.traces[endpoint].append(db_trace)
+                current_endpoint.reset(token)
+
+
+def _user(client: SimulatedSupabase, i: int) -> dict:
+    return dict(client.tables["users"][i % len(client.tables["users"])])
+
+
+async def bet_burst(client: SimulatedSupabase, recorder: Recorder, users: int, rng: random.Random) -> None:
+    """users 人が同時に1回ずつ予想する（1割はボックスの一括予想）"""
+    repos = repositories(client)
+    race_ids = [race["id"] for race in client.tables["races"]][:3]
+
+    async def one(i: int) -> None:
+        user = _user(client, i)
+        race_id = race_ids[i % len(race_ids)]
+        if i % 10 == 0:
+            batch = BetBatchCreate(race_id=race_id, bet_type="trio", amount=100, box=rng.sample(range(1, RUNNERS + 1), 5))
+            await recorder.call("POST /api/bets/batch", lambda: create_bet_batch(
+                batch, Response(), None, current_user=user, repos=repos, redis=None
+            ))
+        else:
+            bet = BetCreate(race_id=race_id, bet_type="win", selections=[rng.randint(1, RUNNERS)], amount=100)
+            await recorder.call("POST /api/bets", lambda: create_bet(
+                bet, Response(), None, current_user=user, repos=repos, redis=None
+            ))
+
+    await asyncio.gather(*(one(i) for i in range(users)))
+
+
+async def races_polling(client: SimulatedSupabase, recorder: Recorder, users: int, rng: random.Random) -> None:
+    """users 台のクライアントが一覧を1秒ごと（3回に1回は詳細も）に3秒間ポーリングする"""
+    repos = repositories(client)
+    today = jst_today().isoformat()
+    race_ids = [race["id"] for race in client.tables["races"]]
+
+    async def poll(i: int) -> None:
+        user = _user(client, i)
+        etag = None
+        await asyncio.sleep(rng.uniform(0, 1.0))
+        for n in range(3):
+            async def races():
+                nonlocal etag
+                response = await get_races(
+                    today, None, None, None, 1, 20, "estimated", "summary", None, "horses", etag,
+                    current_user=user, repos=repos, redis=None,
+                )
+                etag = response.headers.get("etag")
+            await recorder.call("GET /api/races", races)
+            if (i + n) % 3 == 0:
+                race_id = race_ids[rng.randrange(len(race_ids))]
+                await recorder.call("GET /api/races/{id}", lambda: get_race(
+                    race_id, None, current_user=user, repos=repos, redis=None
+                ))
+            await asyncio.sleep(1.0)
+
+    await asyncio.gather(*(poll(i) for i in range(users)))
+
+
+async def ranking_reads(client: SimulatedSupabase, recorder: Recorder, users: int, rng: random.Random) -> None:
+    """users 人がランキングの各タブを1ページ目から3ページ目まで読む"""
+    repos = repositories(client)
+    async def read(i: int) -> None:
+        user = _user(client, i)
+        await asyncio.sleep(rng.uniform(0, 0.5))
+        for page in (1, 2, 3):
+            await recorder.call("GET /api/ranking/assets", lambda: get_assets_ranking(
+                page, 20, current_user=user, repos=repos, redis=None
+            ))
+            period = ("daily", "weekly", "monthly", "all")[(i + page) % 4]
+            await recorder.call(f"GET /api/ranking/profit?period={period}", lambda: get_profit_ranking(
+                period, page, 20, current_user=user, repos=repos, redis=None
+            ))
+            await recorder.call("GET /api/ranking/win-rate", lambda: get_win_rate_ranking(
+                page, 20, current_user=user, repos=repos, redis=None
+            ))
+
+    await asyncio.gather(*(read(i) for i in range(users)))
+
+
+async def bonus_spike(client: SimulatedSupabase, recorder: Recorder, users: int, rng: random.Random) -> None:
+    """0時（JST）直後に users 人がログインボーナスを受け取り、続けて広告視聴ボーナスを2回受け取る"""
+    repos = repositories(client)
+    async def claim(i: int) -> None:
+        user = _user(client, i)
+        await asyncio.sleep(rng.uniform(0, 0.2))
+        await recorder.call("POST /api/user/login-bonus", lambda: claim_login_bonus(
+            current_user=user, repos=repos, redis=None
+        ))
+        for _ in range(2):
+            await recorder.call("POST /api/coins/bonus/ad", lambda: claim_ad_bonus(
+                Response(), None, current_user=user, repos=repos, redis=None
+            ))
+
+    await asyncio.gather(*(claim(i) for i in range(users)))
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    run: Callable[[SimulatedSupabase, Recorder, int, random.Random], Awaitable[None]]
+    users: int
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("bet_burst", bet_burst, users=1000),
+        Scenario("races_polling", races_polling, users=300),
+        Scenario("ranking_reads", ranking_reads, users=200),
+        Scenario("bonus_spike", bonus_spike, users=500),
+    )
+}
+
+
+def reset_caches() -> None:
+    """シナリオ間でプロセス内のキャッシュを持ち越さない"""
+    response_cache.local.clear()
+    response_cache.generations.clear()
@@ -0,0 +1,45 @@
+"""ネットワーク遅延を模したインメモリの Supabase クライアント
+
+インメモリバックエンドのクライアント（app/repositories/memory.py）に遅延と計数を加えたもの。
+execute() ごとに1ラウンドトリップとして rtt 秒待機し、呼び出し回数を数える。
+ベンチマークで DB 呼び出し回数とレイテンシの関係を比較するために使う。
+
+同時に実行できるラウンドトリップは max_connections 件まで（コネクションプールの待ちを再現する）。
+呼び出し回数は操作ごと（calls）と、current_endpoint に設定したエンドポイントごと（by_endpoint）にも数える。
+"""
+
+import asyncio
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from app.repositories.memory import MemoryClient
+
+# 呼び出し元のエンドポイント（ラウンドトリップ数の集計用）
+current_endpoint: ContextVar[Optional[str]] = ContextVar("current_endpoint", default=None)
+
+
+class SimulatedSupabase(MemoryClient):
+    """遅延付きインメモリ Supabase クライアント"""
+
+    def __init__(self, rtt: float = 0.0, max_connections: Optional[int] = None):
+        super().__init__()
+        self.rtt = rtt
+        self.round_trips = 0
+        self.calls: Counter = Counter()
+        self.by_endpoint: Counter = Counter()
+        self._pool = asyncio.Semaphore(max_connections) if max_connections else None
+
+    async def round_trip(self, operation: str = "query") -> None:
+        self.round_trips += 1
+        self.calls[operation] += 1
+        endpoint = current_endpoint.get()
+        if endpoint is not None:
+            self.by_endpoint[endpoint] += 1
+        if not self.rtt:
+            return
+        if self._pool is None:
+            await asyncio.sleep(self.rtt)
+            return
+        async with self._pool:
+            await asyncio.sleep(self.rtt)
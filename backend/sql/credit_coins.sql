@@ -0,0 +1,38 @@
+-- コインの加算（ボーナス付与）
+--
+-- 残高を読んでから絶対値で書き戻すと、その間に place_bet の減算がコミットされた場合に
+-- 減算が失われる。加算は coins = coins + p_amount の1文で行い、更新後の行を返す。
+--
+-- ログインボーナスは最終ログイン日時と連続ログイン日数も同じ文で更新する。
+-- p_login_day_start（今日の0時(JST)をUTCにした時刻）以降にログイン済みの場合は
+-- 加算せず NULL を返す（同時に届いた2回目の受け取りを断る）。
+-- 時刻はいずれも timestamp without time zone（UTC）。
+--
+-- 適用: psql "$DATABASE_URL" -f backend/sql/credit_coins.sql
+
+CREATE OR REPLACE FUNCTION public.credit_coins(
+    p_user_id text,
+    p_amount integer,
+    p_login_at timestamp DEFAULT NULL,
+    p_consecutive_login_days integer DEFAULT NULL,
+    p_login_day_start timestamp DEFAULT NULL
+) RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_user users%ROWTYPE;
+BEGIN
+    UPDATE users u
+    SET coins = u.coins + p_amount,
+        last_login_at = coalesce(p_login_at, u.last_login_at),
+        consecutive_login_days = coalesce(p_consecutive_login_days, u.consecutive_login_days)
+    WHERE u.id = p_user_id
+      AND (p_login_day_start IS NULL OR u.last_login_at IS NULL OR u.last_login_at < p_login_day_start)
+    RETURNING * INTO v_user;
+
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    RETURN to_jsonb(v_user);
+END;
+$$;
@@ -0,0 +1,133 @@
+-- 予想作成（1トランザクション・1ラウンドトリップ）
+--
+-- レースの受付状態・馬番の確認、オッズの決定、コインの減算、予想の登録、
+-- コイン取引履歴の記録をまとめて実行する。
+-- 同じ冪等キーでの再送は、作成済みの予想をそのまま返す（二重課金しない）。
+-- オッズはAPIがオッズスナップショットから決めて渡し、そのバージョンを予想に記録する。
+--
+-- 適用: Supabase の SQL Editor もしくは psql で実行する
+--   psql "$DATABASE_URL" -f backend/sql/place_bet.sql
+
+DROP FUNCTION IF EXISTS public.place_bet(text, text, text, integer[], integer, text, text);
+DROP FUNCTION IF EXISTS public.place_bet(text, text, text, integer[], integer, text, text, double precision);
+
+CREATE OR REPLACE FUNCTION public.place_bet(
+    p_user_id text,
+    p_race_id text,
+    p_bet_type text,
+    p_selections integer[],
+    p_amount integer,
+    p_reason text,
+    p_idempotency_key text DEFAULT NULL,
+    p_odds double precision DEFAULT NULL,
+    p_odds_version bigint DEFAULT NULL
+) RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_bet bets%ROWTYPE;
+    v_user users%ROWTYPE;
+    v_race_status text;
+    v_betting_end_time timestamptz;
+    v_horse_odds double precision;
+    v_odds double precision := 1.0;
+    v_now timestamptz := now();
+BEGIN
+    IF p_idempotency_key IS NOT NULL THEN
+        -- 同じキーの同時リクエストを直列化する
+        PERFORM pg_advisory_xact_lock(hashtext(p_user_id || ':' || p_idempotency_key));
+
+        SELECT * INTO v_bet
+        FROM bets
+        WHERE user_id = p_user_id AND idempotency_key = p_idempotency_key;
+
+        IF FOUND THEN
+            SELECT * INTO v_user FROM users WHERE id = p_user_id;
+            RETURN jsonb_build_object(
+                'bet', to_jsonb(v_bet),
+                'user', to_jsonb(v_user),
+                'replayed', true
+            );
+        END IF;
+    END IF;
+
+    -- レースのステータスチェック
+    SELECT status, betting_end_time INTO v_race_status, v_betting_end_time
+    FROM races WHERE id = p_race_id;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'race_not_found';
+    END IF;
+    -- 受付終了から発走までは status が betting のままのため、時刻でも確認する
+    IF v_race_status <> 'betting' OR v_now >= v_betting_end_time THEN
+        RAISE EXCEPTION 'betting_closed';
+    END IF;
+
+    -- 同じ馬番の重複や、出走していない馬番を含む買い目でないかチェック
+    IF cardinality(p_selections) <> (SELECT count(DISTINCT n) FROM unnest(p_selections) AS n)
+       OR EXISTS (
+            SELECT 1
+            FROM unnest(p_selections) AS s(number)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM horses h WHERE h.race_id = p_race_id AND h.number = s.number
+            )
+       ) THEN
+        RAISE EXCEPTION 'invalid_selection';
+    END IF;
+
+    -- オッズを決定（オッズエンジンの公開オッズを優先し、
+    -- 未公開の場合は単勝の場合は馬のオッズ、その他は仮のオッズ）
+    IF p_odds IS NOT NULL THEN
+        v_odds := p_odds;
+    ELSIF p_bet_type IN ('win', 'place') THEN
+        SELECT odds INTO v_horse_odds
+        FROM horses
+        WHERE race_id = p_race_id AND number = p_selections[1];
+
+        IF FOUND THEN
+            IF p_bet_type = 'win' THEN
+                v_odds := v_horse_odds;
+            ELSE
+                -- 複勝オッズは単勝の約1/3として計算（簡易版）
+                v_odds := greatest(1.1, v_horse_odds / 3);
+            END IF;
+        END IF;
+    END IF;
+
+    -- コインを減算（残高不足の場合は更新されない）
+    UPDATE users
+    SET coins = coins - p_amount,
+        total_bets = total_bets + 1,
+        total_spent = total_spent + p_amount
+    WHERE id = p_user_id AND coins >= p_amount
+    RETURNING * INTO v_user;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'insufficient_coins';
+    END IF;
+
+    -- 予想を作成
+    INSERT INTO bets (
+        user_id, race_id, bet_type, selections, amount, odds, odds_version, status,
+        idempotency_key, created_at
+    ) VALUES (
+        p_user_id, p_race_id, p_bet_type, p_selections, p_amount, v_odds, p_odds_version, 'pending',
+        p_idempotency_key, v_now
+    )
+    RETURNING * INTO v_bet;
+
+    -- コイン取引履歴を記録
+    INSERT INTO coin_transactions (
+        user_id, type, amount, balance, reason, metadata, created_at
+    ) VALUES (
+        p_user_id, 'spend', -p_amount, v_user.coins, p_reason,
+        jsonb_build_object('race_id', p_race_id, 'bet_id', v_bet.id),
+        v_now
+    );
+
+    RETURN jsonb_build_object(
+        'bet', to_jsonb(v_bet),
+        'user', to_jsonb(v_user),
+        'replayed', false
+    );
+END;
+$$;
@@ -0,0 +1,136 @@
+-- 一括予想作成（1トランザクション・1ラウンドトリップ）
+--
+-- ボックス・フォーメーションを展開した買い目をまとめて受け取り、
+-- 馬番の検証、合計金額での残高チェックとコイン減算、予想の一括登録、
+-- コイン取引履歴（1件）の記録を実行する。
+-- 冪等キーは買い目ごとに "<キー>:<連番>" として予想に保存する。
+-- p_odds は買い目と同じ順のオッズ配列（null の買い目は place_bet と同じ決め方）。
+--
+-- 適用: psql "$DATABASE_URL" -f backend/sql/place_bets_batch.sql
+
+DROP FUNCTION IF EXISTS public.place_bets_batch(text, text, text, jsonb, integer, text, text);
+DROP FUNCTION IF EXISTS public.place_bets_batch(text, text, text, jsonb, integer, text, text, jsonb);
+
+CREATE OR REPLACE FUNCTION public.place_bets_batch(
+    p_user_id text,
+    p_race_id text,
+    p_bet_type text,
+    p_tickets jsonb,
+    p_amount integer,
+    p_reason text,
+    p_idempotency_key text DEFAULT NULL,
+    p_odds jsonb DEFAULT NULL,
+    p_odds_version bigint DEFAULT NULL
+) RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_user users%ROWTYPE;
+    v_race_status text;
+    v_betting_end_time timestamptz;
+    v_count integer := jsonb_array_length(p_tickets);
+    v_total bigint := p_amount::bigint * jsonb_array_length(p_tickets);
+    v_keys text[];
+    v_bets jsonb;
+    v_now timestamptz := now();
+BEGIN
+    IF p_idempotency_key IS NOT NULL THEN
+        PERFORM pg_advisory_xact_lock(hashtext(p_user_id || ':' || p_idempotency_key));
+
+        v_keys := ARRAY(
+            SELECT p_idempotency_key || ':' || i FROM generate_series(1, v_count) AS i
+        );
+
+        SELECT jsonb_agg(to_jsonb(b)) INTO v_bets
+        FROM bets b
+        WHERE b.user_id = p_user_id AND b.idempotency_key = ANY(v_keys);
+
+        IF v_bets IS NOT NULL THEN
+            SELECT * INTO v_user FROM users WHERE id = p_user_id;
+            RETURN jsonb_build_object('bets', v_bets, 'user', to_jsonb(v_user), 'replayed', true);
+        END IF;
+    END IF;
+
+    -- レースのステータスチェック
+    SELECT status, betting_end_time INTO v_race_status, v_betting_end_time
+    FROM races WHERE id = p_race_id;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'race_not_found';
+    END IF;
+    -- 受付終了から発走までは status が betting のままのため、時刻でも確認する
+    IF v_race_status <> 'betting' OR v_now >= v_betting_end_time THEN
+        RAISE EXCEPTION 'betting_closed';
+    END IF;
+
+    -- 出走していない馬番を含む買い目がないかチェック
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_tickets) AS t,
+             jsonb_array_elements_text(t.value) AS s(number)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM horses h WHERE h.race_id = p_race_id AND h.number = s.number::integer
+        )
+    ) THEN
+        RAISE EXCEPTION 'invalid_selection';
+    END IF;
+
+    -- コインを減算（合計金額で残高チェック）
+    UPDATE users
+    SET coins = coins - v_total,
+        total_bets = total_bets + v_count,
+        total_spent = total_spent + v_total
+    WHERE id = p_user_id AND coins >= v_total
+    RETURNING * INTO v_user;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'insufficient_coins';
+    END IF;
+
+    -- 予想を一括作成
+    WITH tickets AS (
+        SELECT t.ordinality AS n,
+               ARRAY(SELECT jsonb_array_elements_text(t.value)::integer) AS selections,
+               (p_odds ->> (t.ordinality - 1)::integer)::double precision AS odds
+        FROM jsonb_array_elements(p_tickets) WITH ORDINALITY AS t
+    ),
+    inserted AS (
+        INSERT INTO bets (
+            user_id, race_id, bet_type, selections, amount, odds, odds_version, status,
+            idempotency_key, created_at
+        )
+        SELECT p_user_id, p_race_id, p_bet_type, t.selections, p_amount,
+               CASE
+                   WHEN t.odds IS NOT NULL THEN t.odds
+                   WHEN p_bet_type = 'win' THEN coalesce(h.odds, 1.0)
+                   WHEN p_bet_type = 'place' THEN greatest(1.1, coalesce(h.odds, 1.0) / 3)
+                   ELSE 1.0
+               END,
+               p_odds_version,
+               'pending',
+               CASE WHEN p_idempotency_key IS NULL THEN NULL ELSE p_idempotency_key || ':' || t.n END,
+               v_now
+        FROM tickets t
+        LEFT JOIN horses h
+            ON p_bet_type IN ('win', 'place')
+           AND h.race_id = p_race_id
+           AND h.number = t.selections[1]
+        RETURNING *
+    )
+    SELECT jsonb_agg(to_jsonb(inserted)) INTO v_bets
+    FROM inserted;
+
+    -- コイン取引履歴を記録（一括分を1件として記録）
+    INSERT INTO coin_transactions (
+        user_id, type, amount, balance, reason, metadata, created_at
+    ) VALUES (
+        p_user_id, 'spend', -v_total, v_user.coins, p_reason,
+        jsonb_build_object(
+            'race_id', p_race_id,
+            'bet_ids', (SELECT jsonb_agg(b -> 'id') FROM jsonb_array_elements(v_bets) AS b)
+        ),
+        v_now
+    );
+
+    RETURN jsonb_build_object('bets', v_bets, 'user', to_jsonb(v_user), 'replayed', false);
+END;
+$$;
@@ -0,0 +1,174 @@
+-- 収支の日別集計と期間ランキング
+--
+-- coin_transactions への追加をトリガーで user_daily_profits（ユーザー×日(JST)）に
+-- 集計し、期間ランキングは生の取引履歴を走査せずにこの集計から作る。
+--   収支 = 配当(earn) + 返還(refund) - 賭け金(spend)。ボーナス・購入は含めない。
+--
+-- refresh_rankings() は集計とusersから rankings の各列（総資産・収支・的中率・
+-- 週間/月間収支とそれぞれの順位）を作り直す。定期タスク refresh_rankings から呼ぶ。
+--
+-- created_at は timestamp without time zone（UTC）のため、JSTの日付は
+-- (created_at AT TIME ZONE 'UTC') で timestamptz にしてから 'Asia/Tokyo' に変換して求める。
+--
+-- 適用: psql "$DATABASE_URL" -f backend/sql/profit_rollups.sql
+-- 既存の取引履歴の取り込み: SELECT public.rebuild_daily_profits('2024-01-01');
+
+CREATE TABLE IF NOT EXISTS public.user_daily_profits (
+    user_id text NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    day date NOT NULL,
+    earned bigint NOT NULL DEFAULT 0,
+    spent bigint NOT NULL DEFAULT 0,
+    refunded bigint NOT NULL DEFAULT 0,
+    profit bigint NOT NULL DEFAULT 0,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS user_daily_profits_day_profit_idx
+    ON public.user_daily_profits (day, profit DESC);
+
+-- rankings からユーザー情報を埋め込めるようにする
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'rankings_user_id_fkey'
+    ) THEN
+        ALTER TABLE public.rankings
+            ADD CONSTRAINT rankings_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES public.users(id) ON DELETE CASCADE;
+    END IF;
+END
+$$;
+
+
+-- 取引履歴の集計（ステートメント単位で、精算などの一括追加もまとめて反映する）
+CREATE OR REPLACE FUNCTION public.rollup_coin_transactions()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO user_daily_profits AS p (user_id, day, earned, spent, refunded, profit, updated_at)
+    SELECT user_id,
+           ((created_at AT TIME ZONE 'UTC') AT TIME ZONE 'Asia/Tokyo')::date,
+           coalesce(sum(amount) FILTER (WHERE type = 'earn'), 0),
+           coalesce(sum(-amount) FILTER (WHERE type = 'spend'), 0),
+           coalesce(sum(amount) FILTER (WHERE type = 'refund'), 0),
+           coalesce(sum(amount) FILTER (WHERE type IN ('earn', 'spend', 'refund')), 0),
+           now()
+    FROM new_rows
+    WHERE type IN ('earn', 'spend', 'refund')
+    GROUP BY 1, 2
+    ON CONFLICT (user_id, day) DO UPDATE
+    SET earned = p.earned + excluded.earned,
+        spent = p.spent + excluded.spent,
+        refunded = p.refunded + excluded.refunded,
+        profit = p.profit + excluded.profit,
+        updated_at = excluded.updated_at;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS coin_transactions_rollup ON public.coin_transactions;
+CREATE TRIGGER coin_transactions_rollup
+    AFTER INSERT ON public.coin_transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.rollup_coin_transactions();
+
+
+-- 指定日以降の日別集計を取引履歴から作り直す（導入時・不整合時のみ）
+CREATE OR REPLACE FUNCTION public.rebuild_daily_profits(p_from date)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows integer;
+BEGIN
+    DELETE FROM user_daily_profits WHERE day >= p_from;
+
+    INSERT INTO user_daily_profits (user_id, day, earned, spent, refunded, profit, updated_at)
+    SELECT user_id,
+           ((created_at AT TIME ZONE 'UTC') AT TIME ZONE 'Asia/Tokyo')::date,
+           coalesce(sum(amount) FILTER (WHERE type = 'earn'), 0),
+           coalesce(sum(-amount) FILTER (WHERE type = 'spend'), 0),
+           coalesce(sum(amount) FILTER (WHERE type = 'refund'), 0),
+           sum(amount),
+           now()
+    FROM coin_transactions
+    WHERE type IN ('earn', 'spend', 'refund')
+      AND created_at >= ((p_from::timestamp AT TIME ZONE 'Asia/Tokyo') AT TIME ZONE 'UTC')
+    GROUP BY 1, 2;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+
+-- rankings を作り直す（週は月曜始まり、いずれもJST）
+CREATE OR REPLACE FUNCTION public.refresh_rankings(p_win_rate_min_bets integer DEFAULT 10)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_today date := (now() AT TIME ZONE 'Asia/Tokyo')::date;
+    v_week_start date := date_trunc('week', v_today)::date;
+    v_month_start date := date_trunc('month', v_today)::date;
+    v_rows integer;
+BEGIN
+    WITH periods AS (
+        SELECT user_id,
+               coalesce(sum(profit) FILTER (WHERE day >= v_week_start), 0) AS weekly_profit,
+               coalesce(sum(profit) FILTER (WHERE day >= v_month_start), 0) AS monthly_profit
+        FROM user_daily_profits
+        WHERE day >= least(v_week_start, v_month_start)
+        GROUP BY user_id
+    ),
+    stats AS (
+        SELECT u.id AS user_id,
+               u.coins AS total_assets,
+               coalesce(u.total_earnings, 0) - coalesce(u.total_spent, 0) AS net_profit,
+               coalesce(u.win_rate, 0) AS win_rate,
+               coalesce(u.total_bets, 0) >= p_win_rate_min_bets AS win_rate_eligible,
+               coalesce(p.weekly_profit, 0) AS weekly_profit,
+               coalesce(p.monthly_profit, 0) AS monthly_profit
+        FROM users u
+        LEFT JOIN periods p ON p.user_id = u.id
+    ),
+    ranked AS (
+        SELECT s.*,
+               rank() OVER (ORDER BY total_assets DESC) AS total_assets_rank,
+               rank() OVER (ORDER BY net_profit DESC) AS net_profit_rank,
+               CASE WHEN win_rate_eligible
+                    THEN rank() OVER (PARTITION BY win_rate_eligible ORDER BY win_rate DESC)
+               END AS win_rate_rank,
+               rank() OVER (ORDER BY weekly_profit DESC) AS weekly_rank,
+               rank() OVER (ORDER BY monthly_profit DESC) AS monthly_rank
+        FROM stats s
+    )
+    INSERT INTO rankings AS r (
+        id, user_id, total_assets, net_profit, win_rate, weekly_profit, monthly_profit,
+        total_assets_rank, net_profit_rank, win_rate_rank, weekly_rank, monthly_rank, updated_at
+    )
+    SELECT gen_random_uuid()::text, user_id, total_assets, net_profit, win_rate,
+           weekly_profit, monthly_profit,
+           total_assets_rank, net_profit_rank, win_rate_rank, weekly_rank, monthly_rank, now()
+    FROM ranked
+    ON CONFLICT (user_id) DO UPDATE
+    SET total_assets = excluded.total_assets,
+        net_profit = excluded.net_profit,
+        win_rate = excluded.win_rate,
+        weekly_profit = excluded.weekly_profit,
+        monthly_profit = excluded.monthly_profit,
+        total_assets_rank = excluded.total_assets_rank,
+        net_profit_rank = excluded.net_profit_rank,
+        win_rate_rank = excluded.win_rate_rank,
+        weekly_rank = excluded.weekly_rank,
+        monthly_rank = excluded.monthly_rank,
+        updated_at = excluded.updated_at;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
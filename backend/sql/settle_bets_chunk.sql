@@ -0,0 +1,122 @@
+-- 予想精算（チャンク単位の読み込みと一括更新）
+--
+-- pending_bet_columns: レースの未確定予想を id 順に1チャンク分、列ごとの配列で返す。
+-- 行ごとのオブジェクトにしないため、精算エンジンは JSON の解析と配列への変換を列単位で行える。
+-- 選択馬番は1行3列（不足分は -1）に詰めて平坦にした配列。
+--
+-- settle_bets_chunk: 精算エンジン（app/services/settlement.py）が計算した結果を受け取り、
+-- 1ステートメントで以下をまとめて実行する。
+--   1. 未確定の予想のステータス・配当を更新
+--   2. ユーザーごとに配当・返還額を集計して残高と成績を更新
+--      （返還額は total_spent からも差し引き、中止レースを損失として数えない）
+--   3. 配当・返還のあった予想ごとにコイン取引履歴を記録
+-- 確定済みの予想は更新しないため、同じチャンクを再実行しても二重に払い戻さない。
+--
+-- 適用: psql "$DATABASE_URL" -f backend/sql/settle_bets_chunk.sql
+
+CREATE OR REPLACE FUNCTION public.pending_bet_columns(
+    p_race_id text,
+    p_after_id text,
+    p_limit integer
+) RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    WITH chunk AS (
+        SELECT id, bet_type, selections, amount, odds
+        FROM bets
+        WHERE race_id = p_race_id
+          AND status = 'pending'
+          AND id > p_after_id
+        ORDER BY id
+        LIMIT p_limit
+    )
+    SELECT jsonb_build_object(
+        'ids', coalesce((SELECT jsonb_agg(id ORDER BY id) FROM chunk), '[]'::jsonb),
+        'bet_types', coalesce((SELECT jsonb_agg(bet_type ORDER BY id) FROM chunk), '[]'::jsonb),
+        'selections', coalesce((
+            SELECT jsonb_agg(coalesce(c.selections[k], -1) ORDER BY c.id, k)
+            FROM chunk c, generate_series(1, 3) AS k
+        ), '[]'::jsonb),
+        'amounts', coalesce((SELECT jsonb_agg(amount ORDER BY id) FROM chunk), '[]'::jsonb),
+        'odds', coalesce((SELECT jsonb_agg(odds ORDER BY id) FROM chunk), '[]'::jsonb)
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION public.settle_bets_chunk(
+    p_race_id text,
+    p_bet_ids text[],
+    p_statuses text[],
+    p_payouts bigint[]
+) RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_result jsonb;
+    v_now timestamptz := now();
+BEGIN
+    WITH input AS (
+        SELECT *
+        FROM unnest(p_bet_ids, p_statuses, p_payouts) AS i(id, status, payout)
+    ),
+    settled AS (
+        UPDATE bets b
+        SET status = i.status,
+            payout = i.payout,
+            settled_at = v_now
+        FROM input i
+        WHERE b.id = i.id
+          AND b.race_id = p_race_id
+          AND b.status = 'pending'
+        RETURNING b.id, b.user_id, b.bet_type, b.status, b.payout
+    ),
+    credits AS (
+        SELECT user_id,
+               coalesce(sum(payout) FILTER (WHERE status = 'won'), 0) AS earned,
+               coalesce(sum(payout) FILTER (WHERE status = 'refunded'), 0) AS refunded,
+               count(*) FILTER (WHERE status = 'won') AS wins
+        FROM settled
+        GROUP BY user_id
+    ),
+    updated_users AS (
+        UPDATE users u
+        SET coins = u.coins + c.earned + c.refunded,
+            total_earnings = u.total_earnings + c.earned,
+            total_spent = u.total_spent - c.refunded,
+            total_wins = u.total_wins + c.wins,
+            win_rate = CASE
+                WHEN u.total_bets > 0 THEN (u.total_wins + c.wins)::double precision / u.total_bets
+                ELSE 0
+            END
+        FROM credits c
+        WHERE u.id = c.user_id
+        RETURNING u.id, u.coins
+    ),
+    ledger AS (
+        INSERT INTO coin_transactions (
+            user_id, type, amount, balance, reason, metadata, created_at
+        )
+        SELECT s.user_id,
+               CASE WHEN s.status = 'won' THEN 'earn' ELSE 'refund' END,
+               s.payout,
+               -- 同じユーザーの後続の払い戻しを差し引いて各時点の残高を求める
+               uu.coins - coalesce(sum(s.payout) OVER (
+                   PARTITION BY s.user_id ORDER BY s.id
+                   ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+               ), 0),
+               CASE WHEN s.status = 'won' THEN '予想的中' ELSE '予想返還（レース中止）' END,
+               jsonb_build_object('race_id', p_race_id, 'bet_id', s.id, 'bet_type', s.bet_type),
+               v_now
+        FROM settled s
+        JOIN updated_users uu ON uu.id = s.user_id
+        WHERE s.payout > 0
+        RETURNING 1
+    )
+    SELECT jsonb_build_object(
+        'settled', (SELECT count(*) FROM settled),
+        'user_ids', (SELECT coalesce(jsonb_agg(id), '[]'::jsonb) FROM updated_users)
+    ) INTO v_result;
+
+    RETURN v_result;
+END;
+$$;
@@ -0,0 +1,94 @@
+-- 出馬表の保存（1レース1ラウンドトリップ）
+--
+-- スクレイピングしたレースと出走馬を (date, venue, race_number)・(race_id, number) の
+-- 一意制約で追加・更新する。内容が変わらない行は書き込まない（updated_at も変えない）。
+-- status は更新しない（新規は既定値の upcoming）。
+--
+-- p_race: races の列（id・status 以外）
+-- p_horses: horses の列（race_id 以外）の配列。変更のあった馬だけを渡せばよい
+--
+-- 戻り値: {"race_id", "race_written": 0|1, "horses_written": 件数}
+--
+-- 適用: psql "$DATABASE_URL" -f backend/sql/upsert_race_card.sql
+
+CREATE OR REPLACE FUNCTION public.upsert_race_card(
+    p_race jsonb,
+    p_horses jsonb DEFAULT '[]'::jsonb
+) RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_race_id text;
+    v_race_written integer := 0;
+    v_horses_written integer := 0;
+BEGIN
+    INSERT INTO races AS r (
+        id, date, venue, race_number, race_name, grade, distance, surface, condition, weather,
+        start_time, betting_start_time, betting_end_time, updated_at
+    )
+    SELECT gen_random_uuid()::text, n.date, n.venue, n.race_number, n.race_name, n.grade,
+           n.distance, n.surface, n.condition, n.weather,
+           n.start_time, n.betting_start_time, n.betting_end_time, now()
+    FROM jsonb_populate_record(NULL::races, p_race) n
+    ON CONFLICT (date, venue, race_number) DO UPDATE
+    SET race_name = excluded.race_name,
+        grade = excluded.grade,
+        distance = excluded.distance,
+        surface = excluded.surface,
+        condition = excluded.condition,
+        weather = excluded.weather,
+        start_time = excluded.start_time,
+        betting_start_time = excluded.betting_start_time,
+        betting_end_time = excluded.betting_end_time,
+        updated_at = excluded.updated_at
+    WHERE (r.race_name, r.grade, r.distance, r.surface, r.condition, r.weather,
+           r.start_time, r.betting_start_time, r.betting_end_time)
+          IS DISTINCT FROM
+          (excluded.race_name, excluded.grade, excluded.distance, excluded.surface,
+           excluded.condition, excluded.weather,
+           excluded.start_time, excluded.betting_start_time, excluded.betting_end_time)
+    RETURNING id INTO v_race_id;
+
+    IF v_race_id IS NULL THEN
+        -- 変更がなく更新しなかった場合
+        SELECT r.id INTO v_race_id
+        FROM races r, jsonb_populate_record(NULL::races, p_race) n
+        WHERE r.date = n.date AND r.venue = n.venue AND r.race_number = n.race_number;
+    ELSE
+        v_race_written := 1;
+    END IF;
+
+    INSERT INTO horses AS h (
+        id, race_id, number, name, jockey, trainer, weight, odds, popularity, age, sex,
+        previous_results, updated_at
+    )
+    SELECT gen_random_uuid()::text, v_race_id, n.number, n.name, n.jockey,
+           coalesce(n.trainer, ''), coalesce(n.weight, 0), n.odds, n.popularity,
+           coalesce(n.age, 0), coalesce(n.sex, ''), coalesce(n.previous_results, '{}'), now()
+    FROM jsonb_populate_recordset(NULL::horses, p_horses) n
+    ON CONFLICT (race_id, number) DO UPDATE
+    SET name = excluded.name,
+        jockey = excluded.jockey,
+        trainer = excluded.trainer,
+        weight = excluded.weight,
+        odds = excluded.odds,
+        popularity = excluded.popularity,
+        age = excluded.age,
+        sex = excluded.sex,
+        previous_results = excluded.previous_results,
+        updated_at = excluded.updated_at
+    WHERE (h.name, h.jockey, h.trainer, h.weight, h.odds, h.popularity, h.age, h.sex,
+           h.previous_results)
+          IS DISTINCT FROM
+          (excluded.name, excluded.jockey, excluded.trainer, excluded.weight, excluded.odds,
+           excluded.popularity, excluded.age, excluded.sex, excluded.previous_results);
+
+    GET DIAGNOSTICS v_horses_written = ROW_COUNT;
+
+    RETURN jsonb_build_object(
+        'race_id', v_race_id,
+        'race_written', v_race_written,
+        'horses_written', v_horses_written
+    );
+END;
+$$;
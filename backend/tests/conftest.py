@@ -0,0 +1,11 @@
+"""テスト共通の設定
+
+外部のサービス（Supabase・Redis）に接続しないよう、設定を読み込む前に環境変数を決める。
+"""
+
+import os
+
+os.environ.setdefault("DATA_BACKEND", "memory")
+os.environ.setdefault("REDIS_URL", "")
+os.environ.setdefault("CELERY_BROKER_URL", "")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret")
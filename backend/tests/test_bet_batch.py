@@ -0,0 +1,62 @@
+"""一括予想の買い目の展開（app/api/bets.py、app/services/bet_combinations.py）"""
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.api import bets
+from app.api.bets import expand_tickets
+from app.models.bet import BetBatchCreate, BetCreate
+from app.services.bet_combinations import count_box, expand_box
+
+ALL_HORSES = list(range(1, 19))
+
+
+def batch(bet_type: str, **kwargs) -> BetBatchCreate:
+    return BetBatchCreate(race_id="race-1", bet_type=bet_type, amount=100, **kwargs)
+
+
+@pytest.mark.parametrize("horses, size, ordered", [
+    ([1, 2, 3, 4, 5, 6], 3, True),
+    ([1, 2, 3, 4, 5, 6], 3, False),
+    ([1, 2, 2, 3], 2, True),
+    (ALL_HORSES, 2, False),
+])
+def test_count_box_matches_expansion(horses, size, ordered):
+    assert count_box(horses, size, ordered) == len(expand_box(horses, size, ordered))
+
+
+@pytest.mark.parametrize("fields", [
+    {"box": [0, 1, 2]},
+    {"box": [1, 2, 19]},
+    {"box": list(range(1, 301))},
+    {"tickets": [[1, 2, 3, 4]]},
+    {"formation": [[1], [2], [3], [4]]},
+    {"formation": [list(range(1, 20)), [1], [2]]},
+], ids=["zero", "over_18", "box_too_long", "ticket_too_long", "too_many_positions", "position_too_long"])
+def test_out_of_range_batch_is_rejected_by_model(fields):
+    with pytest.raises(ValidationError):
+        batch("trifecta", **fields)
+
+
+def test_selection_out_of_range_is_rejected_by_model():
+    with pytest.raises(ValidationError):
+        BetCreate(race_id="race-1", bet_type="win", selections=[19], amount=100)
+
+
+def test_oversized_box_is_rejected_before_expanding(monkeypatch):
+    def expand(*args):
+        raise AssertionError("expanded")
+
+    monkeypatch.setattr(bets, "expand_box", expand)
+    # 18頭の3連単ボックスは 18P3 = 4896点
+    with pytest.raises(HTTPException) as error:
+        expand_tickets(batch("trifecta", box=ALL_HORSES))
+    assert error.value.status_code == 400
+    assert "Maximum" in error.value.detail
+
+
+def test_full_formation_counts_distinct_tickets():
+    # 組み合わせの積（18^3）ではなく、展開後の点数（18C3 = 816点）で判定する
+    tickets = expand_tickets(batch("trio", formation=[ALL_HORSES] * 3))
+    assert len(tickets) == 816
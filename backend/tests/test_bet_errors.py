@@ -0,0 +1,56 @@
+"""place_bet 系 RPC のエラーの扱い（app/repositories/supabase.py の SupabaseBets._rpc）"""
+
+import pytest
+from postgrest import APIError
+
+from app.repositories import RepositoryError
+from app.repositories.memory import memory_repositories
+from app.repositories.supabase import SupabaseBets
+
+
+class FailingRPC:
+    def __init__(self, error: dict):
+        self.error = error
+
+    async def execute(self):
+        raise APIError(self.error)
+
+
+class FailingClient:
+    def __init__(self, error: dict):
+        self.error = error
+
+    def rpc(self, fn: str, params: dict) -> FailingRPC:
+        return FailingRPC(self.error)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("code", ["race_not_found", "betting_closed", "insufficient_coins", "invalid_selection"])
+async def test_business_errors_become_repository_errors(code):
+    bets = SupabaseBets(FailingClient({"code": "P0001", "message": code}))
+    with pytest.raises(RepositoryError) as error:
+        await bets.place({})
+    assert error.value.message == code
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    {"code": "P0001", "message": "unexpected raise"},
+    {"code": "23505", "message": "duplicate key value violates unique constraint"},
+    {"code": "PGRST202", "message": "Could not find the function public.place_bet"},
+])
+async def test_other_errors_are_reraised(error):
+    bets = SupabaseBets(FailingClient(error))
+    with pytest.raises(APIError):
+        await bets.place({})
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_raises_business_errors():
+    repos = memory_repositories()
+    with pytest.raises(RepositoryError) as error:
+        await repos.bets.place({
+            "p_user_id": "user-1", "p_race_id": "missing", "p_bet_type": "win",
+            "p_selections": [1], "p_amount": 100, "p_reason": "test",
+        })
+    assert error.value.message == "race_not_found"
@@ -0,0 +1,131 @@
+"""ボーナスの受け取り制限（app/services/bonus_limits.py）と加算（credit_coins）"""
+
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+from redis.exceptions import RedisError
+
+from app.repositories.memory import MemoryClient, memory_repositories
+from app.services import bonus_limits as module
+from app.services.bonus_limits import EXPIRY_GRACE_SECONDS, BonusLimits
+from app.services.clock import JST, jst_day_start
+
+# 失効時刻が過去にならないよう将来の日付で固定する
+LATE_NIGHT = datetime(2030, 3, 1, 23, 59, 30, tzinfo=JST)
+NEXT_MIDNIGHT = int(datetime(2030, 3, 2, tzinfo=JST).timestamp())
+
+
+class FailingRedis:
+    def pipeline(self, *args, **kwargs):
+        raise RedisError("connection refused")
+
+    async def get(self, *args):
+        raise RedisError("connection refused")
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = {"now": LATE_NIGHT}
+    monkeypatch.setattr(module, "jst_now", lambda: clock["now"])
+    return clock
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.mark.asyncio
+async def test_login_is_claimed_once_per_jst_day(redis, now):
+    limits = BonusLimits()
+    assert await limits.claim_login(redis, "u1") is True
+    assert await limits.claim_login(redis, "u1") is False
+    assert await limits.claim_login(redis, "u2") is True
+
+    # キーは翌日0時（JST）に失効する
+    key = "bonus:login:u1:2030-03-01"
+    assert await redis.expiretime(key) == NEXT_MIDNIGHT + EXPIRY_GRACE_SECONDS
+
+    # 日付が変わると別のキーになる
+    now["now"] = LATE_NIGHT + timedelta(minutes=1)
+    assert await limits.claim_login(redis, "u1") is True
+
+
+@pytest.mark.asyncio
+async def test_release_login_allows_retry(redis, now):
+    limits = BonusLimits()
+    assert await limits.claim_login(redis, "u1") is True
+    await limits.release_login(redis, "u1")
+    assert await limits.claim_login(redis, "u1") is True
+
+
+@pytest.mark.asyncio
+async def test_ad_counter_expires_at_next_jst_midnight(redis, now):
+    limits = BonusLimits()
+    assert [await limits.claim_ad(redis, "u1") for _ in range(3)] == [1, 2, 3]
+    await limits.release_ad(redis, "u1")
+    assert await limits.claim_ad(redis, "u1") == 3
+
+    key = "bonus:ad:u1:2030-03-01"
+    assert await redis.expiretime(key) == NEXT_MIDNIGHT + EXPIRY_GRACE_SECONDS
+
+    now["now"] = LATE_NIGHT + timedelta(minutes=1)
+    assert await limits.claim_ad(redis, "u1") == 1
+
+
+@pytest.mark.asyncio
+async def test_ad_replay_by_idempotency_key(redis, now):
+    limits = BonusLimits()
+    response = {"coins_earned": 50, "views_today": 1}
+
+    assert await limits.replay_ad(redis, "u1", "key-1") is None
+    await limits.remember_ad(redis, "u1", "key-1", response)
+    assert await limits.replay_ad(redis, "u1", "key-1") == response
+    assert await limits.replay_ad(redis, "u1", "key-2") is None
+    assert await limits.replay_ad(redis, "u1", None) is None
+
+    key = "bonus:ad-claim:u1:2030-03-01:key-1"
+    assert await redis.expiretime(key) == NEXT_MIDNIGHT + EXPIRY_GRACE_SECONDS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("redis", [None, FailingRedis()])
+async def test_without_redis_returns_none(redis, now):
+    limits = BonusLimits()
+    assert await limits.claim_login(redis, "u1") is None
+    assert await limits.claim_ad(redis, "u1") is None
+    assert await limits.replay_ad(redis, "u1", "key-1") is None
+
+
+@pytest.mark.asyncio
+async def test_login_credit_is_granted_once_per_jst_day():
+    client = MemoryClient()
+    client.tables["users"] = [{"id": "u1", "coins": 100, "last_login_at": "2030-03-01T03:00:00"}]
+    users = memory_repositories(client).users
+
+    # 2030-03-01 12:00 JST 以降にログイン済みなので、同じ日の受け取りは断る
+    login_at = LATE_NIGHT
+    day_start = jst_day_start(login_at)
+    assert await users.credit("u1", 50, login_at=login_at, consecutive_login_days=2, login_day_start=day_start) is None
+
+    # 翌日は加算して最終ログイン日時と連続日数を更新する
+    login_at = LATE_NIGHT + timedelta(minutes=1)
+    user = await users.credit(
+        "u1", 50, login_at=login_at, consecutive_login_days=2, login_day_start=jst_day_start(login_at)
+    )
+    assert user["coins"] == 150
+    assert user["consecutive_login_days"] == 2
+    assert client.tables["users"][0]["coins"] == 150
+
+
+@pytest.mark.asyncio
+async def test_credit_adds_to_current_balance():
+    client = MemoryClient()
+    client.tables["users"] = [{"id": "u1", "coins": 100}]
+    users = memory_repositories(client).users
+
+    # 読み出した残高ではなく、その時点の残高に加算する
+    client.tables["users"][0]["coins"] = 40
+    assert (await users.credit("u1", 50))["coins"] == 90
+    assert await users.credit("missing", 50) is None
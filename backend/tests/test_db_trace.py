@@ -0,0 +1,62 @@
+"""DB呼び出しのトレース（app/services/db_trace.py）"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.repositories.memory import MemoryClient, memory_repositories
+from app.services.db_trace import DBTraceMiddleware, trace, trace_http
+
+
+@pytest.mark.asyncio
+async def test_http_requests_are_recorded_per_round_trip():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=[]))
+    async with httpx.AsyncClient(base_url="http://db.test/rest/v1", transport=transport) as session:
+        trace_http(session)
+        with trace() as db_trace:
+            await session.get("/users", params={"id": "eq.1"})
+            await session.post("/rpc/place_bet", json={})
+            await session.patch("/users", json={})
+        # トレースの外の呼び出しは記録しない
+        await session.get("/users")
+
+    assert [span.shape for span in db_trace.spans] == ["users.select", "rpc.place_bet", "users.update"]
+
+
+@pytest.mark.asyncio
+async def test_repository_method_with_two_queries_records_two_spans():
+    client = MemoryClient()
+    client.tables["user_daily_profits"] = [
+        {"user_id": "a", "day": "2025-01-05", "profit": 300},
+        {"user_id": "b", "day": "2025-01-05", "profit": 100},
+    ]
+    repos = memory_repositories(client)
+
+    with trace() as db_trace:
+        assert await repos.rankings.daily_position("b", "2025-01-05") == (100, 2)
+
+    assert [span.shape for span in db_trace.spans] == ["user_daily_profits.select", "user_daily_profits.count"]
+
+
+def traced_app(server_timing: bool) -> FastAPI:
+    app = FastAPI()
+    repos = memory_repositories()
+
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: str):
+        return await repos.users.get(user_id)
+
+    app.add_middleware(DBTraceMiddleware, budget=5, repeat_limit=1, server_timing=server_timing)
+    return app
+
+
+def test_server_timing_header_is_off_by_default():
+    response = TestClient(traced_app(server_timing=False)).get("/users/u1")
+    assert "server-timing" not in response.headers
+
+
+def test_server_timing_header_when_enabled():
+    response = TestClient(traced_app(server_timing=True)).get("/users/u1")
+    assert response.headers["server-timing"].startswith('users.select;dur=')
+    assert 'db;dur=' in response.headers["server-timing"]
@@ -0,0 +1,156 @@
+"""取引記録の write-behind（app/services/ledger.py）"""
+
+import asyncio
+import json
+
+import fakeredis
+import pytest
+from redis.exceptions import RedisError
+
+from app.repositories.memory import MemoryClient, memory_repositories
+from app.services.ledger import DEAD_LETTER_KEY, GROUP, STREAM_KEY, LedgerFlusher, LedgerWriter
+
+
+class SyncMemoryClient:
+    """ワーカー用の同期クライアント（MemoryClient の execute() をその場で実行する）"""
+
+    def __init__(self):
+        self.client = MemoryClient()
+        self.upserts = []
+
+    def table(self, name: str):
+        sync = self
+
+        class Query:
+            def upsert(self, rows, **kwargs):
+                sync.upserts.append((name, rows, kwargs))
+                self.query = sync.client.table(name).upsert(rows, **kwargs)
+                return self
+
+            def execute(self):
+                return asyncio.run(self.query.execute())
+
+        return Query()
+
+    def rows(self, table: str):
+        return self.client.tables.get(table, [])
+
+
+class FailingRedis:
+    async def xadd(self, *args, **kwargs):
+        raise RedisError("connection refused")
+
+
+def enqueue(redis, record: dict, table: str = "coin_transactions") -> str:
+    return redis.xadd(STREAM_KEY, {"table": table, "record": json.dumps(record)})
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def supabase():
+    return SyncMemoryClient()
+
+
+def flusher(redis, supabase, **kwargs) -> LedgerFlusher:
+    options = {"batch_size": 10, "flush_interval": 0.01, "claim_idle": 0, "max_deliveries": 2, "consumer": "test"}
+    return LedgerFlusher(redis, supabase, **{**options, **kwargs})
+
+
+def test_write_groups_by_table_and_collapses_duplicates(redis, supabase):
+    enqueue(redis, {"dedup_id": "a", "user_id": "u1", "amount": 10})
+    enqueue(redis, {"dedup_id": "a", "user_id": "u1", "amount": 10})
+    enqueue(redis, {"dedup_id": "b", "user_id": "u2", "amount": 20})
+    enqueue(redis, {"dedup_id": "v", "user_id": "u1"}, table="advertisement_views")
+
+    assert flusher(redis, supabase).drain() == 4
+
+    # テーブルごとに1回、dedup_id の重複は1行にまとめる
+    assert [(table, [row["dedup_id"] for row in rows]) for table, rows, _ in supabase.upserts] == [
+        ("coin_transactions", ["a", "b"]),
+        ("advertisement_views", ["v"]),
+    ]
+    assert all(kwargs == {"on_conflict": "dedup_id", "ignore_duplicates": True} for _, _, kwargs in supabase.upserts)
+    assert [row["dedup_id"] for row in supabase.rows("coin_transactions")] == ["a", "b"]
+
+    # 書き込んだ記録は ACK してストリームから消える
+    assert redis.xlen(STREAM_KEY) == 0
+    assert redis.xpending(STREAM_KEY, GROUP)["pending"] == 0
+
+
+def test_redelivered_entry_is_ignored_by_dedup_id(redis, supabase):
+    enqueue(redis, {"dedup_id": "a", "user_id": "u1", "amount": 10})
+    flusher(redis, supabase).drain()
+
+    # 書き込み後・ACK前に落ちた場合と同じく、同じ記録がもう一度届く
+    enqueue(redis, {"dedup_id": "a", "user_id": "u1", "amount": 10})
+    flusher(redis, supabase).drain()
+
+    assert len(supabase.rows("coin_transactions")) == 1
+
+
+def test_unacked_entries_are_reclaimed(redis, supabase):
+    enqueue(redis, {"dedup_id": "a", "user_id": "u1", "amount": 10})
+    worker = flusher(redis, supabase, consumer="crashed")
+    assert len(worker.read(10)) == 1  # 読み出したまま書き込まずに停止
+
+    assert flusher(redis, supabase).drain() == 1
+    assert [row["dedup_id"] for row in supabase.rows("coin_transactions")] == ["a"]
+    assert redis.xlen(STREAM_KEY) == 0
+
+
+def test_failing_entry_does_not_block_others_and_is_dead_lettered(redis, supabase):
+    enqueue(redis, {"dedup_id": "a", "user_id": "u1", "amount": 10})
+    enqueue(redis, {"user_id": "u2", "amount": 20})  # dedup_id がなく書き込めない
+    enqueue(redis, {"dedup_id": "c", "user_id": "u3", "amount": 30})
+
+    worker = flusher(redis, supabase)
+    with pytest.raises(KeyError):
+        worker.write(worker.read(10))
+    assert supabase.rows("coin_transactions") == []
+
+    # 引き取った記録は1件ずつ書き込み、失敗した記録だけ未ACKのまま残る
+    assert worker.drain() == 2
+    assert {row["dedup_id"] for row in supabase.rows("coin_transactions")} == {"a", "c"}
+    assert redis.xpending(STREAM_KEY, GROUP)["pending"] == 1
+
+    # 配信回数が max_deliveries を超えるとデッドレターに移る
+    assert worker.drain() == 0
+    assert redis.xlen(DEAD_LETTER_KEY) == 1
+    assert redis.xlen(STREAM_KEY) == 0
+    _, fields = redis.xrange(DEAD_LETTER_KEY)[0]
+    assert json.loads(fields["record"]) == {"user_id": "u2", "amount": 20}
+    assert fields["deliveries"] == "3"
+
+
+@pytest.mark.asyncio
+async def test_writer_enqueues_with_dedup_id():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    repos = memory_repositories()
+
+    await LedgerWriter().record(redis, repos, {"user_id": "u1", "amount": 10})
+
+    [(_, fields)] = await redis.xrange(STREAM_KEY)
+    assert fields["table"] == "coin_transactions"
+    assert json.loads(fields["record"])["dedup_id"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("redis", [None, FailingRedis()])
+async def test_writer_falls_back_to_direct_insert(redis):
+    client = MemoryClient()
+    repos = memory_repositories(client)
+
+    await LedgerWriter().record(redis, repos, {"user_id": "u1", "amount": 10}, table="advertisement_views")
+
+    [row] = client.tables["advertisement_views"]
+    assert row["user_id"] == "u1" and row["dedup_id"]
+
+
+@pytest.mark.asyncio
+async def test_writer_rejects_unknown_table():
+    with pytest.raises(ValueError):
+        await LedgerWriter().record(None, memory_repositories(), {}, table="users")
@@ -0,0 +1,41 @@
+"""Prometheus メトリクス（app/services/metrics.py）"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+
+settings = get_settings()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_metrics_hidden_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_requires_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_request_duration_uses_route_template(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    client.get("/api/races/race-123")
+    client.get("/no/such/path")
+
+    body = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).text
+    assert 'route="/api/races/{race_id}"' in body
+    assert 'route="<unmatched>"' in body
+    assert "race-123" not in body
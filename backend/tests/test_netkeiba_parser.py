@@ -0,0 +1,69 @@
+"""netkeiba のページ解析（app/scrapers/netkeiba.py）"""
+
+from datetime import date
+
+import pytest
+
+from app.scrapers.netkeiba import ParseError, parse_race_card, parse_race_list
+from benchmarks.bench_scraper import race_card_page, race_list_page
+
+DAY = date(2025, 1, 5)
+
+
+def test_race_list_keeps_page_order_without_duplicates():
+    ids = ["202505010111", "202505010101", "202506010112"]
+    html = race_list_page(ids + ids[:1])
+    html = html.replace("</ul>", '<li class="RaceList_DataItem"><a href="../race/movie.html">動画</a></li></ul>')
+    assert parse_race_list(html) == ids
+
+
+def test_race_card_fields():
+    race = parse_race_card(race_card_page("202505010111", runners=3), "202505010111", DAY)
+
+    assert {key: value for key, value in race.items() if key != "horses"} == {
+        "date": "2025-01-05",
+        "venue": "東京",
+        "race_number": 11,
+        "race_name": "テスト11R",
+        "grade": "G3",
+        "distance": 2300,
+        "surface": "turf",
+        "condition": "良",
+        "weather": "晴",
+        # 14:30発走（JST）を UTC のオフセットなしで保存する
+        "start_time": "2025-01-05T05:30:00",
+        "betting_start_time": "2025-01-05T05:00:00",
+        "betting_end_time": "2025-01-05T05:25:00",
+    }
+
+    first = race["horses"][0]
+    assert (first["number"], first["name"], first["jockey"], first["trainer"]) == (1, "ホース011101", "騎手1", "調教師1")
+    assert (first["sex"], first["age"], first["weight"]) == ("female", 4, 55.0)
+    assert (first["odds"], first["popularity"]) == (3.8, 1)
+    assert [horse["number"] for horse in race["horses"]] == [1, 2, 3]
+
+
+def test_race_card_without_grade_or_odds():
+    html = race_card_page("202508010103", runners=2).replace("3.8", "---.-").replace('id="ninki-1_01">1', 'id="ninki-1_01">**')
+    race = parse_race_card(html, "202508010103", DAY)
+
+    assert race["grade"] is None
+    assert race["venue"] == "京都"
+    # オッズ発表前は 0
+    assert (race["horses"][0]["odds"], race["horses"][0]["popularity"]) == (0.0, 0)
+    assert race["horses"][1]["odds"] == 6.1
+
+
+def test_dirt_course():
+    html = race_card_page("202505010101").replace("芝1300m", "ダ1300m")
+    assert parse_race_card(html, "202505010101", DAY)["surface"] == "dirt"
+
+
+@pytest.mark.parametrize("race_id, html", [
+    ("202599010101", race_card_page("202505010101")),
+    ("202505010101", race_card_page("202505010101").replace("発走", "")),
+    ("202505010101", race_card_page("202505010101", runners=0)),
+], ids=["unknown_venue", "no_start_time", "no_horses"])
+def test_unexpected_layout_is_parse_error(race_id, html):
+    with pytest.raises(ParseError):
+        parse_race_card(html, race_id, DAY)
@@ -0,0 +1,115 @@
+"""オッズエンジン（app/services/odds_engine.py）"""
+
+import fakeredis
+import numpy as np
+import pytest
+
+from app.services.odds_engine import (
+    RacePools,
+    compute_odds,
+    harville_probabilities,
+    odds_to_fields,
+    MAX_MODEL_ODDS,
+    record_stakes,
+)
+
+
+def upper(values: np.ndarray, dims: int) -> np.ndarray:
+    """順不同の券種の有効な買い目（昇順の組み合わせ）"""
+    n = values.shape[0]
+    idx = np.indices((n,) * dims)
+    mask = np.ones(values.shape, dtype=bool)
+    for a in range(dims - 1):
+        mask &= idx[a] < idx[a + 1]
+    return values[mask]
+
+
+def test_harville_known_values():
+    model = harville_probabilities(np.array([0.5, 0.3, 0.2]))
+    # 1着1番・2着2番: 0.5 × 0.3 / (1 - 0.5)
+    assert model["trifecta"][0, 1, 2] == pytest.approx(0.3)
+    assert model["exacta"][0, 1] == pytest.approx(0.3 + 0.3 * 0.5 / 0.7)
+    # 3頭立てでは3連複・ワイド・複勝は必ず的中
+    assert model["trio"][0, 1, 2] == pytest.approx(1.0)
+    np.testing.assert_allclose(model["place"], 1.0)
+
+
+def test_harville_probabilities_sum_to_one():
+    rng = np.random.default_rng(0)
+    p = rng.random(8)
+    model = harville_probabilities(p / p.sum())
+
+    assert model["trifecta"].sum() == pytest.approx(1.0)
+    assert upper(model["exacta"], 2).sum() == pytest.approx(1.0)
+    assert upper(model["trio"], 3).sum() == pytest.approx(1.0)
+    # 複勝は3頭、ワイドは3組が的中
+    assert model["place"].sum() == pytest.approx(3.0)
+    assert upper(model["wide"], 2).sum() == pytest.approx(3.0)
+    # 同じ馬を含む買い目は0
+    assert np.all(np.diagonal(model["exacta"]) == 0)
+
+
+def test_pool_odds_from_stakes():
+    pools = RacePools(runners=3)
+    for number, amount in ((1, 600), (2, 300), (3, 100)):
+        pools.add("win", [number], amount)
+
+    odds = compute_odds(pools)
+    # 800（控除後）/ 投票額、0.1単位で切り捨て
+    np.testing.assert_array_equal(odds["win"], [1.3, 2.6, 8.0])
+
+
+def test_model_odds_without_stakes():
+    odds = compute_odds(RacePools(runners=4), base_win_odds=np.array([2.0, 4.0, 8.0, 8.0]))
+    # 支持率 1/2・1/4・1/8・1/8 → (1 - 0.2) / 確率
+    np.testing.assert_array_equal(odds["win"], [1.6, 3.2, 6.4, 6.4])
+
+    uniform = compute_odds(RacePools(runners=4))
+    np.testing.assert_array_equal(uniform["win"], [3.2] * 4)
+
+
+def test_single_staked_horse_keeps_prior_for_others():
+    pools = RacePools(runners=12)
+    pools.add("win", [1], 100)
+    odds = compute_odds(pools, base_win_odds=np.full(12, 5.0))
+
+    # 投票のない馬も基準の支持率から推定し、上限には張り付かない
+    assert odds["win"][0] == 1.0
+    assert np.all(odds["win"][1:] < 20)
+    for bet_type in ("place", "exacta", "wide", "trio", "trifecta"):
+        values = odds[bet_type][~np.isnan(odds[bet_type])]
+        assert values.max() <= MAX_MODEL_ODDS
+    assert odds["place"].max() < 10
+    assert odds["exacta"][0, 1] < 200
+    assert odds["trifecta"][1, 2, 3] < MAX_MODEL_ODDS
+
+
+def test_scratched_horse_is_not_uniform_fallback():
+    odds = compute_odds(RacePools(runners=4), base_win_odds=np.array([2.0, 4.0, 4.0, 0.0]))
+    # 0 の馬は出走取消として支持率0（他の馬は基準どおり）、推定オッズは上限まで
+    np.testing.assert_array_equal(odds["win"], [1.6, 3.2, 3.2, MAX_MODEL_ODDS])
+
+
+def test_invalid_tickets_are_nan_and_not_published():
+    odds = compute_odds(RacePools(runners=3))
+    assert np.isnan(odds["exacta"][1, 0]) and np.isnan(odds["exacta"][0, 0])
+    assert not np.isnan(odds["trifecta"][1, 0, 2])
+
+    fields = odds_to_fields(odds)
+    assert "exacta:1-2" in fields and "exacta:2-1" not in fields
+    assert "trifecta:2-1-3" in fields
+    assert len([field for field in fields if field.startswith("trifecta:")]) == 6
+
+
+@pytest.mark.asyncio
+async def test_stakes_round_trip_through_redis():
+    server = fakeredis.FakeServer()
+    redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    await record_stakes(redis, "race-1", "exacta", [[3, 1], [1, 3]], 100)
+    await record_stakes(redis, "race-1", "trifecta", [[3, 1, 2]], 200)
+
+    pools = RacePools.load(fakeredis.FakeRedis(server=server, decode_responses=True), "race-1", runners=3)
+    # 順不同の券種は昇順の買い目にまとめる
+    assert pools.stakes["exacta"][0, 2] == 200
+    assert pools.stakes["trifecta"][2, 0, 1] == 200
+    assert pools.stakes["exacta"].sum() == 200
@@ -0,0 +1,196 @@
+"""オッズ更新のスケジューラー（app/services/odds_scheduler.py）"""
+
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app.services.odds_scheduler import (
+    DEADLINES_KEY,
+    INFLIGHT_KEY,
+    LOCK_KEY,
+    SCHEDULE_KEY,
+    OddsScheduler,
+    next_due,
+    poll_interval,
+    release,
+)
+
+START = 1_900_000_000.0
+
+
+class Races:
+    """races テーブルの select().eq().execute() だけを持つ同期クライアント"""
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, race_id: str, deadline: float, status: str = "betting") -> None:
+        # DBと同じタイムゾーンのない UTC の日時
+        end = datetime.fromtimestamp(deadline, timezone.utc).replace(tzinfo=None).isoformat()
+        self.rows.append({"id": race_id, "betting_end_time": end, "status": status})
+
+    def table(self, name: str):
+        rows = self.rows
+
+        class Query:
+            def select(self, columns):
+                return self
+
+            def eq(self, column, value):
+                self.filter = (column, value)
+                return self
+
+            def execute(self):
+                column, value = self.filter
+                return SimpleNamespace(data=[row for row in rows if row[column] == value])
+
+        return Query()
+
+
+class Clock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def local_timezone(monkeypatch):
+    """ローカル時刻がUTCでない環境でもDBの時刻をUTCとして読む"""
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def races():
+    return Races()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def scheduler(redis, races, clock, dispatched, **kwargs) -> OddsScheduler:
+    return OddsScheduler(redis, races, dispatched.append, clock=clock, **kwargs)
+
+
+def test_poll_interval_is_bounded():
+    assert poll_interval(10) == 10.0
+    assert poll_interval(600) == 60.0
+    assert poll_interval(24 * 60 * 60) == 300.0
+
+
+def test_new_races_are_due_immediately(redis, races, clock):
+    races.add("r1", START + 600)
+    races.add("r2", START - 1)  # 受付終了済み
+    races.add("r3", START + 600, status="closed")
+    dispatched = []
+
+    assert scheduler(redis, races, clock, dispatched).tick() == ["r1"]
+    assert dispatched == ["r1"]
+    # 次回は残り時間 × ratio 後
+    assert redis.zscore(SCHEDULE_KEY, "r1") == START + 60
+    assert redis.zscore(INFLIGHT_KEY, "r1") == START
+    assert redis.get(LOCK_KEY) is None
+
+
+def test_not_due_until_next_time(redis, races, clock):
+    races.add("r1", START + 600)
+    dispatched = []
+    odds = scheduler(redis, races, clock, dispatched)
+    odds.tick()
+    release(redis, "r1")
+
+    clock.now = START + 59
+    assert odds.tick() == []
+    clock.now = START + 60
+    assert odds.tick() == ["r1"]
+    assert next_due(redis) == START + 60 + poll_interval(540)
+
+
+def test_final_update_at_deadline_removes_race(redis, races, clock):
+    races.add("r1", START + 15)
+    dispatched = []
+    odds = scheduler(redis, races, clock, dispatched)
+    odds.tick()
+    release(redis, "r1")
+
+    # 次回の更新は受付終了時刻を超えない
+    assert redis.zscore(SCHEDULE_KEY, "r1") == START + 10
+    clock.now = START + 10
+    odds.tick()
+    release(redis, "r1")
+    assert redis.zscore(SCHEDULE_KEY, "r1") == START + 15
+
+    clock.now = START + 15
+    assert odds.tick() == ["r1"]
+    assert redis.zscore(SCHEDULE_KEY, "r1") is None
+    assert redis.hget(DEADLINES_KEY, "r1") is None
+    assert next_due(redis) is None
+
+
+def test_sync_drops_races_no_longer_betting(redis, races, clock):
+    races.add("r1", START + 600)
+    races.add("r2", START + 600)
+    odds = scheduler(redis, races, clock, [])
+    assert odds.sync() == 2
+
+    races.rows[0]["status"] = "closed"
+    assert odds.sync() == 1
+    assert redis.zrange(SCHEDULE_KEY, 0, -1) == ["r2"]
+    assert redis.hkeys(DEADLINES_KEY) == ["r2"]
+
+
+def test_concurrency_limit(redis, races, clock):
+    for race_id in ("r1", "r2", "r3"):
+        races.add(race_id, START + 600)
+    dispatched = []
+    odds = scheduler(redis, races, clock, dispatched, max_concurrent=2)
+
+    assert odds.tick() == ["r1", "r2"]
+    assert odds.tick() == []
+
+    # 終了した分だけ空きができる
+    release(redis, "r1")
+    assert odds.tick() == ["r3"]
+
+
+def test_stuck_updates_time_out(redis, races, clock):
+    races.add("r1", START + 100)
+    odds = scheduler(redis, races, clock, [], max_concurrent=1)
+    odds.tick()
+
+    # 終了が報告されない間は更新時刻が来ても投入しない
+    clock.now = START + 10
+    assert odds.tick() == []
+    clock.now = START + 60
+    assert odds.tick() == ["r1"]
+
+
+def test_failed_dispatch_releases_slot(redis, races, clock):
+    races.add("r1", START + 600)
+
+    def dispatch(race_id):
+        raise ConnectionError("broker unavailable")
+
+    assert OddsScheduler(redis, races, dispatch, clock=clock).tick() == ["r1"]
+    assert redis.zcard(INFLIGHT_KEY) == 0
+
+
+def test_overlapping_ticks_are_skipped(redis, races, clock):
+    races.add("r1", START + 600)
+    redis.set(LOCK_KEY, 1)
+    assert scheduler(redis, races, clock, []).tick() == []
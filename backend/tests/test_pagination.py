@@ -0,0 +1,89 @@
+"""キーセットページネーション（app/services/pagination.py）"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.repositories.memory import MemoryClient
+from app.services.pagination import Keyset, decode_cursor, encode_cursor
+
+
+class RecordingQuery:
+    """適用された条件を記録するクエリ"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return method
+
+
+@pytest.mark.parametrize("value", ["2025-01-05T10:00:00+00:00", 12, 1.5, None, 'a "quoted", (value)'])
+def test_cursor_round_trip(value):
+    cursor = encode_cursor(value, "id-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (value, "id-1")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", encode_cursor("x", "y")[:-3] + "A"])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_or_filter_quotes_reserved_characters():
+    query = RecordingQuery()
+    Keyset("created_at", desc=True).apply(query, encode_cursor("2025-01-05T10:00:00+00:00", "b,1"), page=1, limit=20)
+
+    name, (expression,), _ = query.calls[0]
+    assert name == "or_"
+    assert expression == (
+        'created_at.lt."2025-01-05T10:00:00+00:00",'
+        'and(created_at.eq."2025-01-05T10:00:00+00:00",id.lt."b,1")'
+    )
+    assert query.calls[1:] == [
+        ("order", ("created_at",), {"desc": True}),
+        ("order", ("id",), {"desc": True}),
+        ("range", (0, 20), {}),
+    ]
+
+
+def test_page_offset_without_cursor():
+    query = RecordingQuery()
+    Keyset("start_time").apply(query, None, page=3, limit=10)
+    assert query.calls[-1] == ("range", (20, 30), {})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("desc", [False, True])
+async def test_cursor_walks_every_row_once(desc):
+    # 同じ時刻の行が並ぶ場合も id で順序が決まる
+    client = MemoryClient()
+    client.tables["bets"] = [
+        {"id": f"bet-{i:02d}", "created_at": f"2025-01-05T10:0{i // 4}:00+00:00"} for i in range(11)
+    ]
+    keyset = Keyset("created_at", desc=desc)
+
+    seen, cursor = [], None
+    for _ in range(10):
+        query = keyset.apply(client.table("bets").select("*"), cursor, page=1, limit=3)
+        rows, page = keyset.paginate((await query.execute()).data, 3, 1, None, "none")
+        seen += [row["id"] for row in rows]
+        cursor = page["nextCursor"]
+        if not page["hasMore"]:
+            break
+
+    expected = sorted(row["id"] for row in client.tables["bets"])
+    assert seen == (expected[::-1] if desc else expected)
+    assert cursor is None
+
+
+def test_paginate_reports_totals():
+    rows = [{"id": str(i), "start_time": i} for i in range(4)]
+    page_rows, page = Keyset("start_time").paginate(rows, limit=3, page=1, total=7, count="estimated")
+    assert len(page_rows) == 3
+    assert page["hasMore"] and page["nextCursor"] == encode_cursor(2, "2")
+    assert page["totalPages"] == 3 and page["estimated"]
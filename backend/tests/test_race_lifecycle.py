@@ -0,0 +1,180 @@
+"""レースの状態遷移のスケジューラー（app/services/race_lifecycle.py）"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+
+from app.repositories.memory import MemoryClient
+from app.services import race_lifecycle as module
+from app.services.open_races import OPEN_KEY
+from app.services.race_lifecycle import CLOSE, OPEN, START, RaceLifecycle
+
+T0 = 1_900_000_000.0
+
+
+def iso(moment: float) -> str:
+    """DBと同じタイムゾーンのない UTC の日時"""
+    return datetime.fromtimestamp(moment, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class SyncQuery:
+    """MemoryQuery の execute() をその場で実行する"""
+
+    def __init__(self, query):
+        self.query = query
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.query = getattr(self.query, name)(*args, **kwargs)
+            return self
+        return method
+
+    def execute(self):
+        return asyncio.run(self.query.execute())
+
+
+class SyncMemoryClient(MemoryClient):
+    def table(self, name: str):
+        return SyncQuery(super().table(name))
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def client():
+    client = SyncMemoryClient()
+    client.tables["races"] = []
+    return client
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+    monkeypatch.setattr(module, "publish_status", lambda redis, race_id, day, status: events.append((race_id, status)))
+    return events
+
+
+def add_race(client, race_id: str, opens_at: float, status: str = "upcoming") -> None:
+    client.tables["races"].append({
+        "id": race_id,
+        "date": "2030-03-17",
+        "status": status,
+        "betting_start_time": iso(opens_at),
+        "betting_end_time": iso(opens_at + 1500),
+        "start_time": iso(opens_at + 1800),
+    })
+
+
+def statuses(client) -> dict:
+    return {race["id"]: race["status"] for race in client.tables["races"]}
+
+
+def test_sync_builds_heap_and_windows(client, redis, clock):
+    add_race(client, "r1", T0 + 100)
+    add_race(client, "r2", T0 - 100, status="betting")
+    add_race(client, "r3", T0 - 2000, status="running")
+    lifecycle = RaceLifecycle(redis, client, clock=clock)
+
+    assert lifecycle.sync() == 2
+    assert lifecycle.next_at() == T0 + 100
+    # 受付中の r2 は受付開始を持たない
+    assert sorted((event, race_id) for _, _, race_id, event in lifecycle._heap) == [
+        (CLOSE, "r1"), (CLOSE, "r2"), (OPEN, "r1"), (START, "r1"), (START, "r2"),
+    ]
+    assert set(redis.hkeys(OPEN_KEY)) == {"r1", "r2"}
+
+
+def test_transitions_in_time_order(client, redis, clock, published):
+    add_race(client, "r1", T0 + 100)
+    add_race(client, "r2", T0 + 200)
+    lifecycle = RaceLifecycle(redis, client, clock=clock)
+    lifecycle.sync()
+
+    assert lifecycle.advance() == {OPEN: [], CLOSE: [], START: []}
+
+    clock.now = T0 + 100
+    assert lifecycle.advance()[OPEN] == ["r1"]
+    assert statuses(client) == {"r1": "betting", "r2": "upcoming"}
+    assert lifecycle.next_at() == T0 + 200
+
+    # 受付終了は公開から外すだけで状態は変えない
+    clock.now = T0 + 1600
+    done = lifecycle.advance()
+    assert (done[OPEN], done[CLOSE], done[START]) == (["r2"], ["r1"], [])
+    assert statuses(client) == {"r1": "betting", "r2": "betting"}
+    assert set(redis.hkeys(OPEN_KEY)) == {"r2"}
+
+    clock.now = T0 + 2000
+    done = lifecycle.advance()
+    assert (done[CLOSE], done[START]) == (["r2"], ["r1", "r2"])
+    assert statuses(client) == {"r1": "running", "r2": "running"}
+    assert lifecycle.next_at() is None
+    assert published == [("r1", "betting"), ("r2", "betting"), ("r1", "running"), ("r2", "running")]
+
+
+def test_overdue_race_goes_straight_to_running(client, redis, clock, published):
+    add_race(client, "r1", T0 - 2000)
+    lifecycle = RaceLifecycle(redis, client, clock=clock)
+
+    # 受付開始と発走の両方を過ぎている場合は発走だけ行う
+    assert lifecycle.tick() == {OPEN: [], CLOSE: [], START: ["r1"]}
+    assert statuses(client) == {"r1": "running"}
+    assert published == [("r1", "running")]
+
+
+def test_transition_is_idempotent(client, redis, clock, published):
+    add_race(client, "r1", T0 - 100)
+    lifecycle = RaceLifecycle(redis, client, clock=clock)
+    lifecycle.sync()
+    # 読み直しの前に他のプロセスが状態を変えた
+    client.tables["races"][0]["status"] = "cancelled"
+
+    assert lifecycle.advance()[OPEN] == []
+    assert statuses(client) == {"r1": "cancelled"}
+    assert published == []
+
+
+def test_run_forever_sleeps_until_next_transition(client, redis, clock, published):
+    add_race(client, "r1", T0 + 100)
+    waits = []
+
+    class Stop(Exception):
+        pass
+
+    def sleep(seconds: float) -> None:
+        waits.append(seconds)
+        if len(waits) == 3:
+            raise Stop
+        clock.now += seconds
+
+    lifecycle = RaceLifecycle(redis, client, sync_interval=60, clock=clock, sleep=sleep)
+    with pytest.raises(Stop):
+        lifecycle.run_forever()
+
+    # 読み直しの間隔で起き、受付開始の時刻に合わせて起きる
+    assert waits == [60, 40, 20]
+    assert statuses(client) == {"r1": "betting"}
+
+
+def test_works_without_redis(client, clock):
+    add_race(client, "r1", T0 - 100)
+    lifecycle = RaceLifecycle(None, client, clock=clock)
+    assert lifecycle.tick()[OPEN] == ["r1"]
@@ -0,0 +1,48 @@
+"""配信ハブの購読者キュー（app/services/race_stream.py）"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.race_stream import RESYNC, RaceStream, Subscriber
+
+
+@pytest.mark.asyncio
+async def test_overflow_replaces_backlog_with_resync():
+    subscriber = Subscriber({"day:2025-01-05"}, queue_size=2, max_overflows=3)
+    for message in ("a", "b", "c"):
+        subscriber.offer(message)
+
+    assert await subscriber.next(0.01) == RESYNC
+    assert await subscriber.next(0.01) is None
+    assert not subscriber.closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_waiting_next_returns_when_closed_by_overflow():
+    subscriber = Subscriber({"day:2025-01-05"}, queue_size=1, max_overflows=1)
+    waiting = asyncio.create_task(subscriber.next(10))
+    await asyncio.sleep(0)
+
+    # 待機中の読み手が受け取る前に溢れて閉じる
+    started = time.perf_counter()
+    subscriber.offer("a")
+    subscriber.offer("b")
+
+    assert subscriber.closed.is_set()
+    # ハートビートの間隔を待たずに戻る
+    assert await asyncio.wait_for(waiting, 1) is None
+    assert time.perf_counter() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe_wakes_waiting_reader():
+    stream = RaceStream(queue_size=10, max_overflows=3)
+    subscriber = stream.add({"race:r1"})
+    waiting = asyncio.create_task(subscriber.next(10))
+    await asyncio.sleep(0)
+
+    stream.unsubscribe(subscriber)
+    assert await asyncio.wait_for(waiting, 1) is None
+    assert stream.subscribers == 0
@@ -0,0 +1,135 @@
+"""レースAPIのレスポンスキャッシュ（app/services/response_cache.py）"""
+
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services.response_cache import (
+    CachedResponse,
+    ResponseCache,
+    cache_key,
+    invalidate_race,
+    is_final_race,
+    race_scope,
+)
+
+
+class Builder:
+    """呼ばれた回数を数え、呼ばれるたびに本文を変える"""
+
+    def __init__(self, final: bool = False):
+        self.final = final
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return f'{{"version":{self.calls}}}'.encode(), self.final
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def async_redis(server):
+    return fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+
+def new_cache() -> ResponseCache:
+    # 世代番号は毎回Redisを読む
+    return ResponseCache(ttl=60, final_ttl=3600, generation_ttl=0, max_size=100)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('"other"', False),
+    ("{etag}", True),
+    ("W/{etag}", True),
+    ('"other", {etag}', True),
+    ("*", True),
+])
+def test_etag_matching(header, expected):
+    entry = CachedResponse.build(b'{"a":1}')
+    assert entry.matches(header.format(etag=entry.etag) if header else header) is expected
+
+
+def test_to_response_returns_304_with_headers():
+    entry = CachedResponse.build(b'{"a":1}', immutable=True)
+    not_modified = entry.to_response(entry.etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == entry.etag
+    assert "immutable" in not_modified.headers["cache-control"]
+
+    full = CachedResponse.build(b'{"a":1}').to_response('"stale"')
+    assert full.status_code == 200 and full.body == b'{"a":1}'
+    assert full.headers["cache-control"] == "private, no-cache"
+
+
+def test_cache_key_ignores_order_and_missing_params():
+    assert cache_key("races", venue="東京", date="2025-01-05", status=None) == cache_key(
+        "races", date="2025-01-05 ", venue="東京"
+    )
+
+
+def test_is_final_race():
+    assert is_final_race({"status": "cancelled"})
+    assert not is_final_race({"status": "running"})
+    # 結果が書き込まれるまでは確定済みとしない
+    assert not is_final_race({"status": "finished", "race_results": None})
+    assert is_final_race({"status": "finished", "race_results": {"first": 1}})
+    assert is_final_race({"status": "finished"})
+
+
+@pytest.mark.asyncio
+async def test_generation_bump_invalidates_entries(redis_server):
+    cache, redis, build = new_cache(), async_redis(redis_server), Builder()
+    key, scope = cache_key("race", id="r1"), race_scope("r1")
+
+    first = await cache.get_or_build(redis, key, scope, build)
+    assert (await cache.get_or_build(redis, key, scope, build)).etag == first.etag
+    assert build.calls == 1
+
+    invalidate_race(fakeredis.FakeRedis(server=redis_server), "r1")
+    second = await cache.get_or_build(redis, key, scope, build)
+    assert build.calls == 2
+    assert second.etag != first.etag
+
+
+@pytest.mark.asyncio
+async def test_entries_are_shared_through_redis(redis_server):
+    key, scope, build = cache_key("races"), "races", Builder()
+    first = await new_cache().get_or_build(async_redis(redis_server), key, scope, build)
+    # 別のワーカー（プロセス内キャッシュなし）
+    second = await new_cache().get_or_build(async_redis(redis_server), key, scope, build)
+    assert build.calls == 1
+    assert second.etag == first.etag
+
+
+@pytest.mark.asyncio
+async def test_final_entries_survive_invalidation(redis_server):
+    cache, redis, build = new_cache(), async_redis(redis_server), Builder(final=True)
+    key, scope = cache_key("race", id="r1"), race_scope("r1")
+
+    entry = await cache.get_or_build(redis, key, scope, build)
+    invalidate_race(fakeredis.FakeRedis(server=redis_server), "r1")
+    assert (await cache.get_or_build(redis, key, scope, build)).etag == entry.etag
+    assert entry.immutable and build.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_builds_are_coalesced(redis_server):
+    cache, redis, build = new_cache(), async_redis(redis_server), Builder()
+    entries = await asyncio.gather(*(cache.get_or_build(redis, "races?", "races", build) for _ in range(10)))
+    assert build.calls == 1
+    assert len({entry.etag for entry in entries}) == 1
+
+
+@pytest.mark.asyncio
+async def test_without_redis_builds_once_per_generation_ttl():
+    cache = ResponseCache(ttl=60, final_ttl=3600, generation_ttl=60, max_size=100)
+    build = Builder()
+    await cache.get_or_build(None, "races?", "races", build)
+    await cache.get_or_build(None, "races?", "races", build)
+    assert build.calls == 1
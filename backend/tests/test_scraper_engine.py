@@ -0,0 +1,203 @@
+"""スクレイピングエンジン（app/scrapers/engine.py）
+
+ローカルのフィクスチャサーバーから出馬表を取得し、404・タイムアウト・解析の失敗が
+そのレースだけの除外になることを確かめる。
+"""
+
+import threading
+import time
+from collections import Counter
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from playwright.async_api import Error as PlaywrightError
+
+from app.scrapers.engine import BrowserPool, FetchError, HostLimiter, HttpFetcher, Scraper, TransientFetchError
+from app.scrapers.netkeiba import ParseError, parse_race_card, race_card_url, scrape_race_day
+from app.scrapers.store import PageStore
+from benchmarks.bench_scraper import race_card_page, race_list_page
+
+DAY = date(2025, 1, 5)
+OK = "202505010101"
+MISSING = "202505010102"
+SLOW = "202505010103"
+BROKEN = "202505010104"
+
+
+class FixtureServer:
+    """レースIDごとに 200・404・遅延・崩れたページを返すHTTPサーバー"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.requests = Counter()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.endswith("race_list_sub.html"):
+                    self._send(race_list_page([OK, MISSING, SLOW, BROKEN]))
+                    return
+                race_id = parse_qs(url.query)["race_id"][0]
+                fixture.requests[race_id] += 1
+                if race_id == MISSING:
+                    self.send_error(404)
+                elif race_id == SLOW:
+                    time.sleep(fixture.delay)
+                    self._send(race_card_page(race_id))
+                elif race_id == BROKEN:
+                    self._send("<html><body><h1 class='RaceName'>メンテナンス中</h1></body></html>")
+                else:
+                    self._send(race_card_page(race_id))
+
+            def _send(self, body: str) -> None:
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FixtureServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server():
+    with FixtureServer(delay=1.0) as fixture:
+        yield fixture
+
+
+def scraper(attempts: int = 2, store=None) -> Scraper:
+    return Scraper(
+        HttpFetcher(timeout=0.2), HostLimiter(concurrency=4, rate=0), attempts=attempts, backoff=0.01, store=store
+    )
+
+
+@pytest.mark.asyncio
+async def test_scrape_race_day_skips_failed_races(server):
+    async with scraper() as engine:
+        races = await scrape_race_day(engine, DAY, base_url=server.base_url)
+
+    assert [race["race_number"] for race in races] == [1]
+    assert len(races[0]["horses"]) == 16
+    # 404 は再試行しない、タイムアウトは attempts 回まで再試行する
+    assert server.requests[MISSING] == 1
+    assert server.requests[SLOW] == 2
+    assert server.requests[BROKEN] == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_returns_errors(server):
+    urls = [race_card_url(race_id, server.base_url) for race_id in (OK, MISSING, SLOW)]
+    async with scraper() as engine:
+        ok, missing, slow = await engine.fetch_all(urls)
+
+    assert "HorseList" in ok
+    assert isinstance(missing, FetchError) and not isinstance(missing, TransientFetchError)
+    assert missing.status == 404
+    assert isinstance(slow, TransientFetchError)
+
+
+@pytest.mark.asyncio
+async def test_parse_failure_is_reported(server):
+    async with scraper() as engine:
+        html = await engine.fetch(race_card_url(BROKEN, server.base_url))
+
+    with pytest.raises(ParseError, match="Unexpected race card layout"):
+        parse_race_card(html, BROKEN, DAY)
+
+
+@pytest.mark.asyncio
+async def test_fetched_pages_are_stored(server, tmp_path):
+    store = PageStore(tmp_path)
+    urls = [race_card_url(race_id, server.base_url) for race_id in (OK, BROKEN)]
+    async with scraper(store=store) as engine:
+        pages = await engine.fetch_all(urls)
+
+    # 保存はスレッドで行い、取得した内容と同じものを索引から引ける
+    for url, html in zip(urls, pages):
+        stored = store.latest(url)
+        assert stored is not None and store.get(stored.digest) == html
+    store.close()
+
+
+class FakePage:
+    def __init__(self, html: str):
+        self.html = html
+
+    async def goto(self, url, wait_until):
+        return type("Response", (), {"status": 200})()
+
+    async def content(self) -> str:
+        return self.html
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeContext:
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.closed = False
+
+    async def new_page(self):
+        if self.broken:
+            raise PlaywrightError("Target page, context or browser has been closed")
+        return FakePage("<html></html>")
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def fake_pool(*contexts: FakeContext, fresh: FakeContext) -> BrowserPool:
+    pool = BrowserPool(size=len(contexts), max_pages=100)
+    for context in contexts:
+        pool._contexts.put_nowait((context, 0))
+
+    async def new_context():
+        return fresh
+
+    pool._new_context = new_context
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_browser_pool_replaces_broken_context():
+    broken, fresh = FakeContext(broken=True), FakeContext()
+    pool = fake_pool(broken, fresh=fresh)
+
+    with pytest.raises(TransientFetchError):
+        await pool.fetch("http://example.test/")
+
+    assert broken.closed
+    assert pool._contexts.get_nowait() == (fresh, 0)
+
+
+@pytest.mark.asyncio
+async def test_browser_pool_reuses_healthy_context():
+    healthy = FakeContext()
+    pool = fake_pool(healthy, fresh=FakeContext())
+
+    assert await pool.fetch("http://example.test/") == "<html></html>"
+    assert pool._contexts.get_nowait() == (healthy, 1)
@@ -0,0 +1,82 @@
+"""予想の精算エンジン（app/services/settlement.py）"""
+
+import numpy as np
+import pytest
+
+from app.services.settlement import NO_SELECTION, bets_to_arrays, build_settlement, columns_to_arrays, evaluate_hits
+
+RESULT = {"first": 5, "second": 3, "third": 8}
+
+
+def bet(bet_type: str, selections: list, amount: int = 100, odds: float = 2.5) -> dict:
+    return {"id": f"{bet_type}-{'-'.join(map(str, selections))}", "bet_type": bet_type,
+            "selections": selections, "amount": amount, "odds": odds}
+
+
+def hits(rows: list, place_positions: int = 3) -> list:
+    arrays = bets_to_arrays(rows)
+    return evaluate_hits(arrays, RESULT["first"], RESULT["second"], RESULT["third"], place_positions).tolist()
+
+
+def test_win_and_trifecta_are_ordered():
+    assert hits([
+        bet("win", [5]), bet("win", [3]),
+        bet("trifecta", [5, 3, 8]), bet("trifecta", [3, 5, 8]),
+    ]) == [True, False, True, False]
+
+
+def test_exacta_is_unordered_top_two():
+    # 馬連: 1・2着の2頭を順不同で当てる
+    assert hits([
+        bet("exacta", [5, 3]), bet("exacta", [3, 5]), bet("exacta", [5, 8]),
+    ]) == [True, True, False]
+
+
+def test_trio_is_unordered_top_three():
+    assert hits([bet("trio", [8, 5, 3]), bet("trio", [5, 3, 1])]) == [True, False]
+
+
+@pytest.mark.parametrize("place_positions, expected", [
+    (3, [True, True, True, True, False]),
+    # 出走7頭以下は2着まで
+    (2, [True, False, True, False, False]),
+])
+def test_place_and_wide_positions(place_positions, expected):
+    rows = [
+        bet("place", [3]), bet("place", [8]),
+        bet("wide", [5, 3]), bet("wide", [3, 8]), bet("wide", [5, 1]),
+    ]
+    assert hits(rows, place_positions) == expected
+
+
+def test_build_settlement_pays_hits_only():
+    rows = [bet("win", [5], amount=300, odds=3.33), bet("win", [1], amount=200)]
+    settlement = build_settlement(bets_to_arrays(rows), RESULT)
+    assert settlement == {
+        "p_bet_ids": ["win-5", "win-1"],
+        "p_statuses": ["won", "lost"],
+        "p_payouts": [999, 0],  # 1コイン未満は切り捨て
+    }
+
+
+def test_cancelled_race_refunds_every_bet():
+    rows = [bet("win", [5], amount=300), bet("trio", [1, 2, 4], amount=100)]
+    settlement = build_settlement(bets_to_arrays(rows), None)
+    assert settlement["p_statuses"] == ["refunded", "refunded"]
+    assert settlement["p_payouts"] == [300, 100]
+
+
+def test_columns_and_rows_give_the_same_arrays():
+    rows = [bet("win", [5]), bet("wide", [3, 8], odds=4.0), bet("trifecta", [5, 3, 8], odds=120.5)]
+    columns = {
+        "ids": [row["id"] for row in rows],
+        "bet_types": [row["bet_type"] for row in rows],
+        "selections": [5, NO_SELECTION, NO_SELECTION, 3, 8, NO_SELECTION, 5, 3, 8],
+        "amounts": [row["amount"] for row in rows],
+        "odds": [row["odds"] for row in rows],
+    }
+    from_rows, from_columns = bets_to_arrays(rows), columns_to_arrays(columns)
+
+    assert from_rows.ids == from_columns.ids
+    for name in ("bet_types", "selections", "amounts", "odds"):
+        np.testing.assert_array_equal(getattr(from_rows, name), getattr(from_columns, name))
@@ -0,0 +1,78 @@
+"""配信API（app/api/stream.py）の認証と接続数の上限"""
+
+import json
+import time
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from starlette.websockets import WebSocketDisconnect
+
+from app.api import stream
+from app.config import get_settings
+from app.dependencies import get_redis
+from app.main import app
+from app.services.race_stream import race_stream
+
+settings = get_settings()
+URL = "/api/stream/races?date=2025-01-05"
+WS_URL = "/api/stream/races/ws?date=2025-01-05"
+
+
+def token(user_id: str = "user-1") -> str:
+    payload = {"sub": user_id, "aud": "authenticated", "exp": time.time() + 600}
+    return jwt.encode(payload, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    server = fakeredis.FakeServer()
+    app.dependency_overrides[get_redis] = lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(stream.settings, "STREAM_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(stream.settings, "STREAM_AUTH_TIMEOUT_SECONDS", 0.5)
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+
+def closed_with(client: TestClient, url: str, first_message: str = None) -> int:
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect(url) as websocket:
+            if first_message is not None:
+                websocket.send_text(first_message)
+            websocket.receive_text()
+    return error.value.code
+
+
+def test_sse_requires_auth(client):
+    assert client.get(URL).status_code == 403
+
+
+def test_websocket_rejects_invalid_query_token(client):
+    assert closed_with(client, f"{WS_URL}&token=invalid") == 1008
+
+
+def test_websocket_rejects_missing_token(client):
+    assert closed_with(client, WS_URL, json.dumps({"type": "hello"})) == 1008
+
+
+@pytest.mark.parametrize("via_query", [True, False])
+def test_websocket_accepts_token(client, via_query):
+    url = f"{WS_URL}&token={token()}" if via_query else WS_URL
+    with client.websocket_connect(url) as websocket:
+        if not via_query:
+            websocket.send_text(json.dumps({"type": "auth", "token": token()}))
+        assert json.loads(websocket.receive_text()) == {"type": "ping"}
+
+
+def test_connection_limit(client, monkeypatch):
+    monkeypatch.setattr(race_stream, "max_subscribers", 1)
+    subscriber = race_stream.add({"day:2025-01-05"})
+    try:
+        client.post("/api/user/register-bonus", headers={"Authorization": f"Bearer {token()}"})
+        response = client.get(URL, headers={"Authorization": f"Bearer {token()}"})
+        assert response.status_code == 503
+        assert closed_with(client, f"{WS_URL}&token={token()}") == 1013
+    finally:
+        race_stream.unsubscribe(subscriber)
@@ -0,0 +1,40 @@
+"""ユーザー情報キャッシュ（app/services/user_cache.py）"""
+
+import fakeredis
+import pytest
+
+from app.services.user_cache import KEY_PREFIX, UserCache
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.mark.asyncio
+async def test_shared_through_redis(redis):
+    await UserCache(local_ttl=10, redis_ttl=30, max_size=10).set(redis, {"id": "u1", "coins": 100})
+
+    # 別プロセス（ローカルキャッシュが空）でも Redis から読む
+    other = UserCache(local_ttl=10, redis_ttl=30, max_size=10)
+    assert await other.get(redis, "u1") == {"id": "u1", "coins": 100}
+    assert 0 < await redis.ttl(KEY_PREFIX + "u1") <= 30
+
+
+@pytest.mark.asyncio
+async def test_invalidate_clears_both_levels(redis):
+    cache = UserCache(local_ttl=10, redis_ttl=30, max_size=10)
+    await cache.set(redis, {"id": "u1", "coins": 100})
+
+    await cache.invalidate(redis, "u1")
+    assert await cache.get(redis, "u1") is None
+    assert await redis.exists(KEY_PREFIX + "u1") == 0
+
+
+@pytest.mark.asyncio
+async def test_without_redis_uses_local_only():
+    cache = UserCache(local_ttl=10, redis_ttl=30, max_size=10)
+    await cache.set(None, {"id": "u1", "coins": 100})
+    assert await cache.get(None, "u1") == {"id": "u1", "coins": 100}
+    await cache.invalidate(None, "u1")
+    assert await cache.get(None, "u1") is None